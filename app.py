@@ -1,26 +1,84 @@
+import time
+STARTUP_BEGAN = time.perf_counter()  # გაშვების დროის გაზომვა (Startup)
+
 import sys
 import os
-import webbrowser
 import threading
 import platform
 import base64
 import json
+import hashlib
+import re
+import zipfile
+import queue
+import string
+import socket
+import atexit
+import shutil
+import errno
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
+from types import SimpleNamespace
+from contextlib import contextmanager
+from collections import OrderedDict
+from pathlib import Path
 from datetime import datetime
 import subprocess
+import argparse
+import signal
+import sqlite3
+import ipaddress
+import tempfile
+import gzip
+import mimetypes
 
 try:
     import pythoncom
 except ImportError:
     pythoncom = None
 
-from flask import Flask, render_template, request, jsonify, send_file, Response
-from docx import Document
-from docx.shared import Inches, Pt, Cm
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.table import WD_TABLE_ALIGNMENT
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+try:
+    import win32com.client
+except ImportError:
+    win32com = None
+
+try:
+    import win32gui
+    import win32process
+except ImportError:
+    win32gui = None
+    win32process = None
+
+try:
+    import waitress
+    from waitress.server import create_server
+except ImportError:
+    waitress = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+
+from html import escape as html_escape
+from flask import Flask, render_template, request, jsonify, send_file, make_response, Response
+from werkzeug.exceptions import HTTPException
+from werkzeug.serving import make_server
+
+# python-docx (+lxml), reportlab, pypdf და Pillow იტვირთება პირველი
+# გამოყენებისას ან ფონურად სერვერის გაშვების შემდეგ - იხ. "Lazy Imports"
 
 # ======================== Paths & Flask Setup ========================
 
@@ -31,6 +89,9 @@ else:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     STORAGE_DIR = BASE_DIR
 
+# მონაცემების ცალკე საქაღალდე (მაგ. benchmark-ის სინთეზური კორპუსი)
+STORAGE_DIR = os.environ.get('MEDDOCS_STORAGE_DIR', STORAGE_DIR)
+
 app = Flask(
     __name__,
     template_folder=os.path.join(BASE_DIR, 'templates'),
@@ -40,8 +101,78 @@ app = Flask(
 DOCUMENTS_FOLDER = os.path.join(STORAGE_DIR, 'documents')
 TEMPLATES_FOLDER = os.path.join(STORAGE_DIR, 'saved_templates')
 SIGNATURES_FOLDER = os.path.join(STORAGE_DIR, 'signatures')
-
-for folder in [DOCUMENTS_FOLDER, TEMPLATES_FOLDER, SIGNATURES_FOLDER]:
+LO_PROFILES_FOLDER = os.path.join(STORAGE_DIR, 'lo_profiles')
+SEARCH_INDEX_PATH = os.path.join(STORAGE_DIR, 'search_index.db')
+TEMPLATE_DB_PATH = os.path.join(STORAGE_DIR, 'templates.db')
+BLOBS_FOLDER = os.path.join(STORAGE_DIR, 'blobs')  # შაბლონების სურათები, sha1-ით
+RENDER_CACHE_FOLDER = os.path.join(STORAGE_DIR, 'render_cache')
+SLOW_LOG_PATH = os.path.join(STORAGE_DIR, 'slow_requests.log')
+SCRATCH_FOLDER = os.path.join(STORAGE_DIR, 'scratch')  # დავალებების დროებითი ფაილები
+
+# LibreOffice-ის მუდმივი ინსტანციების პული
+LO_POOL_SIZE = int(os.environ.get('LO_POOL_SIZE', '2'))
+LO_QUEUE_SIZE = int(os.environ.get('LO_QUEUE_SIZE', '16'))
+LO_BASE_PORT = int(os.environ.get('LO_BASE_PORT', '2002'))
+LO_CONVERT_TIMEOUT = 60
+LO_QUEUE_TIMEOUT = 120
+LO_HEALTH_INTERVAL = 30
+
+# კონვერტორები: ზედიზედ ამდენი ჩავარდნის შემდეგ კონვერტორი გამოტოვდება RETRY წამით
+CONVERTER_MAX_FAILURES = 3
+CONVERTER_RETRY_SECONDS = int(os.environ.get('MEDDOCS_CONVERTER_RETRY', '120'))
+
+# Word-ის COM სესია: ამდენი დოკუმენტის შემდეგ Word თავიდან ეშვება
+WORD_RECYCLE_AFTER = int(os.environ.get('WORD_RECYCLE_AFTER', '200'))
+WORD_QUEUE_SIZE = 32
+WORD_CONVERT_TIMEOUT = 120
+
+# შენახვის/ბეჭდვის ფონური დავალებები
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '32'))
+JOB_TTL = 600  # დასრულებული დავალების სტატუსი ინახება 10 წუთი
+JOB_TIMEOUT_ERROR = 'დავალებამ დროის ლიმიტს გადააჭარბა'
+
+# დოკუმენტების/შაბლონების კატალოგი - გარედან ჩაგდებული ფაილების შემოწმება
+CATALOG_POLL_INTERVAL = 5
+DOCUMENT_PRUNE_INTERVAL = int(os.environ.get('MEDDOCS_PRUNE_INTERVAL', '300'))
+
+# დარენდერებული PDF-ების ქეში (ხელახალი ბეჭდვისთვის)
+RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_MB', '200')) * 1024 * 1024
+
+# სერვერი: dev (Flask) ან production (waitress, რამდენიმე thread)
+SERVER_HOST = os.environ.get('MEDDOCS_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('MEDDOCS_PORT', '5000'))
+SERVER_THREADS = int(os.environ.get('MEDDOCS_THREADS', '16'))
+SERVER_CONNECTION_LIMIT = int(os.environ.get('MEDDOCS_CONNECTION_LIMIT', '200'))
+# უმოქმედო კავშირის დახურვა (waitress channel_timeout) - არა მოთხოვნის დროის ლიმიტი
+SERVER_IDLE_TIMEOUT = int(os.environ.get('MEDDOCS_IDLE_TIMEOUT', '120'))
+# შენახვა/ბეჭდვის მოთხოვნის ვადა, წამი: ვადაგასული -> 504 (მოთხოვნის thread თავისუფლდება)
+REQUEST_TIMEOUT = int(os.environ.get('MEDDOCS_TIMEOUT', '120'))
+# ვისგან მიიღება მოთხოვნები (IP ან ქსელი, მძიმით). აპლიკაციას ავტორიზაცია არ აქვს,
+# ამიტომ ნაგულისხმევად - მხოლოდ ეს კომპიუტერი, --host 0.0.0.0-ის დროსაც
+SERVER_ALLOW = os.environ.get('MEDDOCS_ALLOW', '127.0.0.1,::1')
+SHUTDOWN_GRACE = 30  # მიმდინარე დავალებების დასრულების მოლოდინი გაჩერებისას
+
+# დროის გაზომვა: ნელი მოთხოვნების ჟურნალი (წამი)
+SLOW_REQUEST_SECONDS = float(os.environ.get('MEDDOCS_SLOW_SECONDS', '3'))
+
+# scratch-ში ამაზე ძველი საქაღალდეები (ავარიული გაჩერების ნარჩენები) იშლება გაშვებისას
+SCRATCH_MAX_AGE = 3600
+
+# შაბლონების სია გვერდებად
+TEMPLATES_PER_PAGE = 24
+TEMPLATES_MAX_PER_PAGE = 200
+TEMPLATE_SUMMARY_FIELDS = ('id', 'name', 'patient', 'created', 'document_type')
+TEMPLATE_META_KEYS = ('template_name', 'created')  # შაბლონის ველები, რომლებიც დოკუმენტში არ გადადის
+TEMPLATE_SORT_KEYS = ('created', 'name', 'patient')
+TEMPLATE_BLOB_MIN_SIZE = 4096  # ამაზე გრძელი მნიშვნელობა (ხელმოწერა...) ინახება blob-ად
+
+# ჯგუფური გენერაცია
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', str(os.cpu_count() or 2)))
+BATCH_MAX_ITEMS = 500
+BATCH_TIMEOUT = int(os.environ.get('MEDDOCS_BATCH_TIMEOUT', '1800'))  # ჯგუფური დავალების ვადა, წამი
+
+for folder in [DOCUMENTS_FOLDER, TEMPLATES_FOLDER, SIGNATURES_FOLDER, SCRATCH_FOLDER]:
     if not os.path.exists(folder):
         try:
             os.makedirs(folder)
@@ -49,8 +180,110 @@ for folder in [DOCUMENTS_FOLDER, TEMPLATES_FOLDER, SIGNATURES_FOLDER]:
             print(f"Error creating folder {folder}: {e}")
 
 
+# ======================== Lazy Imports ========================
+#
+# python-docx (+lxml), reportlab, pypdf და Pillow ერთად ნახევარ წამამდე
+# ამატებს გაშვებას (EXE-ში - მეტს), თუმცა საჭიროა მხოლოდ დოკუმენტის
+# აწყობისას. load_*() მათ ტვირთავს ერთხელ - პირველი დოკუმენტის აწყობისას ან
+# ფონურად, როცა სერვერი უკვე უსმენს პორტს (warm_up). სახელები ხვდება
+# მოდულის globals-ში და დანარჩენი კოდი მათ იყენებს ჩვეულებრივ.
+
+IMPORT_SECONDS = {}  # მოდული -> ჩატვირთვის დრო
+
+_lazy_modules = {}  # მოდული -> True (ჩაიტვირთა) / False (არ არის დაყენებული)
+_lazy_lock = threading.Lock()
+
+
+def _lazy_import(name, loader, optional=True):
+    if name in _lazy_modules:
+        return _lazy_modules[name]
+    with _lazy_lock:
+        if name not in _lazy_modules:
+            started = time.perf_counter()
+            try:
+                loader()
+                _lazy_modules[name] = True
+            except ImportError:
+                if not optional:
+                    raise
+                _lazy_modules[name] = False
+            IMPORT_SECONDS[name] = round(time.perf_counter() - started, 3)
+        return _lazy_modules[name]
+
+
+def _import_docx():
+    global Document, Inches, Pt, Cm, WD_ALIGN_PARAGRAPH, WD_TABLE_ALIGNMENT, qn, OxmlElement
+    global CT_Inline, serialize_part_xml, PackURI, _ContentTypesItem, DocxImage, DOCX_ALIGN
+    from docx import Document
+    from docx.shared import Inches, Pt, Cm
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.enum.table import WD_TABLE_ALIGNMENT
+    from docx.oxml.ns import qn
+    from docx.oxml import OxmlElement
+    from docx.oxml.shape import CT_Inline
+    from docx.opc.oxml import serialize_part_xml
+    from docx.opc.packuri import PackURI
+    from docx.opc.pkgwriter import _ContentTypesItem
+    from docx.image.image import Image as DocxImage
+    DOCX_ALIGN = {
+        'left': WD_ALIGN_PARAGRAPH.LEFT,
+        'center': WD_ALIGN_PARAGRAPH.CENTER,
+        'right': WD_ALIGN_PARAGRAPH.RIGHT,
+    }
+
+
+def _import_reportlab():
+    global colors, TA_CENTER, TA_RIGHT, letter, ParagraphStyle, cm, inch, pdfmetrics, TTFont, TTFontFile
+    global SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, RLImage, PageBreak, PDF_ALIGN
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import cm, inch
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont, TTFontFile
+    from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+                                    Image as RLImage, PageBreak)
+    PDF_ALIGN = {None: 0, 'left': 0, 'center': TA_CENTER, 'right': TA_RIGHT}
+
+
+def _import_pypdf():
+    global PdfWriter
+    from pypdf import PdfWriter
+
+
+def _import_pillow():
+    global PILImage, ImageChops
+    from PIL import Image as PILImage, ImageChops
+
+
+def load_docx():
+    """python-docx (აუცილებელი დამოკიდებულება)"""
+    _lazy_import('docx', _import_docx, optional=False)
+
+
+def load_reportlab():
+    """reportlab დაყენებულია? (შიდა PDF რენდერერი)"""
+    return _lazy_import('reportlab', _import_reportlab)
+
+
+def load_pypdf():
+    """pypdf დაყენებულია? (PDF-ების გაერთიანება)"""
+    return _lazy_import('pypdf', _import_pypdf)
+
+
+def load_pillow():
+    """Pillow დაყენებულია? (ხელმოწერების ნორმალიზაცია)"""
+    return _lazy_import('pillow', _import_pillow)
+
+
 # ======================== Helpers ========================
 
+def xml_escape(text):
+    """&, <, > -> XML entity (xml.sax.saxutils.escape, urllib-ის import-ის გარეშე)"""
+    return html_escape(text, quote=False)
+
+
 def set_cell_shading(cell, color):
     """უჯრის ფონის ფერი"""
     shading = OxmlElement('w:shd')
@@ -59,6 +292,66 @@ def set_cell_shading(cell, color):
 
 
 
+def atomic_write(path, data):
+    """ჩაწერა დროებით სახელზე იმავე საქაღალდეში და rename - ნახევრად ჩაწერილი ფაილი არავის ჩანს"""
+    tmp = f'{path}.{os.urandom(4).hex()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def atomic_copy(src, dest):
+    tmp = f'{dest}.{os.urandom(4).hex()}.tmp'
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return dest
+
+
+def publish_file(src, dest):
+    """scratch-იდან საბოლოო ადგილზე rename-ით (სხვა დისკზე - ასლით)"""
+    try:
+        os.replace(src, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        atomic_copy(src, dest)
+        os.remove(src)
+    return dest
+
+
+@contextmanager
+def scratch_dir(prefix='job_'):
+    """დავალების საკუთარი დროებითი საქაღალდე SCRATCH_FOLDER-ში; ბოლოს იშლება"""
+    path = tempfile.mkdtemp(prefix=prefix, dir=SCRATCH_FOLDER)
+    try:
+        yield path
+    finally:
+        with span('cleanup'):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def clean_scratch(max_age=SCRATCH_MAX_AGE):
+    """წინა გაშვებების დავიწყებული scratch საქაღალდეები"""
+    cutoff = time.time() - max_age
+    for entry in os.scandir(SCRATCH_FOLDER):
+        if entry.stat().st_mtime < cutoff:
+            if entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+
+
 def decode_base64_image(base64_string):
     """Base64 სურათის დეკოდირება და BytesIO დაბრუნება"""
     if not base64_string or not isinstance(base64_string, str):
@@ -75,6 +368,10 @@ def decode_base64_image(base64_string):
 
 
 def find_libreoffice():
+    """soffice: LIBREOFFICE_PATH, Windows-ის სტანდარტული გზები, PATH, Linux/macOS ინსტალაციები"""
+    custom = os.environ.get('LIBREOFFICE_PATH')
+    if custom and os.path.exists(custom):
+        return custom
     if platform.system() == 'Windows':
         paths = [
             r"C:\Program Files\LibreOffice\program\soffice.exe",
@@ -82,263 +379,1679 @@ def find_libreoffice():
             os.path.expandvars(r"%PROGRAMFILES%\LibreOffice\program\soffice.exe"),
             os.path.expandvars(r"%PROGRAMFILES(X86)%\LibreOffice\program\soffice.exe"),
         ]
-        for p in paths:
-            if os.path.exists(p):
-                return p
+    else:
+        paths = [
+            "/usr/bin/soffice",
+            "/usr/lib/libreoffice/program/soffice",
+            "/usr/lib64/libreoffice/program/soffice",
+            "/opt/libreoffice/program/soffice",
+            "/snap/bin/libreoffice",
+            "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+        ]
+    for p in paths:
+        if os.path.exists(p):
+            return p
+    for name in ('soffice', 'libreoffice'):
+        found = shutil.which(name)
+        if found:
+            return found
     return None
 
 
-def convert_to_pdf(docx_path, output_folder):
-    system = platform.system()
-    pdf_path = docx_path.replace('.docx', '.pdf')
+GEORGIAN_LETTERS = range(0x10D0, 0x10F1)  # მხედრული ა-ჰ
+
+
+def font_has_georgian(path):
+    """შრიფტის cmap-ში არის ყველა მხედრული ასო? (სხვაგვარად ქართული ტექსტი ცარიელად დაიბეჭდება)"""
+    try:
+        cmap = TTFontFile(path).charToGlyph
+    except Exception as e:
+        print(f"PDF renderer: cannot read font {path}: {e}")
+        return False
+    return all(code in cmap for code in GEORGIAN_LETTERS)
+
+
+def find_pdf_fonts():
+    """
+    ქართული TrueType შრიფტი PDF რენდერისთვის: (regular, bold) ან None.
+    ქართული ასოების გარეშე შრიფტი გამოტოვდება (reportlab უნდა იყოს ჩატვირთული).
+    """
+    candidates = [
+        (os.path.expandvars(r"%WINDIR%\Fonts\sylfaen.ttf"), None),
+        (r"C:\Windows\Fonts\sylfaen.ttf", None),
+        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+         "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/dejavu/DejaVuSans.ttf",
+         "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf"),
+        ("/usr/share/fonts/truetype/noto/NotoSansGeorgian-Regular.ttf",
+         "/usr/share/fonts/truetype/noto/NotoSansGeorgian-Bold.ttf"),
+    ]
+    for regular, bold in candidates:
+        if os.path.exists(regular) and font_has_georgian(regular):
+            if not bold or not os.path.exists(bold) or not font_has_georgian(bold):
+                bold = regular
+            return regular, bold
+    return None
 
-    # 1) Windows + Word (docx2pdf)
-    if system == 'Windows':
+
+# ======================== Metrics ========================
+#
+# ეტაპების დროის გაზომვა (build, save, convert, cleanup, search...) და მათი
+# ჰისტოგრამები დოკუმენტის ტიპისა და კონვერტორის მიხედვით; /metrics აბრუნებს
+# Prometheus-ის ტექსტურ ფორმატს. თითო მოთხოვნა/დავალება არის trace - მისი
+# ეტაპები იწერება slow_requests.log-ში, თუ ჯამში SLOW_REQUEST_SECONDS-ს აჭარბებს.
+
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=METRIC_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.series = {}  # labels (sorted tuple) -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            items = sorted(self.series.items())
+        for key, series in items:
+            base = ','.join(f'{k}="{_metric_label(v)}"' for k, v in key)
+            sep = ',' if base else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{base}}} {series[-1]}')
+        return lines
+
+
+def _metric_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram('meddocs_request_seconds', 'HTTP request duration by endpoint')
+STAGE_SECONDS = Histogram('meddocs_stage_seconds', 'Pipeline stage duration by document type and backend')
+JOB_SECONDS = Histogram('meddocs_job_seconds', 'Background job duration')
+
+_trace_local = threading.local()
+_slow_log_lock = threading.Lock()
+
+
+class Trace:
+    """ერთი მოთხოვნის/დავალების ეტაპები"""
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.spans = []
+        self.started = time.perf_counter()
+
+
+def start_trace(name, **labels):
+    trace = _trace_local.current = Trace(name, **labels)
+    return trace
+
+
+def trace_labels(**labels):
+    """მიმდინარე trace-ის ლეიბლები (მაგ. doc_type) - ყველა შემდეგ ეტაპს ემატება"""
+    trace = getattr(_trace_local, 'current', None)
+    if trace:
+        trace.labels.update(labels)
+
+
+def finish_trace(trace, **extra):
+    _trace_local.current = None
+    duration = time.perf_counter() - trace.started
+    if duration >= SLOW_REQUEST_SECONDS:
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'name': trace.name,
+            'seconds': round(duration, 3),
+            **trace.labels, **extra,
+            'spans': trace.spans,
+        }
+        print(f"🐢 Slow {trace.name}: {duration:.2f}s " +
+              ', '.join(f"{s['stage']}={s['ms']}ms" for s in trace.spans))
         try:
-            if pythoncom:
-                pythoncom.CoInitialize()
-            from docx2pdf import convert
-            convert(docx_path, pdf_path)
-            if os.path.exists(pdf_path):
-                return pdf_path
+            with _slow_log_lock, open(SLOW_LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"Slow log write failed: {e}")
+    return duration
+
+
+@contextmanager
+def span(stage, backend=None):
+    """ეტაპის დრო -> ჰისტოგრამა (doc_type მიმდინარე trace-იდან) და trace-ის ჩანაწერი"""
+    trace = getattr(_trace_local, 'current', None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        doc_type = trace.labels.get('doc_type') if trace else None
+        STAGE_SECONDS.observe(elapsed, stage=stage, doc_type=doc_type, backend=backend)
+        if trace:
+            trace.spans.append({'stage': stage, 'backend': backend, 'ms': round(elapsed * 1000, 1)})
+
+
+# ======================== Signature Normalization ========================
+#
+# ატვირთვისას ხელმოწერა/ბეჭედი ერთხელ მუშავდება: თეთრი ფონი ხდება გამჭვირვალე,
+# კიდეები იჭრება, სურათი მცირდება ბეჭდვისთვის საჭირო ზომამდე და ინახება
+# ოპტიმიზებულ PNG-ად; base64 ვარიანტი ინახება გვერდით (.b64), რომ ყოველ
+# ჩატვირთვაზე თავიდან არ დაიშიფროს.
+
+SIGNATURE_PRINT_DPI = 300
+SIGNATURE_MAX_WIDTH_IN = 1.2   # უდიდესი ხელმოწერა განლაგებებში
+SIGNATURE_MAX_HEIGHT_IN = 1.2
+SIGNATURE_WHITE_LEVEL = 235    # ამაზე ღია პიქსელები ფონად ითვლება
+SIGNATURE_TYPES = ['doctor', 'head', 'stamp']
+
+
+def normalize_signature(blob):
+    """სურათის bytes -> ნორმალიზებული PNG bytes (Pillow-ის გარეშე - უცვლელი)"""
+    if not load_pillow():
+        return blob
+    with PILImage.open(BytesIO(blob)) as img:
+        img.load()
+        img = img.convert('RGBA')
+
+    # თეთრი/ღია ფონი -> გამჭვირვალე
+    r, g, b, alpha = img.split()
+    ink = img.convert('L').point(lambda v: 0 if v >= SIGNATURE_WHITE_LEVEL else 255)
+    alpha = ImageChops.multiply(alpha, ink)
+    img.putalpha(alpha)
+
+    # ცარიელი კიდეების მოჭრა
+    bbox = alpha.getbbox()
+    if bbox:
+        img = img.crop(bbox)
+
+    # ბეჭდვისთვის საკმარისი გარჩევადობა
+    max_size = (int(SIGNATURE_MAX_WIDTH_IN * SIGNATURE_PRINT_DPI),
+                int(SIGNATURE_MAX_HEIGHT_IN * SIGNATURE_PRINT_DPI))
+    if img.width > max_size[0] or img.height > max_size[1]:
+        img.thumbnail(max_size, PILImage.LANCZOS)
+
+    out = BytesIO()
+    img.save(out, format='PNG', optimize=True, dpi=(SIGNATURE_PRINT_DPI, SIGNATURE_PRINT_DPI))
+    return out.getvalue()
+
+
+def _signature_data_url(blob, ext='png'):
+    return f'data:image/{ext};base64,' + base64.b64encode(blob).decode('utf-8')
+
+
+def store_signature(sig_type, blob):
+    """ნორმალიზებული ხელმოწერის შენახვა: {type}_signature.png + .b64"""
+    try:
+        blob, ext = normalize_signature(blob), 'png'
+    except Exception as e:
+        print(f"Signature normalization failed, storing original: {e}")
+        load_docx()
+        try:
+            ext = DocxImage.from_blob(blob).ext
+        except Exception:
+            raise ValueError('Unsupported image file')
+
+    # ძველი ვარიანტები (სხვა გაფართოებით) აღარ უნდა ჩაიტვირთოს
+    for old_ext in ['png', 'jpg', 'jpeg']:
+        for suffix in ['', '.b64']:
+            old = os.path.join(SIGNATURES_FOLDER, f'{sig_type}_signature.{old_ext}{suffix}')
+            if os.path.exists(old):
+                os.remove(old)
+
+    path = os.path.join(SIGNATURES_FOLDER, f'{sig_type}_signature.{ext}')
+    data_url = _signature_data_url(blob, ext)
+    atomic_write(path, blob)
+    atomic_write(path + '.b64', data_url.encode('utf-8'))
+    return blob, data_url
+
+
+def read_signature(sig_type):
+    """შენახული ხელმოწერა -> (bytes, data URL) ან None"""
+    for ext in ['png', 'jpg', 'jpeg']:
+        path = os.path.join(SIGNATURES_FOLDER, f'{sig_type}_signature.{ext}')
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            blob = f.read()
+        b64_path = path + '.b64'
+        if os.path.exists(b64_path) and os.path.getmtime(b64_path) >= os.path.getmtime(path):
+            with open(b64_path, encoding='utf-8') as f:
+                return blob, f.read()
+        # ძველი (დაუმუშავებელი) ფაილი - ერთჯერადი ნორმალიზაცია
+        return store_signature(sig_type, blob)
+    return None
+
+
+# ======================== Signature Cache ========================
+#
+# ხელმოწერები დეკოდირდება, მოწმდება და იზომება ერთხელ; ერთი და იგივე სურათი
+# (data URL ან 'sig:<sha1>' მითითება) ყველა დოკუმენტში ქეშიდან მოდის.
+# '@saved:doctor' - signatures/-ში ამჟამად შენახული ხელმოწერა (მხოლოდ API/ჯგუფური
+# მოთხოვნებისთვის; ფორმა აგზავნის 'sig:<sha1>'-ს - ზუსტად იმ სურათს, რაც ეკრანზეა).
+# გადაუჭრელი მითითება -> UnresolvedReference (4xx), ხელმოწერის გარეშე დოკუმენტი არ იქმნება.
+
+SIGNATURE_CACHE_SIZE = 32
+SIGNATURE_REF_PREFIX = 'sig:'
+SAVED_SIGNATURE_PREFIX = '@saved:'
+
+_signature_cache = OrderedDict()  # data URL / 'sig:<sha1>' -> SignatureImage
+_signature_lock = threading.Lock()
+
+
+class UnresolvedReference(LookupError):
+    """
+    მოთხოვნის მითითება ('sig:', '@saved:', '@blob:', template_id) ვერ გაიხსნა.
+    დოკუმენტი ხელმოწერის გარეშე არ იქმნება - კლიენტი იღებს 4xx-ს და აგზავნის სრულ მონაცემებს.
+    """
+
+    def __init__(self, message, field=None, status=409):
+        super().__init__(message)
+        self.field = field
+        self.status = status
+
+
+class SignatureImage:
+    """დეკოდირებული ხელმოწერა: bytes, sha1 და python-docx-ის Image (ზომები)"""
+
+    def __init__(self, blob):
+        self.blob = blob
+        self.sha1 = hashlib.sha1(blob).hexdigest()
+        load_docx()
+        try:
+            self.image = DocxImage.from_blob(blob)
         except Exception as e:
-            print(f"docx2pdf failed: {e}")
+            print(f"Signature image is not valid: {e}")
+            self.image = None
+
+    @property
+    def ref(self):
+        return SIGNATURE_REF_PREFIX + self.sha1
+
+    def stream(self):
+        return BytesIO(self.blob)
+
+
+def _cache_signature(key, sig):
+    _signature_cache[key] = sig
+    _signature_cache[sig.ref] = sig
+    _signature_cache.move_to_end(key)
+    _signature_cache.move_to_end(sig.ref)
+    while len(_signature_cache) > SIGNATURE_CACHE_SIZE * 2:
+        _signature_cache.popitem(last=False)
+
+
+def register_signature(blob):
+    """ფაილიდან წაკითხული ხელმოწერის ქეშში დამატება (მითითებისთვის)"""
+    sig = SignatureImage(blob)
+    with _signature_lock:
+        _cache_signature(sig.ref, _signature_cache.get(sig.ref, sig))
+    return sig
+
+
+def _register_saved_signatures():
+    for sig_type in SIGNATURE_TYPES:
+        try:
+            saved = read_signature(sig_type)
+        except OSError:
+            continue
+        if saved:
+            register_signature(saved[0])
+
+
+_saved_signature_refs = {}  # sig_type -> ((ფაილი, mtime), 'sig:<sha1>')
+
+
+def _saved_signature_file(sig_type):
+    for ext in ['png', 'jpg', 'jpeg']:
+        path = os.path.join(SIGNATURES_FOLDER, f'{sig_type}_signature.{ext}')
+        if os.path.exists(path):
+            return path, os.path.getmtime(path)
+    return None
+
+
+def saved_signature_ref(sig_type):
+    """შენახული ხელმოწერა -> 'sig:<sha1>' ან None (ფაილი ხელახლა იკითხება მხოლოდ შეცვლისას)"""
+    if sig_type not in SIGNATURE_TYPES:
+        return None
+    stamp = _saved_signature_file(sig_type)
+    cached = _saved_signature_refs.get(sig_type)
+    if stamp and cached and cached[0] == stamp:
+        return cached[1]
+    saved = read_signature(sig_type)
+    if not saved:
+        return None
+    ref = register_signature(saved[0]).ref
+    _saved_signature_refs[sig_type] = (_saved_signature_file(sig_type), ref)
+    return ref
+
+
+def resolve_signature_refs(data):
+    """
+    '@saved:<type>' მნიშვნელობები -> 'sig:<sha1>' (რენდერის ქეშის გასაღებიც სურათს მიჰყვება).
+    უცნობი 'sig:<sha1>' ან შენახული ფაილის გარეშე '@saved:' -> UnresolvedReference
+    """
+    resolved = {}
+    for key, value in data.items():
+        if isinstance(value, str) and value.startswith(SAVED_SIGNATURE_PREFIX):
+            ref = saved_signature_ref(value[len(SAVED_SIGNATURE_PREFIX):])
+            if not ref:
+                raise UnresolvedReference(f'შენახული ხელმოწერა ვერ მოიძებნა: {value}', key)
+            value = ref
+        elif isinstance(value, str) and value.startswith(SIGNATURE_REF_PREFIX) and not load_signature(value):
+            raise UnresolvedReference(f'ხელმოწერა სერვერზე აღარ არის: {value}', key)
+        resolved[key] = value
+    return resolved
+
+
+def expand_signature_refs(data):
+    """
+    'sig:<sha1>' -> data URL. სხვა პროცესისთვის (ჯგუფური აწყობის პული): შვილ პროცესს
+    საკუთარი, ცარიელი ქეში აქვს და მხოლოდ signatures/-ში შენახულ ხელმოწერებს აღადგენს
+    """
+    expanded = {}
+    for key, value in data.items():
+        if isinstance(value, str) and value.startswith(SIGNATURE_REF_PREFIX):
+            sig = load_signature(value)
+            if not sig:
+                raise UnresolvedReference(f'ხელმოწერა სერვერზე აღარ არის: {value}', key)
+            mime = sig.image.content_type if sig.image else 'image/png'
+            value = f'data:{mime};base64,' + base64.b64encode(sig.blob).decode('ascii')
+        expanded[key] = value
+    return expanded
+
+
+def load_signature(value):
+    """data URL ან 'sig:<sha1>' -> SignatureImage (ქეშირებული) ან None"""
+    if not value or not isinstance(value, str):
+        return None
+
+    with _signature_lock:
+        sig = _signature_cache.get(value)
+        if sig:
+            _signature_cache.move_to_end(value)
+            return sig
+
+    if value.startswith(SIGNATURE_REF_PREFIX):
+        # ქეშიდან გასული მითითება - signatures/ საქაღალდიდან აღდგენა
+        _register_saved_signatures()
+        with _signature_lock:
+            sig = _signature_cache.get(value)
+        if not sig:
+            print(f"Unknown signature reference: {value}")
+        return sig
+
+    img_stream = decode_base64_image(value)
+    if not img_stream:
+        return None
+    blob = img_stream.getvalue()
+    try:
+        # ფორმაში/შაბლონში ჩაწერილი ორიგინალიც იმავე დამუშავებას გადის
+        blob = normalize_signature(blob)
+    except Exception:
+        pass
+    sig = SignatureImage(blob)
+    with _signature_lock:
+        _cache_signature(value, sig)
+    return sig
+
+
+# ======================== LibreOffice Pool ========================
+#
+# ჩვეულებრივ Python-ში uno მოდული არ არის, ამიტომ გრძელვადიან listener-ს
+# მართავს LibreOffice-ის საკუთარი python (program/python ან სისტემური python3
+# python3-uno-თი) - პატარა bridge პროცესი, რომელიც stdin/stdout-ით იღებს
+# JSON ხაზებს {"src", "dest"} და აბრუნებს {"ok"} / {"error"}. ერთჯერადი
+# `soffice --convert-to` რჩება მხოლოდ მაშინ, როცა uno-იანი python საერთოდ ვერ მოიძებნა.
+
+_LO_BRIDGE_SOURCE = r"""
+import sys, json, time, uno
+from com.sun.star.beans import PropertyValue
+
+def props(**kwargs):
+    out = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        out.append(prop)
+    return tuple(out)
+
+port, timeout = int(sys.argv[1]), float(sys.argv[2])
+local_ctx = uno.getComponentContext()
+resolver = local_ctx.ServiceManager.createInstanceWithContext('com.sun.star.bridge.UnoUrlResolver', local_ctx)
+deadline = time.monotonic() + timeout
+while True:
+    try:
+        ctx = resolver.resolve('uno:socket,host=127.0.0.1,port=%d;urp;StarOffice.ComponentContext' % port)
+        break
+    except Exception:
+        if time.monotonic() > deadline:
+            print(json.dumps({'error': 'listener did not start'}), flush=True)
+            sys.exit(1)
+        time.sleep(0.25)
+desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+print(json.dumps({'ready': True}), flush=True)
+
+for line in sys.stdin:
+    job = json.loads(line)
+    try:
+        doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(job['src']), '_blank', 0,
+                                           props(Hidden=True, ReadOnly=True))
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(job['dest']), props(FilterName='writer_pdf_Export'))
         finally:
+            doc.close(True)
+        print(json.dumps({'ok': True}), flush=True)
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), flush=True)
+"""
+
+
+def find_libreoffice_python(soffice):
+    """uno-იანი python: LO_PYTHON, LibreOffice-ის ჩაშენებული program/python, სისტემური python3"""
+    program = os.path.dirname(os.path.realpath(soffice))
+    candidates = [os.environ.get('LO_PYTHON'),
+                  os.path.join(program, 'python.exe'), os.path.join(program, 'python'),
+                  # macOS: Contents/MacOS/soffice -> Contents/Resources/python
+                  os.path.join(os.path.dirname(program), 'Resources', 'python'),
+                  shutil.which('python3')]
+    for path in candidates:
+        if not path or not os.path.isfile(path):
+            continue
+        try:
+            probe = subprocess.run([path, '-c', 'import uno'], stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if probe.returncode == 0:
+            return path
+    return None
+
+
+def _uno_props(**kwargs):
+    """UNO PropertyValue-ების tuple"""
+    props = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+class LibreOfficeInstance:
+    """
+    ერთი გრძელვადიანი headless LibreOffice საკუთარი პროფილით და socket listener-ით.
+    listener-ს მართავს uno (თუ ამ Python-შია) ან bridge პროცესი LibreOffice-ის
+    python-ით; ორივეს არარსებობისას - ერთჯერადი პროცესი ამ ინსტანციის პროფილით.
+    """
+
+    def __init__(self, soffice, index, python=None):
+        self.soffice = soffice
+        self.index = index
+        self.python = python  # bridge-ის python (uno-ს გარეშე)
+        self.port = LO_BASE_PORT + index
+        self.profile_dir = os.path.join(LO_PROFILES_FOLDER, f'worker_{index}')
+        self.process = None
+        self.desktop = None
+        self.bridge = None
+
+    @property
+    def profile_url(self):
+        return Path(self.profile_dir).as_uri()
+
+    def start(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        if not uno and not self.python:
+            return
+        self.process = subprocess.Popen([
+            self.soffice,
+            f'-env:UserInstallation={self.profile_url}',
+            '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if uno:
+            self._connect()
+        else:
+            self._start_bridge()
+
+    def _start_bridge(self):
+        self.bridge = subprocess.Popen(
+            [self.python, '-c', _LO_BRIDGE_SOURCE, str(self.port), str(LO_CONVERT_TIMEOUT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding='utf-8', bufsize=1)
+        reply = self._bridge_reply()
+        if not reply.get('ready'):
+            raise RuntimeError(f"LibreOffice worker {self.index} did not start: {reply.get('error')}")
+
+    def _bridge_reply(self):
+        line = self.bridge.stdout.readline()
+        if not line:
+            raise RuntimeError(f'LibreOffice bridge {self.index} exited')
+        return json.loads(line)
+
+    def _connect(self):
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_ctx)
+        url = f'uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext'
+        deadline = time.monotonic() + LO_CONVERT_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(url)
+                self.desktop = ctx.ServiceManager.createInstanceWithContext(
+                    'com.sun.star.frame.Desktop', ctx)
+                return
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'LibreOffice worker {self.index} did not start')
+                time.sleep(0.25)
+
+    def stop(self):
+        self.desktop = None
+        for attr in ('bridge', 'process'):
+            proc = getattr(self, attr)
+            setattr(self, attr, None)
+            if proc and proc.poll() is None:
+                proc.kill()
+                try:
+                    proc.wait(timeout=5)
+                except Exception:
+                    pass
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def is_healthy(self):
+        if not uno and not self.python:
+            return True
+        if not self.process or self.process.poll() is not None:
+            return False
+        if not uno:
+            return bool(self.bridge) and self.bridge.poll() is None
+        if not self.desktop:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', self.port), timeout=2):
+                pass
+            self.desktop.getFrames()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, docx_path, output_folder):
+        name = os.path.splitext(os.path.basename(docx_path))[0] + '.pdf'
+        pdf_path = os.path.join(output_folder, name)
+
+        if uno:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(os.path.abspath(docx_path)), '_blank', 0,
+                _uno_props(Hidden=True, ReadOnly=True))
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                               _uno_props(FilterName='writer_pdf_Export'))
+            finally:
+                doc.close(True)
+        elif self.python:
+            bridge = self.bridge
+            bridge.stdin.write(json.dumps({'src': os.path.abspath(docx_path),
+                                           'dest': os.path.abspath(pdf_path)}) + '\n')
+            bridge.stdin.flush()
+            reply = self._bridge_reply()
+            if 'error' in reply:
+                raise RuntimeError(reply['error'])
+        else:
+            proc = subprocess.Popen([
+                self.soffice, f'-env:UserInstallation={self.profile_url}',
+                '--headless', '--convert-to', 'pdf', '--outdir', output_folder, docx_path
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.process = proc
+            proc.wait()
+            self.process = None
+
+        return pdf_path if os.path.exists(pdf_path) else None
+
+
+class LibreOfficePool:
+    """
+    LibreOffice ინსტანციების პული შეზღუდული რიგით.
+    თითო ინსტანციას ემსახურება საკუთარი thread; ჩავარდნილი ან 60 წამზე მეტხანს
+    გაჭედილი ინსტანცია ავტომატურად გადაიტვირთება.
+    """
+
+    def __init__(self, soffice, size=LO_POOL_SIZE, queue_size=LO_QUEUE_SIZE):
+        self.jobs = queue.Queue(maxsize=queue_size)
+        python = None if uno else find_libreoffice_python(soffice)
+        if not uno and not python:
+            print("⚠️  LibreOffice: uno-იანი python ვერ მოიძებნა - თითო კონვერტაცია ცალკე soffice პროცესით")
+        self.instances = [LibreOfficeInstance(soffice, i, python) for i in range(size)]
+        self.threads = []
+        for inst in self.instances:
+            t = threading.Thread(target=self._worker, args=(inst,), daemon=True,
+                                 name=f'lo-worker-{inst.index}')
+            t.start()
+            self.threads.append(t)
+
+    def _worker(self, inst):
+        try:
+            inst.start()
+        except Exception as e:
+            print(f"LibreOffice worker {inst.index} start failed: {e}")
+
+        while True:
+            try:
+                job = self.jobs.get(timeout=LO_HEALTH_INTERVAL)
+            except queue.Empty:
+                # უქმად ყოფნისას ჯანმრთელობის შემოწმება
+                if not inst.is_healthy():
+                    self._restart(inst)
+                continue
+
+            if job is None:
+                inst.stop()
+                return
+
+            if not inst.is_healthy():
+                self._restart(inst)
+
+            with job['lock']:
+                if job['cancelled']:
+                    continue  # გამომძახებელმა ლოდინს თავი დაანება
+                job['instance'] = inst
+                job['started'].set()
+            try:
+                job['result'] = inst.convert(job['docx_path'], job['output_folder'])
+            except Exception as e:
+                print(f"LibreOffice worker {inst.index} failed: {e}")
+                self._restart(inst)
+            finally:
+                job['done'].set()
+
+    def _restart(self, inst):
+        try:
+            inst.restart()
+        except Exception as e:
+            print(f"LibreOffice worker {inst.index} restart failed: {e}")
+
+    def convert(self, docx_path, output_folder, timeout=LO_CONVERT_TIMEOUT):
+        job = {
+            'docx_path': docx_path,
+            'output_folder': output_folder,
+            'started': threading.Event(),
+            'done': threading.Event(),
+            'instance': None,
+            'result': None,
+            'lock': threading.Lock(),
+            'cancelled': False,
+        }
+        try:
+            self.jobs.put(job, timeout=LO_QUEUE_TIMEOUT)
+        except queue.Full:
+            print("LibreOffice pool queue is full")
+            return None
+
+        if not job['started'].wait(LO_QUEUE_TIMEOUT):
+            with job['lock']:
+                if not job['started'].is_set():
+                    # რიგში დარჩენილ დავალებას worker გამოტოვებს
+                    job['cancelled'] = True
+                    print("LibreOffice pool: job waited too long in queue")
+                    return None
+
+        if not job['done'].wait(timeout):
+            # გაჭედილი ინსტანცია - პროცესის მოკვლა, worker თავად გადატვირთავს
+            print(f"LibreOffice worker {job['instance'].index} timed out")
+            job['instance'].stop()
+            return None
+
+        return job['result']
+
+    def shutdown(self):
+        for _ in self.instances:
+            try:
+                self.jobs.put_nowait(None)
+            except queue.Full:
+                break
+        for inst in self.instances:
+            inst.stop()
+
+
+_lo_pool = None
+_lo_pool_lock = threading.Lock()
+
+
+def get_libreoffice_pool():
+    """საერთო პული შენახვისა და ბეჭდვისთვის (იქმნება პირველ გამოძახებაზე)"""
+    global _lo_pool
+    with _lo_pool_lock:
+        if _lo_pool is None:
+            lo = find_libreoffice()
+            if not lo:
+                return None
+            _lo_pool = LibreOfficePool(lo)
+            atexit.register(_lo_pool.shutdown)
+        return _lo_pool
+
+
+# ======================== Word Session ========================
+#
+# Windows-ზე Word-ის ერთი გრძელვადიანი COM სესია საკუთარ thread-ში. COM-ის
+# ინიციალიზაცია და დასრულება მხოლოდ ამ thread-ში ხდება. კონვერტაციები რიგით
+# მოდის ყველა მოთხოვნის thread-იდან, ამიტომ Word თითო დოკუმენტზე აღარ იხსნება
+# (მხოლოდ Open -> ExportAsFixedFormat -> Close). WORD_RECYCLE_AFTER დოკუმენტის
+# ან შეცდომის შემდეგ Word იხურება და შემდეგ კონვერტაციაზე ახლიდან ეშვება.
+# კონვერტაციის timeout-ისას გაჭედილი Word-ის პროცესი PID-ით კვდება, სესია ახალ
+# thread-სა და რიგს იწყებს და უკვე რიგში მყოფი სამუშაოები იქ გადადის.
+
+WD_EXPORT_FORMAT_PDF = 17
+WD_DO_NOT_SAVE_CHANGES = 0
+
+
+def word_process_id(word):
+    """DispatchEx-ით გაშვებული Word-ის PID (ფანჯრის უნიკალური სათაურით); ვერ დადგინდა -> None"""
+    if win32gui is None or win32process is None:
+        return None
+    caption = f'meddocs-word-{os.getpid()}-{threading.get_ident()}-{time.monotonic_ns()}'
+    try:
+        word.Caption = caption
+        hwnd = win32gui.FindWindow('OpusApp', caption)
+        if not hwnd:
+            return None
+        return win32process.GetWindowThreadProcessId(hwnd)[1]
+    except Exception as e:
+        print(f"Word PID lookup failed: {e}")
+        return None
+
+
+class WordWorker:
+    """ერთი Word პროცესი და მისი thread; გაჭედვისას მთლიანად იცვლება"""
+
+    def __init__(self, recycle_after, queue_size):
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.recycle_after = recycle_after
+        self.word = None
+        self.pid = None
+        self.converted = 0
+        self.thread = threading.Thread(target=self._worker, daemon=True, name='word-session')
+        self.thread.start()
+
+    def _start(self):
+        # DispatchEx - ახალი პროცესი, მომხმარებლის გახსნილ Word-ს არ ეხება
+        self.word = win32com.client.DispatchEx('Word.Application')
+        self.word.Visible = False
+        self.word.DisplayAlerts = 0
+        self.pid = word_process_id(self.word)
+        self.converted = 0
+
+    def _quit(self):
+        word, self.word = self.word, None
+        self.pid = None
+        if word is not None:
+            try:
+                word.Quit(WD_DO_NOT_SAVE_CHANGES)
+            except Exception as e:
+                print(f"Word quit failed: {e}")
+
+    def _convert(self, docx_path, pdf_path):
+        if self.word is None:
+            self._start()
+        doc = self.word.Documents.Open(os.path.abspath(docx_path), ConfirmConversions=False,
+                                       ReadOnly=True, AddToRecentFiles=False, Visible=False)
+        try:
+            doc.ExportAsFixedFormat(os.path.abspath(pdf_path), WD_EXPORT_FORMAT_PDF)
+        finally:
+            doc.Close(WD_DO_NOT_SAVE_CHANGES)
+
+        self.converted += 1
+        if self.converted >= self.recycle_after:
+            self._quit()
+        return pdf_path if os.path.exists(pdf_path) else None
+
+    def _worker(self):
+        pythoncom.CoInitialize()
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                try:
+                    job['result'] = self._convert(job['docx_path'], job['pdf_path'])
+                except Exception as e:
+                    print(f"Word conversion failed: {e}")
+                    self._quit()
+                finally:
+                    job['done'].set()
+        finally:
+            self._quit()
+            pythoncom.CoUninitialize()
+
+    def kill(self):
+        """გაჭედილი Word-ის პროცესის მოკვლა PID-ით (COM-ის გამოძახება thread-ში შეცდომით სრულდება)"""
+        pid = self.pid
+        if pid is None:
+            print("Word PID unknown, hung process left running")
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError as e:
+            print(f"Word kill failed: {e}")
+
+
+class WordSession:
+    """Word.Application-ის საკუთარი ინსტანცია (DispatchEx) და მისი კონვერტაციის რიგი.
+    timeout-ისას Word-ის პროცესი კვდება და ახალი thread იწყება, რიგში მყოფი სამუშაოები გადადის"""
+
+    def __init__(self, recycle_after=WORD_RECYCLE_AFTER, queue_size=WORD_QUEUE_SIZE):
+        self.recycle_after = recycle_after
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.worker = WordWorker(recycle_after, queue_size)
+
+    def _restart(self, worker):
+        with self.lock:
+            # რამდენიმე timeout-მა ერთსა და იმავე worker-ზე მხოლოდ ერთხელ გადატვირთოს
+            if self.worker is not worker:
+                return
+            self.worker = WordWorker(self.recycle_after, self.queue_size)
+        worker.kill()
+        while True:
+            try:
+                job = worker.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                try:
+                    self.worker.jobs.put_nowait(job)
+                except queue.Full:
+                    job['done'].set()
+        try:
+            worker.jobs.put_nowait(None)
+        except queue.Full:
             pass
 
-    # 2) LibreOffice (fallback)
-    lo = find_libreoffice()
-    if lo:
+    def convert(self, docx_path, pdf_path, timeout=WORD_CONVERT_TIMEOUT):
+        """DOCX -> PDF სესიის thread-ში; შეცდომის, გადავსებული რიგის ან timeout-ისას None"""
+        job = {'docx_path': docx_path, 'pdf_path': pdf_path, 'done': threading.Event(), 'result': None}
+        worker = self.worker
+        try:
+            worker.jobs.put(job, timeout=timeout)
+        except queue.Full:
+            print("Word session queue is full")
+            return None
+        if not job['done'].wait(timeout):
+            print("Word conversion timed out, restarting Word")
+            self._restart(worker)
+            return None
+        return job['result']
+
+    def shutdown(self, timeout=10):
+        worker = self.worker
+        try:
+            worker.jobs.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        worker.thread.join(timeout)
+
+
+_word_session = None
+_word_session_lock = threading.Lock()
+
+
+def get_word_session():
+    """საერთო Word სესია (იქმნება პირველ გამოძახებაზე); Word-ის გარეშე None"""
+    global _word_session
+    with _word_session_lock:
+        if _word_session is None:
+            if win32com is None or pythoncom is None:
+                return None
+            _word_session = WordSession()
+            atexit.register(_word_session.shutdown)
+        return _word_session
+
+
+# ======================== Converter Probe ========================
+#
+# გაშვებისას ერთხელ მოწმდება, რომელი კონვერტორია ხელმისაწვდომი - Word (COM
+# სესია), LibreOffice, შიდა reportlab რენდერერი - და თითოეული „თბება“ ერთი
+# სატესტო კონვერტაციით (Word/LibreOffice-ის გაშვება, შრიფტები, skeleton-ები),
+# რომ პირველმა მოთხოვნამ ეს ფასი არ გადაიხადოს. მოთხოვნისას მიუწვდომელი ან
+# ზედიზედ ჩავარდნილი კონვერტორი აღარ იცდება.
+
+CONVERTER_BACKENDS = ('word', 'libreoffice', 'native')
+
+
+class ConverterRegistry:
+    """კონვერტორების სტატუსი: available, reason, path, warm_seconds, failures"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.warm_lock = threading.Lock()
+        self.warmed = False
+        self.status = {}
+
+    def probe(self):
+        for name in CONVERTER_BACKENDS:
+            status = {'available': False, 'reason': None, 'path': None, 'warm_seconds': None,
+                      'failures': 0, 'retry_at': 0, 'last_error': None}
+            try:
+                getattr(self, f'_probe_{name}')(status)
+            except Exception as e:
+                status.update(available=False, reason=f'probe failed: {e}')
+            with self.lock:
+                self.status[name] = status
+        return self.snapshot()
+
+    def warm(self):
+        """
+        ხელმისაწვდომი კონვერტორების გათბობა - ერთხელ, მიუხედავად იმისა, ვინ
+        შექმნა რეესტრი (გაშვება თუ უფრო ადრე მოსული მოთხოვნა)
+        """
+        with self.warm_lock:
+            if self.warmed:
+                return self.snapshot()
+            for name in CONVERTER_BACKENDS:
+                with self.lock:
+                    available = self.status[name]['available']
+                if not available:
+                    continue
+                started = time.perf_counter()
+                try:
+                    self._warm(name)
+                except Exception as e:
+                    with self.lock:
+                        self.status[name].update(available=False, reason=f'warm-up failed: {e}')
+                    continue
+                with self.lock:
+                    self.status[name]['warm_seconds'] = round(time.perf_counter() - started, 3)
+            self.warmed = True
+        return self.snapshot()
+
+    @staticmethod
+    def _probe_word(status):
+        if platform.system() != 'Windows':
+            status['reason'] = 'Windows only'
+        elif win32com is None or pythoncom is None:
+            status['reason'] = 'pywin32 not installed'
+        elif not _word_installed():
+            status['reason'] = 'Microsoft Word not installed'
+        else:
+            status['available'] = True
+
+    @staticmethod
+    def _probe_libreoffice(status):
+        status['path'] = find_libreoffice()
+        if status['path']:
+            status['available'] = True
+        else:
+            status['reason'] = 'soffice not found'
+
+    @staticmethod
+    def _probe_native(status):
+        if not load_reportlab():
+            status['reason'] = 'reportlab not installed'
+        elif not native_pdf_available():
+            status['reason'] = 'Georgian font not found'
+        else:
+            status['available'] = True
+
+    @staticmethod
+    def _warm(name):
+        """სატესტო კონვერტაცია დროებით საქაღალდეში"""
+        with tempfile.TemporaryDirectory(prefix='meddocs_warmup_') as tmp:
+            if name == 'native':
+                render_pdf_document({}, 'form_100', BytesIO(), 10)
+                return
+            docx_path = save_docx('form_100', {}, os.path.join(tmp, 'warmup.docx'), font_size_pt=10)
+            if name == 'word':
+                pdf_paths = [get_word_session().convert(docx_path, docx_path[:-len('.docx')] + '.pdf')]
+            else:
+                # თითო ინსტანციას თავისი სატესტო ფაილი
+                pool = get_libreoffice_pool()
+                copies = [shutil.copy(docx_path, os.path.join(tmp, f'warmup_{i}.docx'))
+                          for i in range(len(pool.instances))]
+                with ThreadPoolExecutor(max_workers=len(copies)) as ex:
+                    pdf_paths = list(ex.map(lambda p: pool.convert(p, tmp), copies))
+            if not all(p and os.path.exists(p) for p in pdf_paths):
+                raise RuntimeError('no PDF produced')
+
+    def ready(self, name):
+        """კონვერტორი ხელმისაწვდომია და ამჟამად არ არის გამოტოვებული"""
+        with self.lock:
+            status = self.status.get(name)
+            return bool(status and status['available'] and time.monotonic() >= status['retry_at'])
+
+    def succeeded(self, name):
+        with self.lock:
+            self.status[name].update(failures=0, retry_at=0)
+
+    def failed(self, name, error):
+        with self.lock:
+            status = self.status[name]
+            status['failures'] += 1
+            status['last_error'] = str(error)
+            if status['failures'] >= CONVERTER_MAX_FAILURES:
+                status['retry_at'] = time.monotonic() + CONVERTER_RETRY_SECONDS
+                print(f"⚠️  {name}: {status['failures']} failures, skipped for {CONVERTER_RETRY_SECONDS}s")
+
+    def snapshot(self):
+        with self.lock:
+            return {name: dict(status, ready=status['available'] and time.monotonic() >= status['retry_at'])
+                    for name, status in self.status.items()}
+
+
+def _word_installed():
+    """Word.Application COM კლასი რეგისტრირებულია?"""
+    if winreg is None:
+        return False
+    try:
+        winreg.CloseKey(winreg.OpenKey(winreg.HKEY_CLASSES_ROOT, r'Word.Application\CLSID'))
+        return True
+    except OSError:
+        return False
+
+
+_converters = None
+_converters_lock = threading.Lock()
+
+
+def get_converters(warm=False):
+    """
+    კონვერტორების რეესტრი; პირველ გამოძახებაზე მოწმდება. warm=True (გაშვებისას) -
+    გათბობა, თუნდაც რეესტრი უკვე შექმნილი იყოს (warm() იდემპოტენტურია)
+    """
+    global _converters
+    with _converters_lock:
+        if _converters is None:
+            registry = ConverterRegistry()
+            registry.probe()
+            _converters = registry
+    if warm:
+        _converters.warm()
+    return _converters
+
+
+def office_converter_ready():
+    """DOCX -> PDF კონვერტაცია შესაძლებელია? (Word ან LibreOffice)"""
+    converters = get_converters()
+    return converters.ready('word') or converters.ready('libreoffice')
+
+
+def convert_to_pdf(docx_path, output_folder):
+    converters = get_converters()
+    pdf_path = docx_path.replace('.docx', '.pdf')
+
+    # 1) Windows + Word (საერთო COM სესია)
+    if converters.ready('word'):
+        with span('convert', backend='word'):
+            word_pdf = get_word_session().convert(docx_path, pdf_path)
+        if word_pdf:
+            converters.succeeded('word')
+            return word_pdf
+        converters.failed('word', 'no PDF produced')
+
+    # 2) LibreOffice (fallback) - მუდმივი ინსტანციების პულით
+    pool = get_libreoffice_pool() if converters.ready('libreoffice') else None
+    if pool:
         try:
-            subprocess.run([
-                lo, '--headless', '--convert-to', 'pdf',
-                '--outdir', output_folder, docx_path
-            ], capture_output=True, timeout=60)
-            if os.path.exists(pdf_path):
-                return pdf_path
+            with span('convert', backend='libreoffice'):
+                lo_pdf = pool.convert(docx_path, output_folder)
+            if lo_pdf and os.path.exists(lo_pdf):
+                converters.succeeded('libreoffice')
+                return lo_pdf
+            converters.failed('libreoffice', 'no PDF produced')
         except Exception as e:
             print(f"LibreOffice failed: {e}")
+            converters.failed('libreoffice', e)
 
     return None
 
 
+# ======================== Document Layouts ========================
+#
+# ორივე დოკუმენტის განლაგება აღწერილია დეკლარაციულად: ბლოკები (აბზაცი, ცხრილი,
+# სექცია, სია, გვერდის გაწყვეტა), ტექსტის შაბლონები {field} ველებით, ფერები და
+# შრიფტის ზომები. compile_layout() ერთხელ, გაშვებისას, აქცევს მას render plan-ად;
+# მოთხოვნისას მხოლოდ მნიშვნელობები ივსება. BASE = დოკუმენტის ძირითადი ზომა
+# (ფორმა 100: 11 შენახვისთვის, 10 ბეჭდვისთვის - ერთი და იგივე plan).
+
+BASE = 'base'
+
+
+def run(text, bold=False, italic=False, size=None):
+    return {'text': text, 'bold': bold, 'italic': italic, 'size': size}
+
+
+def pic(key, width, missing=None, error=None):
+    """ხელმოწერის სურათი; missing/error - ტექსტი სურათის ნაცვლად"""
+    return {'image': key, 'width': width, 'missing': missing, 'error': error}
+
+
+def when(key, text):
+    """ტექსტის ნაწილი, რომელიც მხოლოდ key ველის შევსებისას ჩანს"""
+    return {'when': key, 'text': text}
+
+
+def para(*runs, align=None, style=None):
+    return {'kind': 'paragraph', 'runs': [r if isinstance(r, dict) else run(r) for r in runs],
+            'align': align, 'style': style}
+
+
+def blank():
+    return {'kind': 'blank'}
+
+
+def page_break():
+    return {'kind': 'page_break'}
+
+
+def bullets(key, heading):
+    """key ველის თითო ხაზი - 'List Bullet' აბზაცი დახრილი სათაურით"""
+    return {'kind': 'bullets', 'key': key, 'heading': heading}
+
+
+def cell(*runs, shading=None, align=None, span=1):
+    return {'runs': [r if isinstance(r, dict) else run(r) for r in runs],
+            'shading': shading, 'align': align, 'span': span}
+
+
+def table(rows, cols, style='Table Grid', align=None):
+    return {'kind': 'table', 'rows': rows, 'cols': cols, 'style': style, 'align': align}
+
+
+def section(title, shading, rows, cols=2):
+    """'Table Grid' ცხრილი შეფერილი (გაერთიანებული) სათაურის სტრიქონით"""
+    head = [cell(title, shading=shading, span=cols)]
+    return table([head] + [list(r) for r in rows], cols)
+
+
+FORM_100_LAYOUT = {
+    'font_size': None,
+    'defaults': {
+        'form_type': 'სამედიცინო დოკუმენტაცია ფორმა № IV-100/ა',
+        'transfer_to_hospital': '-',
+    },
+    'blocks': [
+        para(run('დანართი №2 დამტკიცებულია საქართველოს შრომის\nჯანმრთელობისა და სოციალური დაცვის მინისტრის\n'
+                 '2013 წ 03.12 №01-42/ნ ბრძანებით', size=8, italic=True), align='right'),
+        para(run('{form_type}', bold=True), align='center'),
+        para(run('ცნობა ჯანმრთელობის მდგომარეობის შესახებ', bold=True, size=12), align='center'),
+        para('გაცემის თარიღი: {document_date}     ბარათის №: {registration_number}', align='center'),
+        blank(),
+
+        section("1. გამცემი ორგანიზაცია", "D9E2F3", [
+            ("დასახელება:", '{facility_name}'),
+            ("საიდენტიფიკაციო კოდი:", '{identification_code}'),
+            ("მისამართი:", '{facility_address}'),
+        ]),
+        blank(),
+        section("2. მიმღები ორგანიზაცია", "D9E2F3", [
+            ("დასახელება:", '{recipient_name}'),
+        ]),
+        blank(),
+        section("პაციენტის მონაცემები", "E2EFDA", [
+            ("3. სახელი, გვარი:", '{patient_name}'),
+            ("4. დაბადების თარიღი:", '{birth_date}'),
+            ("5. პირადი ნომერი:", '{personal_id}'),
+            ("6. მისამართი:", '{patient_address}'),
+            ("7. სამუშაო ადგილი:", '{occupation}'),
+        ]),
+        blank(),
+        section("8. ჰოსპიტალიზაციის ვადები", "D9E2F3", [
+            ('მიღება: {hospitalization_date}', 'გაწერა: {discharge_date}'),
+        ]),
+        blank(),
+        section("9. დიაგნოზი", "FCE4D6", [
+            ("ძირითადი:", '{main_diagnosis}'),
+            ("ექიმის მიერ დაზუსტება:", '{case_code}'),
+        ]),
+        blank(),
+        section("10. გადატანილი დაავადებები", "D9E2F3", [('{past_diseases}',)], cols=1),
+        blank(),
+        section("11. მოკლე ანამნეზი", "D9E2F3", [('{anamnesis}',)], cols=1),
+        blank(),
+        section("12. ჩატარებული გამოკვლევები", "D9E2F3", [
+            (cell(run('სისხლის საერთო ანალიზი BL.6: {blood_analysis}', size=BASE)),),
+            ('გლუკოზის განსაზღვრა სისხლის შრატში BL.12.1: {biochemistry}',),
+            ('ინსტრუმენტული კვლევები: {instrumental}',),
+        ], cols=1),
+        blank(),
+        section("13. დაავადების მიმდინარეობა", "D9E2F3", [(
+            'ტიპი: {course_type}\n'
+            '\n'
+            'მიღებისას: {admission_status}\n'
+            'ვიტალური მაჩვენებლები: T-{admission_temp}°C | HR-{admission_hr} | BP-{admission_bp} | '
+            'RR-{admission_rr} | SpO2-{admission_spo2}\n'
+            '\n'
+            'გაწერისას: {discharge_status}\n'
+            'ვიტალური მაჩვენებლები: T-{discharge_temp}°C | HR-{discharge_hr} | BP-{discharge_bp} | '
+            'RR-{discharge_rr} | SpO2-{discharge_spo2}',
+        )], cols=1),
+        blank(),
+        section("14. ჩატარებული მკურნალობა", "D9E2F3", [
+            ('მედიკამენტები:\n{medications}\n\nკოდი: {treatment_code}',),
+        ], cols=1),
+        blank(),
+        section("გამოსავალი", "E2EFDA", [
+            ("15. სტაციონარში გადაყვანა:", '{transfer_to_hospital!o}'),
+            ("16. გაწერის მდგომარეობა:", '{discharge_condition}'),
+            ("17. რეკომენდაციები:", '{recommendations}'),
+        ]),
+        blank(),
+        section("ხელმოწერები", "D9E2F3", [
+            ("18. მკურნალი ექიმი:", '{attending_doctor}'),
+            ("19. დაწესებულების ხელმძღვანელი:", '{facility_head}'),
+            ("20. ცნობის გაცემის თარიღი:", '{issue_date}'),
+        ]),
+        blank(),
+
+        # ელექტრონული ხელმოწერები (სურათები)
+        table([
+            [cell(lbl, align='center') for lbl in ["ექიმის ხელმოწერა", "ბეჭედი", "ხელმძღვანელის ხელმოწერა"]],
+            [cell(pic(key, 1.2, missing='________________', error='Error'), align='center')
+             for key in ['doctor_signature_image', 'stamp_image', 'head_signature_image']],
+        ], 3, style=None, align='center'),
+    ],
+}
+
+
+MEDICAL_RECORD_LAYOUT = {
+    'font_size': 11,
+    'defaults': {
+        'facility_name': 'პრემიუმ მედ გრუპი',
+        'department': 'გადაუდებელი მედიცინა',
+        'card_number': '-',
+        'patient_name': '-',
+        'admission_status': 'თვითდინებით',
+        'allergies': 'არა',
+    },
+    'blocks': [
+        para(run('{facility_name}', bold=True, size=14), align='center'),
+        para('{department}', align='center'),
+        blank(),
+
+        section("პაციენტის მონაცემები", "E2EFDA", [
+            ("ბარათის №:", '{card_number}'),
+            ("სახელი, გვარი:", '{patient_name}'),
+            ("მიღების სტატუსი:", '{admission_status}'),
+        ]),
+        blank(),
+        section("დიაგნოზი (ICD-10)", "FCE4D6", [
+            ('კოდი: {icd_code}', '{diagnosis_description}'),
+        ]),
+        blank(),
+        section("ჩივილები", "D9E2F3", [('{complaints}',)], cols=1),
+        blank(),
+        section("ანამნეზი", "D9E2F3", [('{anamnesis}',)], cols=1),
+        blank(),
+
+        para(run('ალერგიები: ', bold=True), '{allergies}'),
+        blank(),
+
+        # ობიექტური სტატუსი
+        para(run('ობიექტური სტატუსი', bold=True, size=12), align='center'),
+        table([
+            [cell(h, shading='D0D0D0', align='center') for h in ["T°C", "BP", "HR", "RR", "SpO₂"]],
+            [cell(v, align='center') for v in
+             ['{temperature}', '{blood_pressure}', '{heart_rate}', '{respiratory_rate}', '{spo2}']],
+        ], 5),
+        blank(),
+        table([[cell(label, shading='F2F2F2'), value] for label, value in [
+            ("ზოგადი მდგომარეობა:", '{general_condition}'),
+            ("კანი:", '{skin}'),
+            ("პერიფერიული შეშუპება:", '{edema}'),
+            ("გულ-სისხლძარღვთა:", '{cardiovascular}'),
+            ("სასუნთქი სისტემა:", '{respiratory}'),
+            ("საჭმლის მომნელებელი:", '{digestive}'),
+            ("შარდგამომყოფი:", '{urinary}'),
+            ("ნერვული სისტემა:", '{neurological}'),
+            ("საყრდენ-მამოძრავებელი:", '{musculoskeletal}'),
+        ]], 2),
+        blank(),
+
+        para(run('წინასწარი დიაგნოზი: ', bold=True), '{preliminary_diagnosis}'),
+        # [1] ექიმის ხელმოწერა (დიაგნოზთან)
+        para(run('მკურნალი ექიმი: ', bold=True), '{doctor}', pic('doctor_signature_image', 0.8)),
+
+        page_break(),
+
+        # მიმდინარეობის ფურცელი
+        para(run('პაციენტის მიმდინარეობის ფურცელი (დღიური)', bold=True, size=14), align='center'),
+        blank(),
+        section(['პირველადი შეფასება / მიღება', when('initial_date', '  (თარიღი: {initial_date})')],
+                "D9E2F3", [('{initial_narrative}',)], cols=1),
+        blank(),
+        para(run('წინასწარი დიაგნოზი: ', bold=True), '{initial_diagnosis}'),
+        blank(),
+
+        # დანიშნულებები
+        para(run('დანიშნულებები:', bold=True)),
+        bullets('investigations', 'გამოკვლევები:'),
+        bullets('medications', 'მედიკამენტები:'),
+        blank(),
+
+        # [2] ექიმის ხელმოწერა (დანიშნულებებთან)
+        para('ექიმი: {doctor_signature}', pic('doctor_signature_image', 0.8), align='right'),
+        blank(),
+        blank(),
+
+        section(['გადაფასება / გაწერა', when('discharge_note_date', '  (თარიღი: {discharge_note_date})')],
+                "E2EFDA", [('{discharge_narrative}',)], cols=1),
+        blank(),
+
+        # [3] ექიმის ხელმოწერა (გაწერასთან)
+        para('ექიმი: {discharge_doctor}', pic('doctor_signature_image', 0.8), align='right'),
+    ],
+}
+
+
+# ======================== Layout Compiler ========================
+
+_formatter = string.Formatter()
+
+
+def _compile_text(text, defaults):
+    """
+    ტექსტის შაბლონი -> სეგმენტების სია [(condition_key, pieces)], სადაც
+    pieces = [(literal, field, default, or_default)]; '{field!o}' - ცარიელი
+    მნიშვნელობაც default-ით იცვლება
+    """
+    segments = []
+    for part in (text if isinstance(text, list) else [text]):
+        cond, template = (part['when'], part['text']) if isinstance(part, dict) else (None, part)
+        pieces = []
+        for literal, field, _spec, conversion in _formatter.parse(template):
+            if field is None:
+                pieces.append((literal, None, None, False))
+            else:
+                pieces.append((literal, field, defaults.get(field, ''), conversion == 'o'))
+        segments.append((cond, pieces))
+    return segments
+
+
+def _compile_run(r, defaults):
+    if 'image' in r:
+        return dict(r)
+    return {'text': _compile_text(r['text'], defaults), 'bold': r['bold'],
+            'italic': r['italic'], 'size': r['size']}
+
+
+def compile_layout(layout):
+    """დეკლარაციული განლაგება -> render plan (ერთხელ, მოდულის ჩატვირთვისას)"""
+    defaults = layout['defaults']
+    plan = []
+    for block in layout['blocks']:
+        kind = block['kind']
+        if kind == 'paragraph':
+            plan.append({'kind': kind, 'align': block['align'], 'style': block['style'],
+                         'runs': [_compile_run(r, defaults) for r in block['runs']]})
+        elif kind == 'table':
+            rows = []
+            for row in block['rows']:
+                cells = []
+                for c in row:
+                    c = c if isinstance(c, dict) else cell(c)
+                    cells.append({'runs': [_compile_run(r, defaults) for r in c['runs']],
+                                  'shading': c['shading'], 'align': c['align'], 'span': c['span']})
+                rows.append(cells)
+            plan.append({'kind': kind, 'rows': rows, 'cols': block['cols'],
+                         'style': block['style'], 'align': block['align']})
+        elif kind == 'bullets':
+            plan.append({'kind': kind, 'key': block['key'], 'heading': block['heading']})
+        else:
+            plan.append({'kind': kind})
+    # ვერსია - განლაგების ნებისმიერი ცვლილება აუქმებს DOCX skeleton-ის ქეშს
+    version = hashlib.sha1(json.dumps(layout, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return {'font_size': layout['font_size'], 'blocks': plan, 'version': version}
+
+
+def fill_text(segments, data):
+    """შედგენილი შაბლონის შევსება მოთხოვნის მონაცემებით"""
+    out = []
+    for cond, pieces in segments:
+        if cond is not None and not data.get(cond):
+            continue
+        for literal, field, default, or_default in pieces:
+            out.append(literal)
+            if field is not None:
+                value = data.get(field, default)
+                if or_default:
+                    value = value or default
+                if value is None:
+                    value = ''
+                out.append(value if isinstance(value, str) else str(value))
+    return ''.join(out)
+
+
+FORM_100_PLAN = compile_layout(FORM_100_LAYOUT)
+MEDICAL_RECORD_PLAN = compile_layout(MEDICAL_RECORD_LAYOUT)
+
+
+DOCUMENT_TYPES = ('form_100', 'medical_record')
+COMBINED_SEPARATOR = '+'
+
+_combined_plans = {}
+
+
+def get_layout_plan(doc_type):
+    """'form_100', 'medical_record' ან გაერთიანებული 'form_100+medical_record'"""
+    if COMBINED_SEPARATOR in doc_type:
+        plan = _combined_plans.get(doc_type)
+        if plan is None:
+            plan = _combined_plans[doc_type] = combine_plans(doc_type.split(COMBINED_SEPARATOR))
+        return plan
+    return FORM_100_PLAN if doc_type == 'form_100' else MEDICAL_RECORD_PLAN
+
+
+# ======================== Combined Documents ========================
+#
+# რამდენიმე დოკუმენტი ერთი პაციენტისთვის (მაგ. გაწერისას ფორმა 100 +
+# სამედიცინო ჩანაწერი) ერთ plan-ად: ერთი DOCX, ერთი კონვერტაცია, ერთი ბეჭდვა.
+# თითო ნაწილის ველები იღებს პრეფიქსს '{i}:' (ორივე ფორმას აქვს patient_name,
+# doctor_signature_image...), ნაწილებს შორის - გვერდის გაწყვეტა. Normal სტილის
+# ზომა პირველი ნაწილისაა; სხვა ზომის ნაწილის run-ებს ზომა ცალკე ეწერება.
+
+def _scoped_field(prefix, field):
+    return field if field is None else prefix + field
+
+
+def _scope_run(r, prefix, size):
+    r = dict(r)
+    if 'image' in r:
+        r['image'] = prefix + r['image']
+        return r
+    r['text'] = [(_scoped_field(prefix, cond),
+                  [(literal, _scoped_field(prefix, field), default, or_default)
+                   for literal, field, default, or_default in pieces])
+                 for cond, pieces in r['text']]
+    if size and r['size'] in (None, BASE):
+        r['size'] = size
+    return r
+
+
+def _scope_block(block, prefix, size):
+    block = dict(block)
+    if block['kind'] == 'paragraph':
+        block['runs'] = [_scope_run(r, prefix, size) for r in block['runs']]
+    elif block['kind'] == 'table':
+        block['rows'] = [[dict(c, runs=[_scope_run(r, prefix, size) for r in c['runs']]) for c in row]
+                         for row in block['rows']]
+    elif block['kind'] == 'bullets':
+        block.update(key=prefix + block['key'], size=size)
+    return block
+
+
+def combine_plans(doc_types):
+    """დოკუმენტის ტიპების სია -> ერთი render plan"""
+    if len(doc_types) < 2 or any(t not in DOCUMENT_TYPES for t in doc_types):
+        raise ValueError(f'Unknown document combination: {COMBINED_SEPARATOR.join(doc_types)}')
+    parts = [get_layout_plan(t) for t in doc_types]
+    base = parts[0]['font_size']
+    blocks = []
+    for i, part in enumerate(parts):
+        if i:
+            blocks.append({'kind': 'page_break'})
+        size = part['font_size'] if part['font_size'] != base else None
+        blocks += [_scope_block(b, f'{i}:', size) for b in part['blocks']]
+    version = hashlib.sha1('|'.join(p['version'] for p in parts).encode('utf-8')).hexdigest()
+    return {'font_size': base, 'blocks': blocks, 'version': version}
+
+
+def combine_documents(documents):
+    """
+    [{'document_type': ..., ...ველები}, ...] -> ერთი მოთხოვნის data გაერთიანებული plan-ისთვის.
+    პირველი დოკუმენტის ველები რჩება პრეფიქსის გარეშეც (ფაილის სახელი, ძებნის ინდექსი).
+    """
+    if not isinstance(documents, list) or len(documents) < 2:
+        raise ValueError('საჭიროა მინიმუმ ორი დოკუმენტი')
+    data = dict(documents[0])
+    for i, doc in enumerate(documents):
+        data.update({f'{i}:{k}': v for k, v in doc.items()})
+    data['document_type'] = COMBINED_SEPARATOR.join(d.get('document_type', 'form_100') for d in documents)
+    return data
+
+
 # ======================== Document Builders ========================
 
-def _build_form_100_structure(data, font_size_pt):
+def _slot_token(slots, kind, spec):
+    """skeleton-ისთვის: ადგილის მარკერი მნიშვნელობის ნაცვლად"""
+    slots.append((kind, spec))
+    return SKELETON_TOKEN.format(len(slots) - 1)
+
+
+def _docx_add_runs(p, runs, data, font_size_pt, slots=None):
+    """აბზაცში run-ების დამატება; სურათის run-ი - ხელმოწერა"""
+    for r in runs:
+        if 'image' in r and slots is not None:
+            p.add_run(_slot_token(slots, 'image', r))
+            continue
+        if 'image' in r:
+            sig = load_signature(data.get(r['image'], ''))
+            if sig:
+                try:
+                    p.add_run().add_picture(sig.stream(), width=Inches(r['width']))
+                except Exception:
+                    if r['error'] is not None:
+                        p.text = r['error']
+            elif r['missing'] is not None:
+                p.text = r['missing']
+            continue
+
+        if slots is not None:
+            rn = p.add_run(_slot_token(slots, 'text', r['text']))
+        else:
+            rn = p.add_run(fill_text(r['text'], data))
+        if r['bold']:
+            rn.bold = True
+        if r['italic']:
+            rn.italic = True
+        if r['size']:
+            rn.font.size = Pt(font_size_pt if r['size'] == BASE else r['size'])
+
+
+def _docx_table(doc, block, data, font_size_pt, slots=None):
+    t = doc.add_table(rows=len(block['rows']), cols=block['cols'])
+    if block['style']:
+        t.style = block['style']
+    if block['align'] == 'center':
+        t.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    for i, row in enumerate(block['rows']):
+        for j, c in enumerate(row):
+            tc = t.rows[i].cells[j]
+            if c['span'] > 1:
+                tc.merge(t.rows[i].cells[j + c['span'] - 1])
+            runs = c['runs']
+            if len(runs) == 1 and 'text' in runs[0] and not runs[0]['size']:
+                if slots is not None:
+                    tc.text = _slot_token(slots, 'text', runs[0]['text'])
+                else:
+                    tc.text = fill_text(runs[0]['text'], data)
+            else:
+                _docx_add_runs(tc.paragraphs[0], runs, data, font_size_pt, slots)
+            if c['shading']:
+                set_cell_shading(tc, c['shading'])
+            if c['align']:
+                tc.paragraphs[0].alignment = DOCX_ALIGN[c['align']]
+
+
+def build_docx(plan, data, font_size_pt=None, slots=None):
     """
-    დამხმარე ფუნქცია, რომელიც აწყობს ფორმა 100-ს.
-    font_size_pt განსაზღვრავს შრიფტის ზომას (11 შენახვისთვის, 10 ბეჭდვისთვის).
+    render plan + მონაცემები -> python-docx Document.
+    slots სიის გადაცემისას მნიშვნელობების ნაცვლად ისმება მარკერები (skeleton).
     """
+    font_size_pt = plan['font_size'] or font_size_pt
+
+    load_docx()
     doc = Document()
-    for section in doc.sections:
-        section.top_margin = Cm(1)
-        section.bottom_margin = Cm(1)
-        section.left_margin = Cm(1.5)
-        section.right_margin = Cm(1)
+    for sec in doc.sections:
+        sec.top_margin = Cm(1)
+        sec.bottom_margin = Cm(1)
+        sec.left_margin = Cm(1.5)
+        sec.right_margin = Cm(1)
 
     style = doc.styles['Normal']
     style.font.name = 'Sylfaen'
     style.font.size = Pt(font_size_pt)
 
-    # Header
-    approval = doc.add_paragraph()
-    approval.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    run = approval.add_run(
-        'დანართი №2 დამტკიცებულია საქართველოს შრომის\nჯანმრთელობისა და სოციალური დაცვის მინისტრის\n2013 წ 03.12 №01-42/ნ ბრძანებით')
-    run.font.size = Pt(8)
-    run.font.italic = True
-
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run(data.get('form_type', 'სამედიცინო დოკუმენტაცია ფორმა № IV-100/ა')).bold = True
-
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run('ცნობა ჯანმრთელობის მდგომარეობის შესახებ').bold = True
-    p.runs[0].font.size = Pt(12)
-
-    p = doc.add_paragraph()
-    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    p.add_run(
-        f"გაცემის თარიღი: {data.get('document_date', '')}     ბარათის №: {data.get('registration_number', '')}")
-
-    doc.add_paragraph()
-
-    # Tables
-    # 1. Issuer
-    t1 = doc.add_table(rows=4, cols=2)
-    t1.style = 'Table Grid'
-    t1.rows[0].cells[0].merge(t1.rows[0].cells[1])
-    t1.rows[0].cells[0].text = "1. გამცემი ორგანიზაცია"
-    set_cell_shading(t1.rows[0].cells[0], "D9E2F3")
-    t1.rows[1].cells[0].text = "დასახელება:"
-    t1.rows[1].cells[1].text = data.get('facility_name', '')
-    t1.rows[2].cells[0].text = "საიდენტიფიკაციო კოდი:"
-    t1.rows[2].cells[1].text = data.get('identification_code', '')
-    t1.rows[3].cells[0].text = "მისამართი:"
-    t1.rows[3].cells[1].text = data.get('facility_address', '')
-    doc.add_paragraph()
-
-    # 2. Recipient
-    t2 = doc.add_table(rows=2, cols=2)
-    t2.style = 'Table Grid'
-    t2.rows[0].cells[0].merge(t2.rows[0].cells[1])
-    t2.rows[0].cells[0].text = "2. მიმღები ორგანიზაცია"
-    set_cell_shading(t2.rows[0].cells[0], "D9E2F3")
-    t2.rows[1].cells[0].text = "დასახელება:"
-    t2.rows[1].cells[1].text = data.get('recipient_name', '')
-    doc.add_paragraph()
-
-    # 3-7. Patient
-    t3 = doc.add_table(rows=6, cols=2)
-    t3.style = 'Table Grid'
-    t3.rows[0].cells[0].merge(t3.rows[0].cells[1])
-    t3.rows[0].cells[0].text = "პაციენტის მონაცემები"
-    set_cell_shading(t3.rows[0].cells[0], "E2EFDA")
-    fields = [
-        ("3. სახელი, გვარი:", data.get('patient_name', '')),
-        ("4. დაბადების თარიღი:", data.get('birth_date', '')),
-        ("5. პირადი ნომერი:", data.get('personal_id', '')),
-        ("6. მისამართი:", data.get('patient_address', '')),
-        ("7. სამუშაო ადგილი:", data.get('occupation', '')),
-    ]
-    for i, (k, v) in enumerate(fields):
-        t3.rows[i + 1].cells[0].text = k
-        t3.rows[i + 1].cells[1].text = str(v)
-    doc.add_paragraph()
-
-    # 8. Dates
-    t4 = doc.add_table(rows=2, cols=2)
-    t4.style = 'Table Grid'
-    t4.rows[0].cells[0].merge(t4.rows[0].cells[1])
-    t4.rows[0].cells[0].text = "8. ჰოსპიტალიზაციის ვადები"
-    set_cell_shading(t4.rows[0].cells[0], "D9E2F3")
-    t4.rows[1].cells[0].text = f"მიღება: {data.get('hospitalization_date', '')}"
-    t4.rows[1].cells[1].text = f"გაწერა: {data.get('discharge_date', '')}"
-    doc.add_paragraph()
-
-    # 9. Diagnosis
-    t5 = doc.add_table(rows=3, cols=2)
-    t5.style = 'Table Grid'
-    t5.rows[0].cells[0].merge(t5.rows[0].cells[1])
-    t5.rows[0].cells[0].text = "9. დიაგნოზი"
-    set_cell_shading(t5.rows[0].cells[0], "FCE4D6")
-    t5.rows[1].cells[0].text = "ძირითადი:"
-    t5.rows[1].cells[1].text = data.get('main_diagnosis', '')
-    t5.rows[2].cells[0].text = "ექიმის მიერ დაზუსტება:"
-    t5.rows[2].cells[1].text = data.get('case_code', '')
-    doc.add_paragraph()
-
-    # 10. Past Diseases
-    t6 = doc.add_table(rows=2, cols=1)
-    t6.style = 'Table Grid'
-    t6.rows[0].cells[0].text = "10. გადატანილი დაავადებები"
-    set_cell_shading(t6.rows[0].cells[0], "D9E2F3")
-    t6.rows[1].cells[0].text = data.get('past_diseases', '')
-    doc.add_paragraph()
-
-    # 11. Anamnesis
-    t7 = doc.add_table(rows=2, cols=1)
-    t7.style = 'Table Grid'
-    t7.rows[0].cells[0].text = "11. მოკლე ანამნეზი"
-    set_cell_shading(t7.rows[0].cells[0], "D9E2F3")
-    t7.rows[1].cells[0].text = data.get('anamnesis', '')
-    doc.add_paragraph()
-
-    # 12. Investigations
-    t8 = doc.add_table(rows=4, cols=1)
-    t8.style = 'Table Grid'
-    t8.rows[0].cells[0].text = "12. ჩატარებული გამოკვლევები"
-    set_cell_shading(t8.rows[0].cells[0], "D9E2F3")
-
-    # სისხლის ანალიზი - ზომა აქედან მოდის
-    cell = t8.rows[1].cells[0]
-    p = cell.paragraphs[0]
-    run = p.add_run(f"სისხლის საერთო ანალიზი BL.6: {data.get('blood_analysis', '')}")
-    run.font.size = Pt(font_size_pt)  # <--- დინამიური ზომა
-
-    t8.rows[2].cells[0].text = f"გლუკოზის განსაზღვრა სისხლის შრატში BL.12.1: {data.get('biochemistry', '')}"
-    t8.rows[3].cells[0].text = f"ინსტრუმენტული კვლევები: {data.get('instrumental', '')}"
-    doc.add_paragraph()
-
-    # 13. Course
-    t9 = doc.add_table(rows=2, cols=1)
-    t9.style = 'Table Grid'
-    t9.rows[0].cells[0].text = "13. დაავადების მიმდინარეობა"
-    set_cell_shading(t9.rows[0].cells[0], "D9E2F3")
-    course_text = f"""ტიპი: {data.get('course_type', '')}
-
-მიღებისას: {data.get('admission_status', '')}
-ვიტალური მაჩვენებლები: T-{data.get('admission_temp', '')}°C | HR-{data.get('admission_hr', '')} | BP-{data.get('admission_bp', '')} | RR-{data.get('admission_rr', '')} | SpO2-{data.get('admission_spo2', '')}
-
-გაწერისას: {data.get('discharge_status', '')}
-ვიტალური მაჩვენებლები: T-{data.get('discharge_temp', '')}°C | HR-{data.get('discharge_hr', '')} | BP-{data.get('discharge_bp', '')} | RR-{data.get('discharge_rr', '')} | SpO2-{data.get('discharge_spo2', '')}"""
-    t9.rows[1].cells[0].text = course_text
-    doc.add_paragraph()
-
-    # 14. Treatment
-    t10 = doc.add_table(rows=2, cols=1)
-    t10.style = 'Table Grid'
-    t10.rows[0].cells[0].text = "14. ჩატარებული მკურნალობა"
-    set_cell_shading(t10.rows[0].cells[0], "D9E2F3")
-    t10.rows[1].cells[0].text = f"მედიკამენტები:\n{data.get('medications', '')}\n\nკოდი: {data.get('treatment_code', '')}"
-    doc.add_paragraph()
-
-    # 15-17. Outcome
-    t11 = doc.add_table(rows=4, cols=2)
-    t11.style = 'Table Grid'
-    t11.rows[0].cells[0].merge(t11.rows[0].cells[1])
-    t11.rows[0].cells[0].text = "გამოსავალი"
-    set_cell_shading(t11.rows[0].cells[0], "E2EFDA")
-    t11.rows[1].cells[0].text = "15. სტაციონარში გადაყვანა:"
-    t11.rows[1].cells[1].text = data.get('transfer_to_hospital', '-') or '-'
-    t11.rows[2].cells[0].text = "16. გაწერის მდგომარეობა:"
-    t11.rows[2].cells[1].text = data.get('discharge_condition', '')
-    t11.rows[3].cells[0].text = "17. რეკომენდაციები:"
-    t11.rows[3].cells[1].text = data.get('recommendations', '')
-    doc.add_paragraph()
-
-    # 18-20. Signatures
-    t12 = doc.add_table(rows=4, cols=2)
-    t12.style = 'Table Grid'
-    t12.rows[0].cells[0].merge(t12.rows[0].cells[1])
-    t12.rows[0].cells[0].text = "ხელმოწერები"
-    set_cell_shading(t12.rows[0].cells[0], "D9E2F3")
-    t12.rows[1].cells[0].text = "18. მკურნალი ექიმი:"
-    t12.rows[1].cells[1].text = data.get('attending_doctor', '')
-    t12.rows[2].cells[0].text = "19. დაწესებულების ხელმძღვანელი:"
-    t12.rows[2].cells[1].text = data.get('facility_head', '')
-    t12.rows[3].cells[0].text = "20. ცნობის გაცემის თარიღი:"
-    t12.rows[3].cells[1].text = data.get('issue_date', '')
-    doc.add_paragraph()
-
-    # Electronic Signatures (Images)
-    sig_table = doc.add_table(rows=2, cols=3)
-    sig_table.alignment = WD_TABLE_ALIGNMENT.CENTER
-    labels = ["ექიმის ხელმოწერა", "ბეჭედი", "ხელმძღვანელის ხელმოწერა"]
-    for i, lbl in enumerate(labels):
-        sig_table.rows[0].cells[i].text = lbl
-        sig_table.rows[0].cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    keys = ['doctor_signature_image', 'stamp_image', 'head_signature_image']
-    for i, key in enumerate(keys):
-        img_data = data.get(key, '')
-        img_stream = decode_base64_image(img_data)
-        cell = sig_table.rows[1].cells[i]
-        p = cell.paragraphs[0]
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        if img_stream:
-            try:
-                run = p.add_run()
-                run.add_picture(img_stream, width=Inches(1.2))
-            except Exception:
-                p.text = "Error"
-        else:
-            p.text = "________________"
+    for block in plan['blocks']:
+        kind = block['kind']
+        if kind == 'paragraph':
+            p = doc.add_paragraph(style=block['style'])
+            if block['align']:
+                p.alignment = DOCX_ALIGN[block['align']]
+            _docx_add_runs(p, block['runs'], data, font_size_pt, slots)
+        elif kind == 'table':
+            _docx_table(doc, block, data, font_size_pt, slots)
+        elif kind == 'blank':
+            doc.add_paragraph()
+        elif kind == 'page_break':
+            doc.add_page_break()
+        elif kind == 'bullets' and slots is not None:
+            doc.add_paragraph(_slot_token(slots, 'bullets', block))
+        elif kind == 'bullets' and data.get(block['key']):
+            p = doc.add_paragraph()
+            heading = p.add_run(block['heading'])
+            heading.italic = True
+            if block.get('size'):
+                heading.font.size = Pt(block['size'])
+            for line in data[block['key']].split('\n'):
+                if line.strip():
+                    b = doc.add_paragraph(style='List Bullet')
+                    rn = b.add_run(line.strip())
+                    if block.get('size'):
+                        rn.font.size = Pt(block['size'])
 
     return doc
 
 
+def _build_form_100_structure(data, font_size_pt):
+    """
+    დამხმარე ფუნქცია, რომელიც აწყობს ფორმა 100-ს.
+    font_size_pt განსაზღვრავს შრიფტის ზომას (11 შენახვისთვის, 10 ბეჭდვისთვის).
+    """
+    return build_docx(FORM_100_PLAN, data, font_size_pt)
+
+
 def create_form_100_document_save(data):
     return _build_form_100_structure(data, font_size_pt=11)
 
@@ -348,373 +2061,2183 @@ def create_form_100_document_print(data):
 
 def create_medical_record_document(data):
     """სამედიცინო ჩანაწერი - კურსუსი"""
-    doc = Document()
-    for section in doc.sections:
-        section.top_margin = Cm(1)
-        section.bottom_margin = Cm(1)
-        section.left_margin = Cm(1.5)
-        section.right_margin = Cm(1)
-
-    style = doc.styles['Normal']
-    style.font.name = 'Sylfaen'
-    style.font.size = Pt(11)
-
-    # სათაური
-    h1 = doc.add_paragraph()
-    h1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    h1.add_run(data.get('facility_name', 'პრემიუმ მედ გრუპი')).bold = True
-    h1.runs[0].font.size = Pt(14)
-    h2 = doc.add_paragraph()
-    h2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    h2.add_run(data.get('department', 'გადაუდებელი მედიცინა'))
-    doc.add_paragraph()
-
-    # პაციენტი
-    t1 = doc.add_table(rows=4, cols=2)
-    t1.style = 'Table Grid'
-    t1.rows[0].cells[0].merge(t1.rows[0].cells[1])
-    t1.rows[0].cells[0].text = "პაციენტის მონაცემები"
-    set_cell_shading(t1.rows[0].cells[0], "E2EFDA")
-    t1.rows[1].cells[0].text = "ბარათის №:"
-    t1.rows[1].cells[1].text = data.get('card_number', '-')
-    t1.rows[2].cells[0].text = "სახელი, გვარი:"
-    t1.rows[2].cells[1].text = data.get('patient_name', '-')
-    t1.rows[3].cells[0].text = "მიღების სტატუსი:"
-    t1.rows[3].cells[1].text = data.get('admission_status', 'თვითდინებით')
-    doc.add_paragraph()
-
-    # დიაგნოზი
-    t2 = doc.add_table(rows=2, cols=2)
-    t2.style = 'Table Grid'
-    t2.rows[0].cells[0].merge(t2.rows[0].cells[1])
-    t2.rows[0].cells[0].text = "დიაგნოზი (ICD-10)"
-    set_cell_shading(t2.rows[0].cells[0], "FCE4D6")
-    t2.rows[1].cells[0].text = f"კოდი: {data.get('icd_code', '')}"
-    t2.rows[1].cells[1].text = data.get('diagnosis_description', '')
-    doc.add_paragraph()
-
-    # ჩივილები
-    t3 = doc.add_table(rows=2, cols=1)
-    t3.style = 'Table Grid'
-    t3.rows[0].cells[0].text = "ჩივილები"
-    set_cell_shading(t3.rows[0].cells[0], "D9E2F3")
-    t3.rows[1].cells[0].text = data.get('complaints', '')
-    doc.add_paragraph()
-
-    # ანამნეზი
-    t4 = doc.add_table(rows=2, cols=1)
-    t4.style = 'Table Grid'
-    t4.rows[0].cells[0].text = "ანამნეზი"
-    set_cell_shading(t4.rows[0].cells[0], "D9E2F3")
-    t4.rows[1].cells[0].text = data.get('anamnesis', '')
-    doc.add_paragraph()
-
-    al = doc.add_paragraph()
-    r_al = al.add_run("ალერგიები: ")
-    r_al.font.bold = True
-    al.add_run(data.get('allergies', 'არა'))
-    doc.add_paragraph()
-
-    # ობიექტური სტატუსი
-    h_obj = doc.add_paragraph()
-    h_obj.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r_obj = h_obj.add_run("ობიექტური სტატუსი")
-    r_obj.font.bold = True
-    r_obj.font.size = Pt(12)
-
-    vt = doc.add_table(rows=2, cols=5)
-    vt.style = 'Table Grid'
-    headers = ["T°C", "BP", "HR", "RR", "SpO₂"]
-    values = [
-        data.get('temperature', ''),
-        data.get('blood_pressure', ''),
-        data.get('heart_rate', ''),
-        data.get('respiratory_rate', ''),
-        data.get('spo2', '')
-    ]
-    for i, h in enumerate(headers):
-        vt.rows[0].cells[i].text = h
-        set_cell_shading(vt.rows[0].cells[i], "D0D0D0")
-        vt.rows[0].cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-        vt.rows[1].cells[i].text = str(values[i]) if values[i] else ''
-        vt.rows[1].cells[i].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-    doc.add_paragraph()
-
-    sys_t = doc.add_table(rows=9, cols=2)
-    sys_t.style = 'Table Grid'
-    systems = [
-        ("ზოგადი მდგომარეობა:", data.get('general_condition', '')),
-        ("კანი:", data.get('skin', '')),
-        ("პერიფერიული შეშუპება:", data.get('edema', '')),
-        ("გულ-სისხლძარღვთა:", data.get('cardiovascular', '')),
-        ("სასუნთქი სისტემა:", data.get('respiratory', '')),
-        ("საჭმლის მომნელებელი:", data.get('digestive', '')),
-        ("შარდგამომყოფი:", data.get('urinary', '')),
-        ("ნერვული სისტემა:", data.get('neurological', '')),
-        ("საყრდენ-მამოძრავებელი:", data.get('musculoskeletal', '')),
-    ]
-    for i, (label, value) in enumerate(systems):
-        sys_t.rows[i].cells[0].text = label
-        sys_t.rows[i].cells[1].text = str(value) if value else ''
-        set_cell_shading(sys_t.rows[i].cells[0], "F2F2F2")
-    doc.add_paragraph()
-
-    # წინასწარი დიაგნოზი
-    p_pd = doc.add_paragraph()
-    r_pd = p_pd.add_run("წინასწარი დიაგნოზი: ")
-    r_pd.font.bold = True
-    p_pd.add_run(data.get('preliminary_diagnosis', ''))
-
-    # [1] ექიმის ხელმოწერა (დიაგნოზთან)
-    p_doc = doc.add_paragraph()
-    r_doc = p_doc.add_run("მკურნალი ექიმი: ")
-    r_doc.font.bold = True
-    p_doc.add_run(data.get('doctor', ''))
-
-    # ხელმოწერის სურათი
-    doctor_sig_data = data.get('doctor_signature_image', '')
-    if doctor_sig_data:
-        img_stream = decode_base64_image(doctor_sig_data)
-        if img_stream:
+    return build_docx(MEDICAL_RECORD_PLAN, data)
+
+
+# ======================== DOCX Skeleton Cache ========================
+#
+# თითო (დოკუმენტის ტიპი, შრიფტის ზომა) წყვილისთვის python-docx ერთხელ აგებს
+# skeleton-ს: DOCX პაკეტს, სადაც ყოველი ტექსტური run-ის, ხელმოწერისა და სიის
+# ადგილას მარკერია. მოთხოვნისას document.xml-ში მარკერები სტრიქონების დონეზე
+# იცვლება მნიშვნელობებით, ხელმოწერები კი ემატება media ნაწილებად - XML ნაწილები
+# იდენტურია build_docx() + doc.save()-ისა. განლაგების ცვლილება (plan version)
+# skeleton-ს თავიდან აგებს.
+
+SKELETON_TOKEN = '\ue000{}\ue001'
+_SKELETON_SLOT_RE = re.compile('<w:t>\ue000(\\d+)\ue001</w:t>')
+_XML_INVALID_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+IMAGE_RELTYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image'
+
+_skeleton_cache = {}
+_skeleton_lock = threading.Lock()
+
+
+def _run_content_xml(text):
+    """run-ის შიგთავსი ტექსტიდან - python-docx-ის run.text-ის ექვივალენტი"""
+    if _XML_INVALID_RE.search(text):
+        raise ValueError('All strings must be XML compatible')
+    out = []
+    for part in re.split('([\t\r\n])', text):
+        if part == '\t':
+            out.append('<w:tab/>')
+        elif part in ('\r', '\n'):
+            out.append('<w:br/>')
+        elif part:
+            if len(part.strip()) < len(part):
+                out.append(f'<w:t xml:space="preserve">{xml_escape(part)}</w:t>')
+            else:
+                out.append(f'<w:t>{xml_escape(part)}</w:t>')
+    return ''.join(out)
+
+
+def _body_xml(doc):
+    """დოკუმენტის <w:body>-ის შიგთავსი (sectPr-მდე) ისე, როგორც save() წერს"""
+    xml = serialize_part_xml(doc.element).decode('utf-8')
+    return xml[xml.index('<w:body>') + len('<w:body>'):xml.rindex('<w:sectPr')]
+
+
+def _iter_doc_parts(part, seen):
+    for rel in part.rels.values():
+        if rel.is_external or rel.target_part in seen:
+            continue
+        seen.append(rel.target_part)
+        yield rel.target_part
+        yield from _iter_doc_parts(rel.target_part, seen)
+
+
+class SkeletonError(RuntimeError):
+    """skeleton-ის სტრუქტურა არ ემთხვევა მოლოდინს - გამოიყენება პირდაპირი აწყობა"""
+
+
+class DocxSkeleton:
+    """წინასწარ აგებული DOCX პაკეტი მარკერებით"""
+
+    def __init__(self, plan, font_size_pt):
+        slots = []
+        doc = build_docx(plan, {}, font_size_pt, slots=slots)
+        buf = BytesIO()
+        doc.save(buf)
+        with zipfile.ZipFile(buf) as z:
+            self.members = [(name, z.read(name)) for name in z.namelist()]
+
+        # ნაწილები [Content_Types].xml-ისთვის და media-ს ადგილი zip-ში
+        package = doc.part.package
+        self.parts = [(p.partname, p.content_type) for p in package.iter_parts()]
+        subtree = {doc.part.partname.membername, doc.part.partname.rels_uri.membername}
+        for p in _iter_doc_parts(doc.part, [doc.part]):
+            subtree.update((p.partname.membername, p.partname.rels_uri.membername))
+        names = [name for name, _ in self.members]
+        self.media_index = max(i for i, name in enumerate(names) if name in subtree) + 1
+        self.rel_ids = set(doc.part.rels.keys())
+
+        # document.xml -> სტატიკური ნაწილები და slot-ები
+        xml = dict(self.members)['word/document.xml'].decode('utf-8')
+        pieces = _SKELETON_SLOT_RE.split(xml)
+        self.chunks = pieces[0::2]
+        found = sorted(int(i) for i in pieces[1::2])
+        if found != list(range(len(slots))):
+            # მარკერი გაიყო run-ებს შორის ან დაიკარგა
+            raise SkeletonError(f'{len(found)} of {len(slots)} slot markers found in document.xml')
+        self.slots = [slots[int(i)] for i in pieces[1::2]]
+        for i, (kind, spec) in enumerate(self.slots):
+            if kind == 'bullets':
+                # მთლიანი აბზაცი იცვლება გენერირებული აბზაცებით
+                if not (self.chunks[i].endswith('<w:p><w:r>') and self.chunks[i + 1].startswith('</w:r></w:p>')):
+                    raise SkeletonError(f'bullet slot {i} is not a paragraph of its own')
+                self.chunks[i] = self.chunks[i][:-len('<w:p><w:r>')]
+                self.chunks[i + 1] = self.chunks[i + 1][len('</w:r></w:p>'):]
+                self.slots[i] = (kind, dict(spec, fragments=self._bullet_fragments(spec['heading'], spec.get('size'))))
+            elif kind == 'image' and (spec['missing'] is not None or spec['error'] is not None):
+                # p.text = ... მხოლოდ მაშინ არის ექვივალენტური, როცა აბზაცში სხვა run არ არის
+                if not ((self.chunks[i].endswith('<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r>')
+                         or self.chunks[i].endswith('<w:p><w:r>'))
+                        and self.chunks[i + 1].startswith('</w:r></w:p>')):
+                    raise SkeletonError(f'image slot {i} shares its paragraph with other runs')
+        self.drawing = self._drawing_template()
+
+    @staticmethod
+    def _bullet_fragments(heading, size=None):
+        scratch = Document()
+        head = scratch.add_paragraph().add_run(heading)
+        head.italic = True
+        rn = scratch.add_paragraph(style='List Bullet').add_run(SKELETON_TOKEN.format(0))
+        if size:
+            head.font.size = rn.font.size = Pt(size)
+        body = _body_xml(scratch)
+        split = body.index('</w:p>') + len('</w:p>')
+        prefix, suffix = body[split:].split(f'<w:t>{SKELETON_TOKEN.format(0)}</w:t>')
+        return body[:split], prefix, suffix
+
+    @staticmethod
+    def _drawing_template():
+        """<w:drawing> ზუსტად ისე, როგორც run.add_picture() ქმნის"""
+        scratch = Document()
+        r = scratch.add_paragraph().add_run()
+        r._r.add_drawing(CT_Inline.new_pic_inline(7777, 'rId7777', 'image.png', 1111111, 2222222))
+        body = _body_xml(scratch)
+        drawing = body[body.index('<w:drawing>'):body.index('</w:drawing>') + len('</w:drawing>')]
+        return (drawing.replace('id="7777"', 'id="{shape_id}"')
+                .replace('Picture 7777', 'Picture {shape_id}')
+                .replace('rId7777', '{rid}')
+                .replace('name="image.png"', 'name="{name}"')
+                .replace('1111111', '{cx}')
+                .replace('2222222', '{cy}'))
+
+    def _next_rid(self, used):
+        n = 1
+        while f'rId{n}' in used:
+            n += 1
+        return f'rId{n}'
+
+    def render(self, data):
+        """მნიშვნელობების ჩასმა -> DOCX ფაილის bytes"""
+        images = {}  # sha1 -> (rId, membername, image)
+        used_rids = set(self.rel_ids)
+        shape_id = 1
+
+        out = [self.chunks[0]]
+        for (kind, spec), chunk in zip(self.slots, self.chunks[1:]):
+            if kind == 'text':
+                inner = _run_content_xml(fill_text(spec, data))
+            elif kind == 'bullets':
+                inner = ''
+                value = data.get(spec['key'])
+                if value:
+                    heading, prefix, suffix = spec['fragments']
+                    inner = heading + ''.join(
+                        prefix + _run_content_xml(line.strip()) + suffix
+                        for line in value.split('\n') if line.strip())
+            else:
+                sig = load_signature(data.get(spec['image'], ''))
+                inner = None
+                if sig:
+                    image = sig.image
+                    if image is None:
+                        inner = _run_content_xml(spec['error']) if spec['error'] is not None else ''
+                    else:
+                        cx, cy = image.scaled_dimensions(Inches(spec['width']), None)
+                        if image.sha1 not in images:
+                            rid = self._next_rid(used_rids)
+                            used_rids.add(rid)
+                            member = f'word/media/image{len(images) + 1}.{image.ext}'
+                            images[image.sha1] = (rid, member, image)
+                        inner = self.drawing.format(shape_id=shape_id, rid=images[image.sha1][0],
+                                                    name=image.filename, cx=cx, cy=cy)
+                        shape_id += 1
+                elif spec['missing'] is not None:
+                    inner = _run_content_xml(spec['missing'])
+
+            if kind != 'bullets' and not inner:
+                # ცარიელი run -> <w:r/>, სურათის არქონისას run საერთოდ არ იქმნება
+                if out[-1].endswith('<w:r>') and chunk.startswith('</w:r>'):
+                    out[-1] = out[-1][:-len('<w:r>')] + ('<w:r/>' if inner == '' else '')
+                    chunk = chunk[len('</w:r>'):]
+            out.append(inner or '')
+            out.append(chunk)
+
+        return self._package(''.join(out).encode('utf-8'), images)
+
+    def _package(self, document_xml, images):
+        members = []
+        for name, blob in self.members:
+            if name == 'word/document.xml':
+                blob = document_xml
+            elif images and name == 'word/_rels/document.xml.rels':
+                rels = ''.join(
+                    f'<Relationship Id="{rid}" Type="{IMAGE_RELTYPE}" Target="{member[len("word/"):]}"/>'
+                    for rid, member, _ in images.values())
+                blob = blob.replace(b'</Relationships>', rels.encode('utf-8') + b'</Relationships>')
+            elif images and name == '[Content_Types].xml':
+                parts = [SimpleNamespace(partname=pn, content_type=ct) for pn, ct in self.parts]
+                parts += [SimpleNamespace(partname=PackURI('/' + member), content_type=image.content_type)
+                          for _, member, image in images.values()]
+                blob = _ContentTypesItem.from_parts(parts).blob
+            members.append((name, blob))
+        members[self.media_index:self.media_index] = [
+            (member, image.blob) for _, member, image in images.values()]
+
+        buf = BytesIO()
+        with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+            for name, blob in members:
+                z.writestr(name, blob)
+        return buf.getvalue()
+
+
+def get_docx_skeleton(doc_type, font_size_pt):
+    """
+    ქეშირებული skeleton; განლაგების ვერსიის შეცვლისას თავიდან იგება.
+    None - ამ განლაგებისთვის skeleton ვერ აიგო (ინახება, რომ ყოველ ჯერზე არ ცადოს).
+    """
+    plan = get_layout_plan(doc_type)
+    size = plan['font_size'] or font_size_pt
+    key = (doc_type, size)
+    with _skeleton_lock:
+        cached = _skeleton_cache.get(key)
+        if cached is None or cached[0] != plan['version']:
             try:
-                run = p_doc.add_run()
-                run.add_picture(img_stream, width=Inches(0.8))  # მცირე ზომა ტექსტის გასწვრივ
-            except:
-                pass
+                skeleton = DocxSkeleton(plan, size)
+            except SkeletonError as e:
+                print(f"DOCX skeleton disabled for {doc_type}: {e}")
+                skeleton = None
+            cached = _skeleton_cache[key] = (plan['version'], skeleton)
+        return cached[1]
 
-    doc.add_page_break()
-
-    # მიმდინარეობის ფურცელი
-    h_prog = doc.add_paragraph()
-    h_prog.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    r_prog = h_prog.add_run("პაციენტის მიმდინარეობის ფურცელი (დღიური)")
-    r_prog.font.bold = True
-    r_prog.font.size = Pt(14)
-    doc.add_paragraph()
-
-    # Initial
-    t_init = doc.add_table(rows=2, cols=1)
-    t_init.style = 'Table Grid'
-    head_init = "პირველადი შეფასება / მიღება"
-    if data.get('initial_date'):
-        head_init += f"  (თარიღი: {data.get('initial_date')})"
-    t_init.rows[0].cells[0].text = head_init
-    set_cell_shading(t_init.rows[0].cells[0], "D9E2F3")
-    t_init.rows[1].cells[0].text = data.get('initial_narrative', '')
-    doc.add_paragraph()
-
-    p_id = doc.add_paragraph()
-    r_id = p_id.add_run("წინასწარი დიაგნოზი: ")
-    r_id.font.bold = True
-    p_id.add_run(data.get('initial_diagnosis', ''))
-    doc.add_paragraph()
-
-    # დანიშნულებები
-    p_ord = doc.add_paragraph()
-    r_ord = p_ord.add_run("დანიშნულებები:")
-    r_ord.font.bold = True
-
-    if data.get('investigations'):
-        p_inv = doc.add_paragraph()
-        r_inv = p_inv.add_run("გამოკვლევები:")
-        r_inv.font.italic = True
-        for line in data['investigations'].split('\n'):
-            if line.strip():
-                b = doc.add_paragraph(style='List Bullet')
-                b.add_run(line.strip())
-
-    if data.get('medications'):
-        p_med = doc.add_paragraph()
-        r_med = p_med.add_run("მედიკამენტები:")
-        r_med.font.italic = True
-        for line in data['medications'].split('\n'):
+
+def render_docx(doc_type, data, font_size_pt=11):
+    """DOCX bytes skeleton-იდან; შეცდომისას - პირდაპირი აწყობა python-docx-ით"""
+    try:
+        skeleton = get_docx_skeleton(doc_type, font_size_pt)
+        if skeleton is not None:
+            return skeleton.render(data)
+    except Exception as e:
+        print(f"DOCX skeleton render failed, building directly: {e}")
+    plan = get_layout_plan(doc_type)
+    buf = BytesIO()
+    build_docx(plan, data, font_size_pt).save(buf)
+    return buf.getvalue()
+
+
+def save_docx(doc_type, data, docx_path, font_size_pt=11):
+    with span('build', backend='docx'):
+        blob = render_docx(doc_type, data, font_size_pt)
+    with span('save'):
+        return atomic_write(docx_path, blob)
+
+
+# ======================== Native PDF Renderer ========================
+
+PDF_FONT = 'DocSylfaen'
+PDF_FONT_BOLD = 'DocSylfaen-Bold'
+
+_pdf_fonts_ready = None
+_pdf_fonts_lock = threading.Lock()
+
+
+def native_pdf_available():
+    """reportlab და ქართული შრიფტი ხელმისაწვდომია? (შრიფტი რეგისტრირდება ერთხელ)"""
+    global _pdf_fonts_ready
+    if not load_reportlab():
+        return False
+    with _pdf_fonts_lock:
+        if _pdf_fonts_ready is None:
+            fonts = find_pdf_fonts()
+            if fonts:
+                pdfmetrics.registerFont(TTFont(PDF_FONT, fonts[0]))
+                pdfmetrics.registerFont(TTFont(PDF_FONT_BOLD, fonts[1]))
+                pdfmetrics.registerFontFamily(PDF_FONT, normal=PDF_FONT, bold=PDF_FONT_BOLD,
+                                              italic=PDF_FONT, boldItalic=PDF_FONT_BOLD)
+            else:
+                print("PDF renderer: Georgian font not found")
+            _pdf_fonts_ready = bool(fonts)
+        return _pdf_fonts_ready
+
+
+def _pdf_text(value):
+    """ტექსტი reportlab Paragraph-ის markup-ისთვის"""
+    return xml_escape(str(value)).replace('\n', '<br/>')
+
+
+class PdfStory:
+    """
+    render plan-ის გადაყვანა reportlab flowable-ებად - იგივე განლაგება, რაც
+    build_docx-ში: აბზაცი, ცარიელი ხაზი, 'Table Grid' ცხრილი, სია, ხელმოწერები.
+    """
+
+    def __init__(self, data, font_size_pt):
+        self.data = data
+        self.size = font_size_pt
+        self.width = letter[0] - 2.5 * cm
+        self.items = []
+
+    def style(self, size=None, align=None):
+        size = size or self.size
+        return ParagraphStyle('doc', fontName=PDF_FONT, fontSize=size,
+                              leading=size * 1.15, alignment=PDF_ALIGN[align])
+
+    def _run_size(self, r):
+        return self.size if r['size'] in (None, BASE) else r['size']
+
+    def paragraph(self, runs, align=None):
+        """run-ები -> Paragraph (ზომა - უდიდესი run-ის ზომა)"""
+        text_runs = [r for r in runs if 'image' not in r]
+        size = max([self._run_size(r) for r in text_runs] or [self.size])
+        parts = []
+        for r in text_runs:
+            markup = _pdf_text(fill_text(r['text'], self.data))
+            if r['bold']:
+                markup = f'<b>{markup}</b>'
+            if r['italic']:
+                markup = f'<i>{markup}</i>'
+            if self._run_size(r) != size:
+                markup = f'<font size="{self._run_size(r)}">{markup}</font>'
+            parts.append(markup)
+        return Paragraph(''.join(parts), self.style(size, align))
+
+    def image(self, r):
+        """ხელმოწერის სურათი ან None"""
+        sig = load_signature(self.data.get(r['image'], ''))
+        if not sig:
+            return None
+        if sig.image is None:
+            raise ValueError('invalid signature image')
+        w, h = sig.image.px_width, sig.image.px_height
+        return RLImage(sig.stream(), width=r['width'] * inch, height=r['width'] * inch * h / w)
+
+    def cell(self, c):
+        images = [r for r in c['runs'] if 'image' in r]
+        if not images:
+            return self.paragraph(c['runs'], c['align'])
+        r = images[0]
+        try:
+            img = self.image(r)
+        except Exception:
+            return self.paragraph([_compile_run(run(r['error'] or ''), {})], c['align'])
+        if img is None:
+            return self.paragraph([_compile_run(run(r['missing'] or ''), {})], c['align'])
+        img.hAlign = (c['align'] or 'left').upper()
+        return img
+
+    def add_paragraph(self, block):
+        text = self.paragraph(block['runs'], block['align'])
+        images = [r for r in block['runs'] if 'image' in r]
+        try:
+            img = self.image(images[0]) if images else None
+        except Exception:
+            img = None
+        if img is None:
+            self.items.append(text)
+            return
+
+        # ტექსტი + ხელმოწერის პატარა სურათი ერთ ხაზზე
+        t = Table([[text, img]], colWidths=[self.width - img.drawWidth, img.drawWidth])
+        t.setStyle(TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'BOTTOM'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]))
+        self.items.append(t)
+
+    def add_table(self, block):
+        cols = block['cols']
+        rows = []
+        commands = [
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5.4),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5.4),
+            ('TOPPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ]
+        if block['style'] == 'Table Grid':
+            commands.append(('GRID', (0, 0), (-1, -1), 0.5, colors.black))
+
+        for i, row in enumerate(block['rows']):
+            cells = []
+            for c in row:
+                j = len(cells)
+                last = j + c['span'] - 1
+                cells.append(self.cell(c))
+                cells.extend([''] * (c['span'] - 1))
+                if c['span'] > 1:
+                    commands.append(('SPAN', (j, i), (last, i)))
+                if c['shading']:
+                    commands.append(('BACKGROUND', (j, i), (last, i), colors.HexColor('#' + c['shading'])))
+                if c['align']:
+                    commands.append(('ALIGN', (j, i), (last, i), c['align'].upper()))
+            rows.append(cells)
+
+        t = Table(rows, colWidths=[self.width / cols] * cols)
+        t.setStyle(TableStyle(commands))
+        self.items.append(t)
+
+    def add_bullets(self, block):
+        value = self.data.get(block['key'])
+        if not value:
+            return
+        self.items.append(self.paragraph([_compile_run(run(block['heading'], italic=True,
+                                                            size=block.get('size')), {})]))
+        style = self.style(block.get('size'))
+        style.leftIndent = 0.63 * cm
+        style.bulletIndent = 0
+        for line in value.split('\n'):
             if line.strip():
-                b = doc.add_paragraph(style='List Bullet')
-                b.add_run(line.strip())
-    doc.add_paragraph()
-
-    # [2] ექიმის ხელმოწერა (დანიშნულებებთან)
-    _p_sig1 = doc.add_paragraph()
-    _p_sig1.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    _p_sig1.add_run(f"ექიმი: {data.get('doctor_signature', '')}")
-
-    if doctor_sig_data:
-        img_stream = decode_base64_image(doctor_sig_data)
-        if img_stream:
+                self.items.append(Paragraph(_pdf_text(line.strip()), style, bulletText='•'))
+
+    def build(self, plan):
+        for block in plan['blocks']:
+            kind = block['kind']
+            if kind == 'paragraph':
+                self.add_paragraph(block)
+            elif kind == 'table':
+                self.add_table(block)
+            elif kind == 'blank':
+                self.items.append(Spacer(1, self.size * 1.15))
+            elif kind == 'page_break':
+                self.items.append(PageBreak())
+            elif kind == 'bullets':
+                self.add_bullets(block)
+        return self.items
+
+
+def render_pdf_document(data, doc_type, pdf_path, font_size_pt=11):
+    """PDF-ის პირდაპირი რენდერი DOCX-ისა და ოფისის პაკეტის გარეშე (pdf_path - გზა ან ბუფერი)"""
+    if not native_pdf_available():  # პროცესების პულში - reportlab და შრიფტი ამ პროცესში
+        raise RuntimeError('reportlab or Georgian font not available')
+    plan = get_layout_plan(doc_type)
+    story = PdfStory(data, plan['font_size'] or font_size_pt).build(plan)
+
+    doc = SimpleDocTemplate(
+        pdf_path, pagesize=letter,
+        topMargin=1 * cm, bottomMargin=1 * cm, leftMargin=1.5 * cm, rightMargin=1 * cm)
+    doc.build(story)
+    return pdf_path
+
+
+def render_native_pdf(data, doc_type, pdf_path, font_size_pt=11):
+    """შიდა რენდერერით PDF-ის შექმნა (დავალების scratch-ში); წარუმატებლობისას None"""
+    if not native_pdf_available():
+        return None
+    buf = BytesIO()
+    try:
+        with span('convert', backend='native'):
+            render_pdf_document(data, doc_type, buf, font_size_pt)
+        return atomic_write(pdf_path, buf.getvalue())
+    except Exception as e:
+        print(f"Native PDF render failed: {e}")
+        return None
+
+
+# ======================== Document Store ========================
+#
+# დოკუმენტების არქივი: documents/YYYY/MM/<id> შარდები და append-only
+# manifest.jsonl (id, სახელი, პაციენტი, ტიპი, გზა, თარიღი). manifest იტვირთება
+# მეხსიერებაში ერთხელ - id -> ფაილი O(1), დიდ საქაღალდეზე listdir/exists-ის
+# გარეშე. id არის უნიკალური ფაილის სახელი (იგივე სახელის არსებობისას ემატება
+# _2, _3...), ამიტომ ერთ წამში შენახული ან ერთი და იგივე პაციენტის ხელახლა
+# დაბეჭდილი დოკუმენტები ერთმანეთს აღარ გადაეწერება. documents/-ის ძირში
+# დარჩენილი (ძველი ბრტყელი სტრუქტურის ან გარედან ჩაგდებული) ფაილები
+# შარდებში გადაიტანება migrate()-ით - გაშვებისას და კატალოგის watcher-იდან.
+# app-ის გარეთ წაშლილი ფაილების ჩანაწერებს prune() ამოშლის (გაშვებისას და
+# watcher-იდან DOCUMENT_PRUNE_INTERVAL-ში ერთხელ), manifest თავიდან იწერება.
+
+DOCUMENT_SUFFIXES = ('.docx', '.pdf', '.zip')
+DOCUMENT_MANIFEST = 'manifest.jsonl'
+
+
+class DocumentStore:
+    def __init__(self, root=DOCUMENTS_FOLDER):
+        self.root = root
+        self.manifest_path = os.path.join(root, DOCUMENT_MANIFEST)
+        self.lock = threading.Lock()
+        self.entries = {}     # id -> ჩანაწერი
+        self.reserved = set()  # ჩაწერის პროცესში მყოფი id-ები
+        self.rendered = {}    # (რენდერის ქეშის გასაღები, სახელი) -> id
+        self._load()
+
+    def _load(self):
+        try:
+            f = open(self.manifest_path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # ავარიისას ნახევრად ჩაწერილი ბოლო ხაზი
+                self.entries[entry['id']] = entry
+                if entry.get('key'):
+                    self.rendered[(entry['key'], entry['name'])] = entry['id']
+        # app-ის გარეთ წაშლილი ფაილები manifest-იდან ამოდის
+        self.prune()
+
+    def _append(self, entry):
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _reserve(self, name):
+        """უნიკალური id სახელიდან: name, name_2, name_3..."""
+        stem, ext = os.path.splitext(name)
+        with self.lock:
+            doc_id, n = name, 1
+            while doc_id in self.entries or doc_id in self.reserved:
+                n += 1
+                doc_id = f'{stem}_{n}{ext}'
+            self.reserved.add(doc_id)
+        return doc_id
+
+    def put(self, src_path, data=None, name=None, mtime=None, key=None):
+        """
+        ფაილის გადატანა შარდში (rename) და manifest-ში ჩაწერა -> ჩანაწერი.
+        mtime - შარდის თარიღი (მიგრაციისას ფაილის თარიღი, სხვაგვარად - ახლა).
+        key - რენდერის ქეშის გასაღები (იგივე მოთხოვნის ხელახლა ბეჭდვისას find() აბრუნებს ამ ფაილს).
+        """
+        data = data or {}
+        doc_id = self._reserve(name or os.path.basename(src_path))
+        try:
+            created = datetime.fromtimestamp(mtime) if mtime else datetime.now()
+            rel = f'{created:%Y}/{created:%m}/{doc_id}'
+            dest = os.path.join(self.root, *rel.split('/'))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            publish_file(src_path, dest)
+            st = os.stat(dest)
+            entry = {'id': doc_id, 'name': name or os.path.basename(src_path), 'path': rel,
+                     'type': data.get('document_type', ''), 'patient': data.get('patient_name', ''),
+                     'created': created.isoformat(timespec='seconds'),
+                     'mtime': st.st_mtime, 'size': st.st_size}
+            if key:
+                entry['key'] = key
+            with self.lock:
+                self._append(entry)
+                self.entries[doc_id] = entry
+                if key:
+                    self.rendered[(key, entry['name'])] = doc_id
+        finally:
+            with self.lock:
+                self.reserved.discard(doc_id)
+        return entry
+
+    def entry(self, doc_id):
+        with self.lock:
+            return self.entries.get(doc_id)
+
+    def find(self, key, name):
+        """იგივე გასაღებითა და სახელით არქივში არსებული დოკუმენტის id ან None"""
+        with self.lock:
+            doc_id = self.rendered.get((key, name))
+        path = self.path(doc_id) if doc_id else None
+        return doc_id if path and os.path.isfile(path) else None
+
+    def path(self, doc_id):
+        """id -> ფაილის სრული გზა ან None"""
+        entry = self.entry(doc_id)
+        return os.path.join(self.root, *entry['path'].split('/')) if entry else None
+
+    def list(self):
+        with self.lock:
+            return list(self.entries.values())
+
+    def prune(self):
+        """ჩანაწერები, რომელთა ფაილი დისკზე აღარ არის -> manifest-იდან ამოშლა; -> წაშლილი id-ები"""
+        with self.lock:
+            snapshot = list(self.entries.values())
+        missing = [e for e in snapshot if not os.path.isfile(os.path.join(self.root, *e['path'].split('/')))]
+        if not missing:
+            return []
+        removed = []
+        with self.lock:
+            for entry in missing:
+                # შემოწმებისას იგივე id-ით ახალი ჩანაწერი შეიძლება დაემატა
+                if self.entries.get(entry['id']) is not entry:
+                    continue
+                del self.entries[entry['id']]
+                if entry.get('key') and self.rendered.get((entry['key'], entry['name'])) == entry['id']:
+                    del self.rendered[(entry['key'], entry['name'])]
+                removed.append(entry['id'])
+            if removed:
+                lines = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self.entries.values())
+                atomic_write(self.manifest_path, lines.encode('utf-8'))
+        return removed
+
+    def migrate(self, progress=None):
+        """documents/-ის ძირში არსებული ფაილები -> შარდები (id = ძველი სახელი, ბმულები რჩება)"""
+        migrated = []
+        for e in os.scandir(self.root):
+            if not e.is_file() or not e.name.endswith(DOCUMENT_SUFFIXES):
+                continue
+            try:
+                migrated.append(self.put(e.path, mtime=e.stat().st_mtime))
+            except OSError as err:
+                print(f"Document store: cannot migrate {e.name}: {err}")
+                continue
+            if progress:
+                progress(migrated[-1])
+        return migrated
+
+
+_document_store = None
+_document_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """საერთო არქივი; პირველ გამოძახებაზე manifest იტვირთება და ძველი ფაილები გადაიტანება"""
+    global _document_store
+    with _document_store_lock:
+        if _document_store is None:
+            store = DocumentStore()
+            migrated = store.migrate()
+            if migrated:
+                print(f"📦 {len(migrated)} დოკუმენტი გადატანილია არქივის შარდებში")
+            _document_store = store
+        return _document_store
+
+
+def publish_document(path, data=None, key=None):
+    """scratch-ში შექმნილი ფაილი -> არქივი, კატალოგი და ძებნის ინდექსი; -> დოკუმენტის id"""
+    entry = get_document_store().put(path, data, key=key)
+    record_document(entry['id'], data)
+    return entry['id']
+
+
+def document_path(doc_id):
+    """არქივის დოკუმენტის გზა manifest-იდან (O(1)) ან None"""
+    path = get_document_store().path(doc_id)
+    return path if path and os.path.isfile(path) else None
+
+
+# ======================== Template Store ========================
+#
+# შაბლონები SQLite-ში (templates.db): სიისა და ძებნის ველები ცალკე
+# სვეტებშია (ინდექსით), დანარჩენი - კომპაქტური JSON. ხელმოწერები და სხვა
+# გრძელი მნიშვნელობები ინახება ერთხელ, შიგთავსის sha1-ით blobs/ab/<sha1>
+# ფაილებში (data URL - დეკოდირებული სურათი), შაბლონში კი რჩება
+# '@blob:<sha1>'. ერთი ხელმოწერა ასობით შაბლონში დისკზე ერთხელ წერია, სია
+# SQL-ით გვერდდება JSON-ის გახსნის გარეშე, ბრაუზერი სურათს /api/blobs/-დან
+# იღებს (immutable). id უნიკალურია - ერთ წამში შენახული შაბლონები ერთმანეთს
+# აღარ ცვლის. saved_templates/*.json (ძველი ფორმატი ან გარედან ჩაგდებული)
+# იმპორტდება migrate()-ით (id = ფაილის სახელი) და გადადის imported/-ში.
+
+BLOB_REF_PREFIX = '@blob:'
+TEMPLATE_SLUG_MAX = 60
+_TEMPLATE_SLUG_RE = re.compile(r'[^\w-]+')
+_BLOB_REF_RE = re.compile(r'@blob:([0-9a-f]{40})\Z')
+_SHA1_RE = re.compile(r'[0-9a-f]{40}\Z')
+
+_TEMPLATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    patient TEXT,
+    personal_id TEXT,
+    document_type TEXT,
+    created TEXT,
+    mtime REAL,
+    etag TEXT,
+    name_key TEXT,
+    patient_key TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS templates_created ON templates (created, mtime);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha1 TEXT PRIMARY KEY,
+    mime TEXT NOT NULL,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS template_blobs (
+    template_id TEXT NOT NULL,
+    sha1 TEXT NOT NULL,
+    PRIMARY KEY (template_id, sha1)
+);
+CREATE INDEX IF NOT EXISTS template_blobs_sha1 ON template_blobs (sha1);
+"""
+
+_TEMPLATE_COLUMNS = 'id, name, patient, personal_id, document_type, created, mtime, etag'
+
+
+def template_slug(name):
+    """შაბლონის სახელი -> id-ის ნაწილი URL-სა და ფაილის გზაში (ასოები, ციფრები, _ და -)"""
+    slug = _TEMPLATE_SLUG_RE.sub('_', name).strip('_-')[:TEMPLATE_SLUG_MAX].rstrip('_-')
+    return slug or 'Template'
+
+
+class TemplateStore:
+    """შაბლონები + blob-ები ერთი კავშირით (lock-ით დაცული)"""
+
+    def __init__(self, path=TEMPLATE_DB_PATH, blobs=BLOBS_FOLDER):
+        self.blobs = blobs
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_TEMPLATE_SCHEMA)
+
+    # --- blob-ები ---
+
+    def _blob_path(self, sha1):
+        return os.path.join(self.blobs, sha1[:2], sha1)
+
+    def _put_blob(self, value):
+        """
+        გრძელი მნიშვნელობა -> blob ფაილი; -> (sha1, mime, ზომა).
+        base64 data URL ინახება დეკოდირებული (mime - 'image/png'), სხვა ტექსტი - UTF-8 (mime '').
+        """
+        blob, mime = value.encode('utf-8'), ''
+        header, sep, payload = value.partition(',')
+        if sep and header.startswith('data:') and header.endswith(';base64'):
             try:
-                run = _p_sig1.add_run()
-                run.add_picture(img_stream, width=Inches(0.8))
-            except:
+                decoded = base64.b64decode(payload, validate=True)
+            except ValueError:
+                decoded = None
+            # მხოლოდ მაშინ, თუ უკან ზუსტად იგივე სტრიქონი აიწყობა
+            if decoded is not None and base64.b64encode(decoded).decode('ascii') == payload:
+                blob, mime = decoded, header[len('data:'):-len(';base64')]
+        sha1 = hashlib.sha1(blob).hexdigest()
+        path = self._blob_path(sha1)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, blob)
+        return sha1, mime, len(blob)
+
+    def blob(self, sha1):
+        """-> (bytes, mime) ან None"""
+        with self.lock:
+            row = self.conn.execute('SELECT mime FROM blobs WHERE sha1 = ?', (sha1,)).fetchone()
+        if not row:
+            return None
+        try:
+            with open(self._blob_path(sha1), 'rb') as f:
+                return f.read(), row[0]
+        except FileNotFoundError:
+            return None
+
+    def blob_value(self, sha1):
+        """blob -> საწყისი მნიშვნელობა (data URL ან ტექსტი); უცნობი blob -> ''"""
+        found = self.blob(sha1)
+        if not found:
+            print(f"Unknown template blob: {sha1}")
+            return ''
+        blob, mime = found
+        if mime:
+            return f'data:{mime};base64,' + base64.b64encode(blob).decode('ascii')
+        return blob.decode('utf-8')
+
+    def expand(self, data):
+        """'@blob:<sha1>' მნიშვნელობები -> საწყისი მნიშვნელობები"""
+        expanded = {}
+        for key, value in data.items():
+            m = _BLOB_REF_RE.match(value) if isinstance(value, str) else None
+            expanded[key] = self.blob_value(m.group(1)) if m else value
+        return expanded
+
+    def _compact(self, data):
+        """გრძელი მნიშვნელობები -> '@blob:<sha1>'; -> (data, [(sha1, mime, ზომა)])"""
+        compact, blobs = {}, []
+        for key, value in data.items():
+            if isinstance(value, str):
+                m = _BLOB_REF_RE.match(value)
+                if m:
+                    # შაბლონიდან შევსებული ფორმა - blob უკვე შენახულია
+                    blobs.append((m.group(1), None, None))
+                elif len(value) >= TEMPLATE_BLOB_MIN_SIZE:
+                    blobs.append(self._put_blob(value))
+                    value = BLOB_REF_PREFIX + blobs[-1][0]
+            compact[key] = value
+        return compact, blobs
+
+    def _gc_blobs(self, sha1s):
+        """აღარავის მიერ გამოყენებული blob-ების წაშლა (lock-ის ქვეშ)"""
+        for sha1 in sha1s:
+            if self.conn.execute('SELECT 1 FROM template_blobs WHERE sha1 = ? LIMIT 1', (sha1,)).fetchone():
+                continue
+            self.conn.execute('DELETE FROM blobs WHERE sha1 = ?', (sha1,))
+            try:
+                os.remove(self._blob_path(sha1))
+            except FileNotFoundError:
                 pass
 
-    doc.add_paragraph()
-    doc.add_paragraph()
-
-    # გაწერა
-    t_dis = doc.add_table(rows=2, cols=1)
-    t_dis.style = 'Table Grid'
-    head_dis = "გადაფასება / გაწერა"
-    if data.get('discharge_note_date'):
-        head_dis += f"  (თარიღი: {data.get('discharge_note_date')})"
-    t_dis.rows[0].cells[0].text = head_dis
-    set_cell_shading(t_dis.rows[0].cells[0], "E2EFDA")
-    t_dis.rows[1].cells[0].text = data.get('discharge_narrative', '')
-    doc.add_paragraph()
-
-    # [3] ექიმის ხელმოწერა (გაწერასთან)
-    _p_sig2 = doc.add_paragraph()
-    _p_sig2.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    _p_sig2.add_run(f"ექიმი: {data.get('discharge_doctor', '')}")
-
-    if doctor_sig_data:
-        img_stream = decode_base64_image(doctor_sig_data)
-        if img_stream:
+    # --- შაბლონები ---
+
+    def _new_id(self, name):
+        """სახელი_YYYYmmdd_HHMMSS; დაკავებულის შემთხვევაში _2, _3..."""
+        base = f"{template_slug(name)}_{datetime.now():%Y%m%d_%H%M%S}"
+        tid, n = base, 1
+        while self.conn.execute('SELECT 1 FROM templates WHERE id = ?', (tid,)).fetchone():
+            n += 1
+            tid = f'{base}_{n}'
+        return tid
+
+    def put(self, data, tid=None, mtime=None):
+        """შაბლონის შენახვა (tid-ის გარეშე - ახალი id); -> id"""
+        with self.lock:
+            compact, blobs = self._compact(data)
+            body = json.dumps(compact, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+            etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+            with self.conn:
+                if tid is None:
+                    tid = self._new_id(str(data.get('template_name') or 'Template'))
+                old = [r[0] for r in self.conn.execute(
+                    'SELECT sha1 FROM template_blobs WHERE template_id = ?', (tid,))]
+                name = data.get('template_name', f'{tid}.json')
+                patient = data.get('patient_name', '')
+                # name_key/patient_key - casefold() ძებნისა და დალაგებისთვის
+                self.conn.execute(
+                    f'INSERT OR REPLACE INTO templates ({_TEMPLATE_COLUMNS}, name_key, patient_key, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (tid, name, patient, str(data.get('personal_id', '')), data.get('document_type', 'form_100'),
+                     str(data.get('created', ''))[:16].replace('T', ' '), mtime or time.time(), etag,
+                     str(name).casefold(), str(patient).casefold(), body))
+                self.conn.executemany('INSERT OR IGNORE INTO blobs (sha1, mime, size) VALUES (?, ?, ?)',
+                                      [b for b in blobs if b[1] is not None])
+                self.conn.execute('DELETE FROM template_blobs WHERE template_id = ?', (tid,))
+                self.conn.executemany('INSERT OR IGNORE INTO template_blobs (template_id, sha1) VALUES (?, ?)',
+                                      [(tid, b[0]) for b in blobs])
+                self._gc_blobs(set(old) - {b[0] for b in blobs})
+        return tid
+
+    def remove(self, tid):
+        """შაბლონის და მხოლოდ მისი blob-ების წაშლა; -> True, თუ არსებობდა"""
+        with self.lock, self.conn:
+            sha1s = [r[0] for r in self.conn.execute(
+                'SELECT sha1 FROM template_blobs WHERE template_id = ?', (tid,))]
+            deleted = self.conn.execute('DELETE FROM templates WHERE id = ?', (tid,)).rowcount
+            self.conn.execute('DELETE FROM template_blobs WHERE template_id = ?', (tid,))
+            self._gc_blobs(sha1s)
+        return bool(deleted)
+
+    @staticmethod
+    def _entry(row, data=None):
+        entry = dict(zip(('id', 'name', 'patient', 'personal_id', 'document_type', 'created', 'mtime', 'etag'), row))
+        if data is not None:
+            entry['data'] = json.loads(data)
+        return entry
+
+    def get(self, tid):
+        """ჩანაწერი კომპაქტური data-თი ('@blob:' მითითებებით) ან None"""
+        with self.lock:
+            row = self.conn.execute(f'SELECT {_TEMPLATE_COLUMNS}, data FROM templates WHERE id = ?',
+                                    (tid,)).fetchone()
+        return self._entry(row[:-1], row[-1]) if row else None
+
+    def data(self, tid):
+        """სრული მონაცემები (blob-ები გაშლილი) რენდერისთვის ან None"""
+        entry = self.get(tid)
+        return self.expand(entry['data']) if entry else None
+
+    def find(self, tid):
+        """შაბლონის id, თუ ზუსტად ასეთი არსებობს, ან None (prefix-ით არა - "abc" არ ნიშნავს "abc_def"-ს)"""
+        with self.lock:
+            row = self.conn.execute('SELECT id FROM templates WHERE id = ?', (tid,)).fetchone()
+        return row[0] if row else None
+
+    def query(self, doc_type=None, q='', sort='-created', offset=0, limit=None, full=False):
+        """
+        ფილტრი, დალაგება და გვერდი SQL-ით; q - casefold() ტექსტი სახელში,
+        პაციენტში ან პირად ნომერში. -> (სულ, ჩანაწერები)
+        """
+        where, params = [], []
+        if doc_type:
+            where.append('document_type = ?')
+            params.append(doc_type)
+        if q:
+            where.append('(instr(name_key, ?) OR instr(patient_key, ?) OR instr(personal_id, ?))')
+            params += [q, q, q]
+        sql_where = f" WHERE {' AND '.join(where)}" if where else ''
+
+        key = sort.lstrip('-')
+        if key not in TEMPLATE_SORT_KEYS:
+            key = 'created'
+        order = 'DESC' if sort.startswith('-') else 'ASC'
+        order_by = f'created {order}, mtime {order}' if key == 'created' else f'{key}_key {order}'
+
+        columns = _TEMPLATE_COLUMNS + (', data' if full else '')
+        with self.lock:
+            total = self.conn.execute(f'SELECT COUNT(*) FROM templates{sql_where}', params).fetchone()[0]
+            rows = self.conn.execute(
+                f'SELECT {columns} FROM templates{sql_where} ORDER BY {order_by}, id LIMIT ? OFFSET ?',
+                params + [-1 if limit is None else limit, offset]).fetchall()
+        if full:
+            return total, [self._entry(r[:-1], r[-1]) for r in rows]
+        return total, [self._entry(r) for r in rows]
+
+    def mtimes(self):
+        """{id: mtime} - ძებნის ინდექსის სინქრონიზაციისთვის"""
+        with self.lock:
+            return dict(self.conn.execute('SELECT id, mtime FROM templates').fetchall())
+
+    def stats(self):
+        """-> (შაბლონები, blob-ები, blob-ების ბაიტები)"""
+        with self.lock:
+            templates = self.conn.execute('SELECT COUNT(*) FROM templates').fetchone()[0]
+            blobs, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        return templates, blobs, size
+
+    def migrate(self, folder=TEMPLATES_FOLDER):
+        """folder/*.json -> საცავი (id = ფაილის სახელი, ბმულები რჩება); ფაილი გადადის imported/-ში"""
+        migrated = []
+        try:
+            files = [e for e in os.scandir(folder) if e.is_file() and e.name.endswith('.json')]
+        except OSError:
+            return migrated
+        for e in files:
+            tid = e.name[:-len('.json')]
             try:
-                run = _p_sig2.add_run()
-                run.add_picture(img_stream, width=Inches(0.8))
-            except:
-                pass
+                with open(e.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.put(data, tid=tid, mtime=e.stat().st_mtime)
+                os.makedirs(os.path.join(folder, 'imported'), exist_ok=True)
+                os.replace(e.path, os.path.join(folder, 'imported', e.name))
+            except (OSError, ValueError, AttributeError) as err:
+                print(f"Template store: cannot import {e.name}: {err}")
+                continue
+            migrated.append(tid)
+        return migrated
+
+
+_template_store = None
+_template_store_lock = threading.Lock()
+
+
+def get_template_store():
+    """საერთო საცავი; პირველ გამოძახებაზე saved_templates/*.json იმპორტდება"""
+    global _template_store
+    with _template_store_lock:
+        if _template_store is None:
+            store = TemplateStore()
+            migrated = store.migrate()
+            if migrated:
+                print(f"📦 {len(migrated)} შაბლონი იმპორტირებულია templates.db-ში")
+            _template_store = store
+        return _template_store
+
+
+# ======================== Search Index ========================
+#
+# პაციენტების ძებნა SQLite FTS5 ინდექსით: დოკუმენტები (არქივის manifest) და
+# შაბლონები (templates.db) - სახელი, პირადი ნომერი, ბარათის ნომერი,
+# ფაილის/შაბლონის სახელი და თარიღები. ინდექსი ახლდება ჩაწერისა და წაშლისას,
+# გაშვებისას კი დისკთან სინქრონდება (rebuild). ტექსტი ნორმალიზდება casefold()-ით
+# (მთავრული -> მხედრული), ძებნა პრეფიქსით ხდება.
+
+SEARCH_LIMIT = 50
+
+_SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT,
+    ref TEXT,
+    patient TEXT,
+    date TEXT,
+    mtime REAL,
+    terms TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_mtime ON entries (mtime);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    terms, content='entries', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, terms) VALUES (new.id, new.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, terms) VALUES ('delete', old.id, old.terms);
+    INSERT INTO entries_fts (rowid, terms) VALUES (new.id, new.terms);
+END;
+"""
+
+_SEARCH_TOKEN_RE = re.compile(r'\w+')
+
+
+def _search_terms(*values):
+    return ' '.join(str(v) for v in values if v).casefold()
+
+
+class SearchIndex:
+    """FTS5 ინდექსი ერთი კავშირით (lock-ით დაცული)"""
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(_SEARCH_SCHEMA)
+
+    def _upsert(self, key, type_, name, ref, patient, date, mtime, terms):
+        self.conn.execute(
+            'INSERT INTO entries (key, type, name, ref, patient, date, mtime, terms) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET type=excluded.type, name=excluded.name, ref=excluded.ref, '
+            'patient=excluded.patient, date=excluded.date, mtime=excluded.mtime, terms=excluded.terms',
+            (key, type_, name, ref, patient, date, mtime, terms))
+
+    def add_document(self, filename, data=None):
+        """არქივში ჩაწერილი დოკუმენტი (data - ფორმის მონაცემები, თუ ცნობილია)"""
+        entry = get_document_store().entry(filename)
+        if not entry:
+            return
+        mtime = entry['mtime']
+        date = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M')
+        key = f'document:{filename}'
+        with self.lock, self.conn:
+            if data is None:
+                # დისკიდან ნაპოვნი ფაილი - ჩაწერისას დამატებული ველები (პირადი ნომერი...) რჩება
+                updated = self.conn.execute('UPDATE entries SET mtime = ?, date = ? WHERE key = ?',
+                                            (mtime, date, key)).rowcount
+                if updated:
+                    return
+                data = {}
+            terms = _search_terms(filename, data.get('patient_name'), data.get('personal_id'),
+                                  data.get('card_number'), data.get('document_date'), data.get('issue_date'))
+            self._upsert(key, 'document', filename, f'/api/download/{filename}',
+                         data.get('patient_name', ''), date, mtime, terms)
+
+    def add_template(self, tid, data, mtime=None):
+        terms = _search_terms(data.get('template_name'), data.get('patient_name'), data.get('personal_id'),
+                              data.get('card_number'), data.get('created'), data.get('document_date'))
+        with self.lock, self.conn:
+            self._upsert(f'template:{tid}', 'template', data.get('template_name', tid), tid,
+                         data.get('patient_name', '-'), data.get('created', '')[:16].replace('T', ' '),
+                         mtime or time.time(), terms)
+
+    def remove(self, type_, name):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM entries WHERE key = ?', (f'{type_}:{name}',))
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        tokens = _SEARCH_TOKEN_RE.findall(query.casefold())
+        if not tokens:
+            return []
+        match = ' AND '.join(f'"{t}"*' for t in tokens)
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT e.type, e.name, e.ref, e.patient, e.date FROM entries_fts '
+                'JOIN entries e ON e.id = entries_fts.rowid '
+                'WHERE entries_fts MATCH ? ORDER BY e.mtime DESC LIMIT ?', (match, limit)).fetchall()
+        results = []
+        for type_, name, ref, patient, date in rows:
+            if type_ == 'document':
+                results.append({'type': 'document', 'name': name, 'path': ref, 'date': date})
+            else:
+                results.append({'type': 'template', 'name': name, 'id': ref, 'patient': patient, 'date': date})
+        return results
+
+    def rebuild(self):
+        """არქივთან და შაბლონებთან სინქრონიზაცია: ახალი/შეცვლილი ემატება, წაშლილი - იშლება"""
+        with self.lock:
+            known = dict(self.conn.execute('SELECT key, mtime FROM entries').fetchall())
+        seen = set()
+
+        for entry in get_document_store().list():
+            key = f'document:{entry["id"]}'
+            seen.add(key)
+            if known.get(key) != entry['mtime']:
+                self.add_document(entry['id'])
+
+        store = get_template_store()
+        for tid, mtime in store.mtimes().items():
+            key = f'template:{tid}'
+            seen.add(key)
+            if known.get(key) != mtime:
+                entry = store.get(tid)
+                if entry:
+                    self.add_template(tid, entry['data'], mtime)
+
+        stale = [k for k in known if k not in seen]
+        with self.lock, self.conn:
+            self.conn.executemany('DELETE FROM entries WHERE key = ?', [(k,) for k in stale])
+        return len(seen)
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """საერთო ინდექსი; None, თუ SQLite-ს FTS5 არ აქვს"""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            try:
+                _search_index = SearchIndex()
+            except sqlite3.Error as e:
+                print(f"Search index unavailable: {e}")
+                _search_index = False
+        return _search_index or None
+
+
+# ======================== Catalog ========================
+#
+# ჩაწერის გზების საერთო წერტილი: დოკუმენტები (არქივის manifest) და შაბლონები
+# (templates.db) + ძებნის ინდექსის განახლება. ფონური watcher (ყოველ 5 წამში)
+# გარედან ჩაგდებულ ფაილებს გადაიტანს: documents/-ში - არქივში,
+# saved_templates/*.json - შაბლონების საცავში.
+
+class Catalog:
+    def __init__(self):
+        self.pruned_at = time.monotonic()
+        self.scan(notify=False)
+
+    def scan(self, notify=True):
+        """ჩაგდებული ფაილების გადატანა საცავებში; ცვლილებები გადაეცემა ძებნის ინდექსს"""
+        index = get_search_index() if notify else None
+
+        documents = get_document_store()
+        migrated = documents.migrate()
+        if index:
+            for entry in migrated:
+                index.add_document(entry['id'])
+
+        # გარედან წაშლილი დოკუმენტები - იშვიათად, რადგან ყველა ფაილის stat სჭირდება
+        if time.monotonic() - self.pruned_at >= DOCUMENT_PRUNE_INTERVAL:
+            self.pruned_at = time.monotonic()
+            for doc_id in documents.prune():
+                if index:
+                    index.remove('document', doc_id)
+
+        store = get_template_store()
+        for tid in store.migrate():
+            entry = store.get(tid)
+            if index and entry:
+                index.add_template(tid, entry['data'], entry['mtime'])
+
+    # --- აპლიკაციის ჩაწერის გზები ---
+
+    def add_document(self, filename, data=None):
+        index = get_search_index()
+        if index:
+            try:
+                index.add_document(filename, data)
+            except sqlite3.Error as e:
+                print(f"Search index update failed: {e}")
+
+    def add_template(self, data):
+        """ახალი შაბლონი -> id"""
+        store = get_template_store()
+        tid = store.put(data)
+        index = get_search_index()
+        if index:
+            entry = store.get(tid)
+            index.add_template(tid, entry['data'], entry['mtime'])
+        return tid
+
+    def remove_template(self, tid):
+        get_template_store().remove(tid)
+        index = get_search_index()
+        if index:
+            index.remove('template', tid)
+
+    # --- წაკითხვა ---
+
+    def list_documents(self):
+        return get_document_store().list()
+
+    def watch(self, interval=CATALOG_POLL_INTERVAL):
+        # გაშვებისას ინდექსი სრულად სინქრონდება დისკთან (გათიშვისას წაშლილი ფაილებიც)
+        index = get_search_index()
+        if index:
+            try:
+                index.rebuild()
+            except Exception as e:
+                print(f"Search index rebuild failed: {e}")
+        while True:
+            time.sleep(interval)
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Catalog watcher error: {e}")
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """საერთო კატალოგი; პირველ გამოძახებაზე იტვირთება და იწყებს დაკვირვებას"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+            threading.Thread(target=_catalog.watch, daemon=True, name='catalog-watcher').start()
+        return _catalog
+
+
+def record_document(filename, data=None):
+    """არქივში ჩაწერილი დოკუმენტის რეგისტრაცია კატალოგსა და ძებნის ინდექსში"""
+    get_catalog().add_document(filename, data)
+
+
+# ======================== Render Cache ========================
+#
+# ერთი და იგივე ფორმის ხელახალი ბეჭდვა (ასლი პაციენტისთვის, დამსაქმებლისთვის)
+# აღარ აწყობს DOCX-ს და აღარ უშვებს კონვერტაციას: PDF ინახება render_cache/-ში
+# გასაღებით = sha1(მონაცემები + დოკუმენტის ტიპი + შრიფტის ზომა + backend +
+# განლაგების ვერსია). backend არის ის, ვინც PDF რეალურად შექმნა ('native' ან
+# 'office') - კონვერტორის არქონისას შიდა რენდერერით შექმნილი PDF აღარ
+# გაიცემა 'auto'-ზე, როცა Word/LibreOffice ხელმისაწვდომი გახდება. იგივე
+# მოთხოვნა არქივში ახალ ასლს აღარ ქმნის - ბრუნდება უკვე შენახული დოკუმენტი.
+# დისკზე ზომა შეზღუდულია; პირველად იშლება ყველაზე დიდი ხნის წინ გამოყენებული
+# (LRU, mtime-ით).
+
+RENDER_CACHE_IGNORED_KEYS = {'filename', 'async', 'renderer'}
+
+
+def render_backend(renderer):
+    """ვინ შექმნიდა PDF-ს ახლა: 'native' (reportlab) ან 'office' (Word/LibreOffice)"""
+    if renderer == 'pdf' or (renderer == 'auto' and not office_converter_ready()):
+        return 'native'
+    return 'office'
+
+
+def render_cache_key(data, doc_type, font_size_pt, backend='office'):
+    payload = {k: v for k, v in data.items() if k not in RENDER_CACHE_IGNORED_KEYS}
+    canonical = json.dumps({
+        'doc_type': doc_type,
+        'size': font_size_pt,
+        'backend': backend,
+        'layout': get_layout_plan(doc_type)['version'],
+        'data': payload,
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    def __init__(self, folder=RENDER_CACHE_FOLDER, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size (ძველიდან ახლისკენ)
+        self.total = 0
+        self.hits = self.misses = self.evictions = 0
+
+        os.makedirs(folder, exist_ok=True)
+        files = [e for e in os.scandir(folder) if e.is_file() and e.name.endswith('.pdf')]
+        for e in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.entries[e.name[:-len('.pdf')]] = e.stat().st_size
+            self.total += e.stat().st_size
+
+    def _path(self, key):
+        return os.path.join(self.folder, f'{key}.pdf')
+
+    def fetch(self, key, target_path):
+        """ქეშში არსებული PDF-ის ასლი target_path-ზე -> True, ან False"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return False
+            self.entries.move_to_end(key)
+        try:
+            atomic_copy(self._path(key), target_path)
+            os.utime(self._path(key))
+        except OSError:
+            with self.lock:
+                self.misses += 1
+                if key in self.entries:
+                    self.total -= self.entries.pop(key)
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, pdf_path):
+        try:
+            atomic_copy(pdf_path, self._path(key))
+            size = os.path.getsize(self._path(key))
+        except OSError as e:
+            print(f"Render cache store failed: {e}")
+            return
+        with self.lock:
+            self.total += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                old, old_size = self.entries.popitem(last=False)
+                self.total -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old))
+                except OSError:
+                    pass
 
-    return doc
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache():
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            _render_cache = RenderCache()
+        return _render_cache
+
+
+def cached_pdf_job(data, doc_type, font_size_pt, pdf_path, render, key=None):
+    """
+    render() -> შედეგი {'path': ..., 'backend': ...}; თუ იგივე მონაცემებით PDF
+    უკვე არსებობს ქეშში, pdf_path იქმნება ასლით რენდერის გარეშე.
+    შედეგის 'key' - ქეშის გასაღები, რომლითაც PDF შეინახა (ან იპოვა).
+    """
+    cache = get_render_cache()
+    if key is None:
+        key = render_cache_key(data, doc_type, font_size_pt, render_backend(data.get('renderer', 'auto')))
+    with span('cache_lookup'):
+        hit = cache.fetch(key, pdf_path)
+    if hit:
+        return {'success': True, 'path': pdf_path, 'is_pdf': True, 'cached': True, 'key': key}
+
+    result = render()
+    if result.get('success') and result.get('is_pdf'):
+        # გასაღები - რეალური backend-ით (კონვერტორის ჩავარდნისას შიდა რენდერერი)
+        result['key'] = render_cache_key(data, doc_type, font_size_pt, result.pop('backend', 'office'))
+        cache.store(result['key'], result['path'])
+    return result
+
+
+# ======================== Document Jobs ========================
+#
+# შენახვა და ბეჭდვა (DOCX აწყობა + PDF კონვერტაცია) სრულდება შეზღუდული
+# რაოდენობის worker thread-ში; კლიენტი იღებს დავალების id-ს და ამოწმებს
+# სტატუსს /api/jobs/<id>-ით. ერთდროულად ბეჭდავს რამდენიმე ექიმი - არც ერთი
+# მოთხოვნა არ ბლოკავს Flask-ის thread-ს 60 წამით.
+
+def resolve_request_data(data):
+    """
+    კომპაქტური მოთხოვნა -> სრული მონაცემები: {'template_id': ..., ...შეცვლილი ველები}
+    ივსება შენახული შაბლონით, '@blob:<sha1>' მნიშვნელობები - შაბლონების
+    საცავიდან, '@saved:<type>' ხელმოწერები - signatures/-დან.
+    """
+    tid = data.get('template_id')
+    if tid:
+        if not isinstance(tid, str):
+            raise UnresolvedReference(f'არასწორი template_id: {tid!r}', 'template_id', status=400)
+        template = load_template(tid)
+        if template is None:
+            raise UnresolvedReference(f'შაბლონი ვერ მოიძებნა: {tid}', 'template_id', status=404)
+        # შაბლონის სახელი/თარიღი ფორმის ველი არ არის - სრულ მოთხოვნასთან იგივე მონაცემები და ქეშის გასაღები
+        template = {k: v for k, v in template.items() if k not in TEMPLATE_META_KEYS}
+        data = dict(template, **{k: v for k, v in data.items() if k != 'template_id'})
+    blobs = [k for k, v in data.items() if isinstance(v, str) and _BLOB_REF_RE.match(v)]
+    if blobs:
+        store = get_template_store()
+        for key in blobs:
+            if not store.blob(data[key][len(BLOB_REF_PREFIX):]):
+                raise UnresolvedReference(f'შაბლონის სურათი ვერ მოიძებნა: {data[key]}', key)
+        data = store.expand(data)
+    return resolve_signature_refs(data)
+
+
+def resolve_request(data):
+    """
+    HTTP მოთხოვნის ყველა მითითება იხსნება მიღებისთანავე (დავალების რიგში
+    ჩაყენებამდე): 'documents' (გაერთიანებული ბეჭდვა) და 'items' (ჯგუფური) - თითოეული
+    ცალკე. ხელმოწერა ფიქსირდება მოთხოვნის მომენტში; გადაუჭრელი -> UnresolvedReference
+    """
+    lists = {k: data[k] for k in ('documents', 'items') if isinstance(data.get(k), list)}
+    resolved = resolve_request_data({k: v for k, v in data.items() if k not in lists})
+    for key, parts in lists.items():
+        resolved[key] = [resolve_request_data({'template_id': p} if isinstance(p, str) else p)
+                         if isinstance(p, (str, dict)) else p for p in parts]
+    return resolved
+
+
+JOB_STAGES = {'queued': 0, 'rendering': 25, 'converting': 60, 'merging': 90, 'done': 100, 'error': 100}
+
+
+def _document_job(data, doc_type, font_size_pt, filename, render):
+    """
+    render(work_dir) -> {'path': ...} დავალების scratch საქაღალდეში (ან ქეშიდან);
+    მზა ფაილი გადადის არქივში და შედეგში 'filename' არის დოკუმენტის id.
+    იგივე მოთხოვნის PDF უკვე არქივშია -> ბრუნდება ის (ახალი _2 ასლის გარეშე).
+    """
+    key = render_cache_key(data, doc_type, font_size_pt, render_backend(data.get('renderer', 'auto')))
+    archived = get_document_store().find(key, f'{filename}.pdf')
+    if archived:
+        return {'success': True, 'filename': archived, 'is_pdf': True, 'cached': True}
+
+    with scratch_dir() as work_dir:
+        result = cached_pdf_job(data, doc_type, font_size_pt, os.path.join(work_dir, f'{filename}.pdf'),
+                                lambda: render(work_dir), key=key)
+        if result.get('success'):
+            result['filename'] = publish_document(result.pop('path'), data, key=result.pop('key', None))
+        return result
+
+
+def save_document_job(data, progress=lambda stage: None):
+    data = resolve_request_data(data)
+    doc_type = data.get('document_type', 'form_100')
+    trace_labels(doc_type=doc_type)
+    filename = save_filename(data)
+    return _document_job(data, doc_type, 11, filename,
+                         lambda work_dir: _save_document(data, filename, work_dir, progress))
+
+
+def save_filename(data):
+    raw_filename = data.get('filename', f'doc_{datetime.now().strftime("%H%M%S")}')
+    return "".join(c for c in raw_filename if c.isalnum() or c in ('_', '-', ' '))
+
+
+def _save_document(data, filename, work_dir, progress):
+    doc_type = data.get('document_type', 'form_100')
+    renderer = data.get('renderer', 'auto')
+    pdf_target = os.path.join(work_dir, f'{filename}.pdf')
+
+    # 0. შიდა PDF რენდერერი (მოთხოვნით, ან როცა DOCX-ის კონვერტორი არ არის)
+    progress('rendering')
+    if renderer == 'pdf' or (renderer == 'auto' and doc_type == 'form_100' and not office_converter_ready()):
+        pdf_path = render_native_pdf(data, doc_type, pdf_target, font_size_pt=11)
+        if pdf_path:
+            return {'success': True, 'path': pdf_path, 'is_pdf': True, 'backend': 'native'}
+
+    # 1. DOCX (შენახვისთვის -> დიდი შრიფტი, 11) დავალების საკუთარ scratch
+    # საქაღალდეში; არქივში ხვდება მხოლოდ საბოლოო ფაილი
+    docx_path = save_docx(doc_type, data, os.path.join(work_dir, f'{filename}.docx'), font_size_pt=11)
+    if doc_type != 'form_100':
+        # სხვა ტიპის დოკუმენტებისთვის (Medical Record) - მხოლოდ DOCX
+        return {
+            'success': True,
+            'path': docx_path,
+            'is_pdf': False
+        }
+
+    # 2. PDF კონვერტაცია
+    progress('converting')
+    pdf_path = convert_to_pdf(docx_path, work_dir)
+    backend = 'office'
+    if not pdf_path and renderer == 'auto':
+        # კონვერტორი ვერ მოიძებნა - შიდა რენდერერი
+        pdf_path = render_native_pdf(data, doc_type, pdf_target, font_size_pt=11)
+        backend = 'native'
+
+    if pdf_path:
+        return {
+            'success': True,
+            'path': pdf_path,
+            'is_pdf': True,
+            'backend': backend
+        }
+
+    # PDF ვერ შეიქმნა - ვაბრუნებთ DOCX-ს
+    return {
+        'success': True,
+        'path': docx_path,
+        'is_pdf': False,
+        'message': 'PDF ვერ შეიქმნა, ინახება DOCX'
+    }
+
+
+def print_filename(data, doc_type):
+    """ფაილის სახელის ავტომატური გენერაცია: სახელი_გვარი + თარიღი (+ ფორმა_100)"""
+    # 1. პაციენტის სახელი (თუ ცარიელია, დაერქმევა 'Pacienti')
+    patient_name = data.get('patient_name', '').strip()
+    if not patient_name:
+        patient_name = "Pacienti"
+
+    # 2. თარიღი (პრიორიტეტი: დოკუმენტის თარიღი -> გაცემის თარიღი -> დღევანდელი)
+    date_str = data.get('document_date') or data.get('issue_date') or datetime.now().strftime("%Y-%m-%d")
+
+    # 3. სახელის გასუფთავება (სპეისების შეცვლა ქვედა ტირეებით და უსაფრთხო სიმბოლოები)
+    # დავტოვოთ ქართული ასოები, ლათინური, ციფრები და ტირეები
+    safe_chars = set(
+        'აბგდევზთიკლმნოპჟრსტუფქღყშჩცძწჭხჯჰabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_ ')
+    clean_name = "".join(c for c in patient_name if c in safe_chars)
+    clean_name = clean_name.replace(' ', '_')  # სპეისის შეცვლა ტირეთი
+
+    # 4. საბოლოო სახელი: სახელი_გვარი + თარიღი + ფორმა_100 (გაერთიანებული: + ჩანაწერი)
+    if COMBINED_SEPARATOR in doc_type:
+        titles = {'form_100': 'ფორმა_100', 'medical_record': 'ჩანაწერი'}
+        return f"{clean_name}_{date_str}_" + '_'.join(titles.get(t, t) for t in doc_type.split(COMBINED_SEPARATOR))
+    if doc_type == 'form_100':
+        return f"{clean_name}_{date_str}_ფორმა_100"
+    return f"{clean_name}_{date_str}"
+
+
+def print_document_job(data, progress=lambda stage: None):
+    data = resolve_request_data(data)
+    doc_type = data.get('document_type', 'form_100')
+    trace_labels(doc_type=doc_type)
+    filename = print_filename(data, doc_type)
+    return _document_job(data, doc_type, 10, filename,
+                         lambda work_dir: _print_document(data, filename, work_dir, progress))
+
+
+def print_combined_job(data, progress=lambda stage: None):
+    """{'documents': [{...ფორმა 100}, {...სამედიცინო ჩანაწერი}]} -> ერთი PDF ბეჭდვისთვის"""
+    documents = data.get('documents')
+    if isinstance(documents, list):
+        documents = [resolve_request_data(d) for d in documents]
+    combined = combine_documents(documents)
+    if 'renderer' in data:
+        combined['renderer'] = data['renderer']
+    return print_document_job(combined, progress)
+
+
+def _print_document(data, filename, work_dir, progress):
+    doc_type = data.get('document_type', 'form_100')
+    renderer = data.get('renderer', 'auto')
+    pdf_target = os.path.join(work_dir, f'{filename}.pdf')
+
+    progress('rendering')
+    if renderer == 'pdf' or (renderer == 'auto' and not office_converter_ready()):
+        pdf_path = render_native_pdf(data, doc_type, pdf_target, font_size_pt=10)
+        if pdf_path:
+            return {'success': True, 'path': pdf_path, 'is_pdf': True, 'backend': 'native'}
+
+    docx_path = save_docx(doc_type, data, os.path.join(work_dir, f'{filename}.docx'), font_size_pt=10)
+
+    progress('converting')
+    pdf_path = convert_to_pdf(docx_path, work_dir)
+    backend = 'office'
+    if not pdf_path and renderer == 'auto':
+        pdf_path = render_native_pdf(data, doc_type, pdf_target, font_size_pt=10)
+        backend = 'native'
+
+    if pdf_path:
+        return {'success': True, 'path': pdf_path, 'is_pdf': True, 'backend': backend}
+    return {'success': True, 'path': docx_path, 'is_pdf': False}
+
+
+class JobQueue:
+    """
+    შეზღუდული რიგი + worker thread-ები; სტატუსები ინახება მეხსიერებაში.
+    ვადიანი დავალება (submit(timeout=...)) ვადის გასვლისას ხდება 'error' / timed_out:
+    რიგში მყოფი აღარ გაეშვება, მიმდინარის დაგვიანებული შედეგი აღარ ჩაიწერება.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.finished = {}  # job_id -> Event (wait()-ისთვის)
+        self.lock = threading.Lock()
+        self.closed = False
+        self.threads = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, daemon=True, name=f'job-worker-{i}')
+            t.start()
+            self.threads.append(t)
+
+    def submit(self, fn, data, timeout=None):
+        """
+        დავალების რიგში ჩაყენება -> id, ან None თუ რიგი სავსეა (ან სერვერი ჩერდება).
+        timeout - წამი, რომლის შემდეგაც დავალება ვადაგასულია
+        """
+        if self.closed:
+            return None
+        job_id = os.urandom(8).hex()
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            self.jobs[job_id] = {
+                'id': job_id, 'status': 'queued', 'progress': JOB_STAGES['queued'],
+                'result': None, 'error': None, 'created': now, 'updated': now,
+                'deadline': now + timeout if timeout else None, 'timed_out': False,
+            }
+            self.finished[job_id] = threading.Event()
+        try:
+            self.queue.put_nowait((job_id, fn, data))
+        except queue.Full:
+            with self.lock:
+                del self.jobs[job_id]
+                del self.finished[job_id]
+            return None
+        return job_id
+
+    def wait(self, job_id, timeout):
+        """დასრულების მოლოდინი (მაქს. timeout წამი) -> სტატუსი; ვერ მოესწრო -> timed_out"""
+        event = self.finished.get(job_id)
+        if event and not event.wait(timeout):
+            with self.lock:
+                job = self.jobs.get(job_id)
+                if job:
+                    self._time_out(job, time.time())
+        return self.status(job_id)
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+            if job['deadline'] and time.time() > job['deadline']:
+                self._time_out(job, time.time())
+            info = dict(job)
+        if info['status'] == 'queued':
+            info['position'] = self._position(job_id)
+        return info
+
+    def shutdown(self, timeout):
+        """ახალი დავალებები აღარ მიიღება; მიმდინარეების დასრულების მოლოდინი"""
+        self.closed = True
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return not self.queue.unfinished_tasks
+
+    def _position(self, job_id):
+        with self.queue.mutex:
+            for i, (queued_id, _, _) in enumerate(self.queue.queue):
+                if queued_id == job_id:
+                    return i + 1
+        return 0
+
+    def _finish(self, job, status, now, **fields):
+        job.update(fields, status=status, progress=JOB_STAGES[status], updated=now)
+        if status in ('done', 'error'):
+            self.finished[job['id']].set()
+
+    def _time_out(self, job, now):
+        """დაუსრულებელი დავალება -> ვადაგასული (lock-ის ქვეშ)"""
+        if job['status'] not in ('done', 'error'):
+            self._finish(job, 'error', now, error=JOB_TIMEOUT_ERROR, timed_out=True)
+
+    def _update(self, job_id, status, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            # ვადაგასული დავალების დაგვიანებული ეტაპი/შედეგი აღარ ჩაიწერება
+            if job and not job['timed_out']:
+                self._finish(job, status, time.time(), **fields)
+
+    def _expire(self, now):
+        for job_id in [k for k, j in self.jobs.items()
+                       if j['status'] in ('done', 'error') and now - j['updated'] > JOB_TTL]:
+            del self.jobs[job_id]
+            del self.finished[job_id]
+
+    def _expired(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job and job['deadline'] and time.time() > job['deadline']:
+                self._time_out(job, time.time())
+            return not job or job['timed_out']
+
+    def _worker(self):
+        while True:
+            job_id, fn, data = self.queue.get()
+            if self._expired(job_id):
+                # კლიენტმა უკვე მიიღო 504 - რიგში დაყოვნებული დავალება აღარ სრულდება
+                self.queue.task_done()
+                continue
+            trace = start_trace(f'job:{fn.__name__}', job=job_id)
+            try:
+                result = fn(data, progress=lambda stage: self._update(job_id, stage))
+                if result.get('success'):
+                    self._update(job_id, 'done', result=result)
+                else:
+                    self._update(job_id, 'error', error=result.get('error'), result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                self._update(job_id, 'error', error=str(e))
+            finally:
+                JOB_SECONDS.observe(finish_trace(trace), job=fn.__name__, doc_type=trace.labels.get('doc_type'))
+                self.queue.task_done()
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_WORKERS)
+        return _job_queue
+
+
+# ======================== Batch Generation ========================
+#
+# ბევრი დოკუმენტი ერთად (ჯგუფური გადაყვანა, აუდიტის ხელახალი ექსპორტი):
+# DOCX/PDF აწყობა პროცესების პულში (ყველა ბირთვზე), შემდეგ ყველა DOCX ერთ
+# კონვერტორის სესიაში - Word-ისთვის საერთო COM სესიის რიგი,
+# LibreOffice-ისთვის მუდმივი ინსტანციების პული პარალელურად. შედეგი:
+# ცალკეული ფაილები, ერთი გაერთიანებული PDF ან ZIP არქივი.
+
+BATCH_OUTPUTS = ('pdf', 'merged', 'zip')
+
+
+def load_template(tid):
+    """შენახული შაბლონის მონაცემები id-ით (blob-ები გაშლილი) ან None"""
+    return get_template_store().data(tid)
+
+
+def resolve_batch_item(item, defaults):
+    """
+    პაციენტის მონაცემები, შაბლონის id ან {'template_id': ..., ...ველები}.
+    ხელმოწერები - სრული data URL-ით: აწყობა მიმდინარეობს სხვა პროცესებში
+    """
+    if isinstance(item, str):
+        item = {'template_id': item}
+    return expand_signature_refs(dict(resolve_signature_refs(defaults), **resolve_request_data(item)))
+
+
+def _batch_render_item(args):
+    """პროცესის worker: ერთი დოკუმენტი -> {'docx': path, 'pdf': path} ან {'error': ...}"""
+    data, base_path, renderer = args
+    doc_type = data.get('document_type', 'form_100')
+    try:
+        if renderer == 'pdf' and native_pdf_available():
+            return {'pdf': render_pdf_document(data, doc_type, base_path + '.pdf', 10)}
+        return {'docx': save_docx(doc_type, data, base_path + '.docx', font_size_pt=10)}
+    except Exception as e:
+        return {'error': str(e)}
+
+
+def _batch_native_pdf(args):
+    data, base_path = args
+    try:
+        return render_pdf_document(data, data.get('document_type', 'form_100'), base_path + '.pdf', 10)
+    except Exception as e:
+        print(f"Native PDF render failed: {e}")
+        return None
+
+
+def convert_batch_to_pdf(docx_paths, work_dir):
+    """DOCX-ების კონვერტაცია ერთ სესიაში -> {docx_path: pdf_path}"""
+    converted = {}
+
+    converters = get_converters()
+
+    # 1) Windows + Word: ყველა დოკუმენტი ერთ (უკვე გაშვებულ) Word სესიაში
+    if converters.ready('word'):
+        session = get_word_session()
+        for path in docx_paths:
+            pdf_path = session.convert(path, path[:-len('.docx')] + '.pdf')
+            if pdf_path:
+                converted[path] = pdf_path
+
+    # 2) LibreOffice: დარჩენილები პულის ყველა ინსტანციაზე
+    remaining = [p for p in docx_paths if p not in converted]
+    pool = get_libreoffice_pool() if remaining and converters.ready('libreoffice') else None
+    if pool:
+        with ThreadPoolExecutor(max_workers=len(pool.instances)) as ex:
+            for path, pdf_path in zip(remaining, ex.map(lambda p: pool.convert(p, work_dir), remaining)):
+                if pdf_path and os.path.exists(pdf_path):
+                    converted[path] = pdf_path
+    return converted
+
+
+def merge_pdfs(pdf_paths, out_path):
+    if not load_pypdf():
+        raise RuntimeError('PDF-ების გაერთიანებისთვის საჭიროა pypdf')
+    writer = PdfWriter()
+    for path in pdf_paths:
+        writer.append(path)
+    with open(out_path, 'wb') as f:
+        writer.write(f)
+    return out_path
+
+
+def generate_batch(items, defaults=None, output='pdf', renderer='auto',
+                   workers=None, progress=lambda stage: None):
+    """
+    დოკუმენტების ჯგუფური გენერაცია არქივში (შედეგში - დოკუმენტების id-ები).
+    output: 'pdf' - ცალკეული ფაილები, 'merged' - ერთი PDF, 'zip' - არქივი.
+    """
+    if output not in BATCH_OUTPUTS:
+        raise ValueError(f'Unknown output: {output}')
+    if not items:
+        raise ValueError('სია ცარიელია')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f'მაქსიმუმ {BATCH_MAX_ITEMS} დოკუმენტი ერთ ჯერზე')
+
+    batch_id = f'batch_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{os.urandom(3).hex()}'
+    work_dir = tempfile.mkdtemp(prefix=f'{batch_id}_', dir=SCRATCH_FOLDER)
+
+    errors = []
+    jobs = []
+    names = set()
+    for i, item in enumerate(items):
+        try:
+            data = resolve_batch_item(item, defaults or {})
+        except Exception as e:
+            errors.append({'index': i, 'error': str(e)})
+            continue
+        name = print_filename(data, data.get('document_type', 'form_100'))
+        if name in names:
+            name = f'{name}_{i + 1}'
+        names.add(name)
+        jobs.append((i, name, data))
+
+    try:
+        # 1. აწყობა პროცესების პულში
+        progress('rendering')
+        args = [(data, os.path.join(work_dir, name), renderer) for _, name, data in jobs]
+        with span('batch_build'), \
+                ProcessPoolExecutor(max_workers=max(1, min(workers or BATCH_WORKERS, len(args) or 1))) as ex:
+            rendered = list(ex.map(_batch_render_item, args))
+
+        # 2. კონვერტაცია ერთ სესიაში
+        progress('converting')
+        docx_paths = [r['docx'] for r in rendered if r.get('docx')]
+        with span('batch_convert'):
+            converted = convert_batch_to_pdf(docx_paths, work_dir) if docx_paths else {}
+
+        missing = [(job, r) for job, r in zip(jobs, rendered)
+                   if r.get('docx') and r['docx'] not in converted]
+        if missing and renderer == 'auto' and native_pdf_available():
+            # კონვერტორი ვერ მოიძებნა - შიდა რენდერერი, ისევ პროცესების პულში
+            with ProcessPoolExecutor(max_workers=max(1, min(workers or BATCH_WORKERS, len(missing)))) as ex:
+                pdfs = ex.map(_batch_native_pdf, [(data, os.path.join(work_dir, name))
+                                                   for (_, name, data), _ in missing])
+                for (_, r), pdf_path in zip(missing, pdfs):
+                    if pdf_path:
+                        converted[r['docx']] = pdf_path
+
+        files = []
+        for (i, name, data), r in zip(jobs, rendered):
+            if r.get('error'):
+                errors.append({'index': i, 'error': r['error']})
+                continue
+            path = r.get('pdf') or converted.get(r['docx']) or r['docx']
+            files.append((path, data))
+
+        # 3. შედეგი
+        progress('merging')
+        result = {'success': True, 'count': len(files), 'errors': errors}
+        if output == 'merged':
+            pdfs = [p for p, _ in files if p.endswith('.pdf')]
+            if len(pdfs) < len(files):
+                errors.append({'error': f'{len(files) - len(pdfs)} დოკუმენტი PDF-ად ვერ გარდაიქმნა'})
+            if not pdfs:
+                return {'success': False, 'error': 'PDF ვერ შეიქმნა', 'errors': errors}
+            merged = merge_pdfs(pdfs, os.path.join(work_dir, f'{batch_id}.pdf'))
+            result['filename'] = publish_document(merged, {'document_type': 'batch'})
+            result['is_pdf'] = True
+        elif output == 'zip':
+            zip_path = os.path.join(work_dir, f'{batch_id}.zip')
+            with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as z:
+                for path, _ in files:
+                    z.write(path, os.path.basename(path))
+            result['filename'] = publish_document(zip_path, {'document_type': 'batch'})
+            result['is_pdf'] = False
+        else:
+            result['files'] = [publish_document(path, data) for path, data in files]
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def batch_document_job(data, progress=lambda stage: None):
+    defaults = {k: v for k, v in data.items() if k not in ('items', 'output', 'renderer', 'async')}
+    return generate_batch(data.get('items') or [], defaults,
+                          output=data.get('output', 'pdf'),
+                          renderer=data.get('renderer', 'auto'),
+                          progress=progress)
+
+
+# ======================== Static Assets ========================
+#
+# build_assets.py (EXE-ის აგებისას) ამცირებს CSS/JS-ს, სახელს ამატებს
+# შიგთავსის hash-ს და წინასწარ ქმნის .gz/.br ვარიანტებს static/dist/-ში
+# (manifest.json). url_for('static', ...) გადაიწერება hash-იან სახელზე, ფაილი
+# მიეწოდება Accept-Encoding-ის მიხედვით შეკუმშული და ბრაუზერში ინახება ერთი
+# წლით (immutable) - სახელი იცვლება მხოლოდ შიგთავსთან ერთად, ამიტომ თხელ
+# კლიენტებს ყოველ გაშვებაზე აღარ უწევთ CSS/JS-ის ჩამოტვირთვა. index.html
+# რენდერდება ერთხელ და ინახება მეხსიერებაში შეკუმშულად (ETag, no-cache).
+# manifest-ის გარეშე (წყაროდან გაშვება) ფაილები მიეწოდება როგორც აქამდე.
+
+ASSETS_MANIFEST = os.path.join(BASE_DIR, 'static', 'dist', 'manifest.json')
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # უპირატესობის რიგით
+
+
+class AssetManifest:
+    def __init__(self, path=ASSETS_MANIFEST):
+        self.urls = {}   # 'css/style.css' -> 'dist/css/style.<hash>.css'
+        self.files = {}  # 'dist/css/style.<hash>.css' -> {None: გზა, 'br': გზა.br, 'gzip': გზა.gz}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            print(f"Asset manifest is not valid, serving original files: {e}")
+            return
+        for source, built in manifest.items():
+            path = os.path.join(app.static_folder, *built.split('/'))
+            if not os.path.isfile(path):
+                continue
+            self.urls[source] = built
+            self.files[built] = {None: path}
+            for encoding, suffix in ASSET_ENCODINGS:
+                if os.path.isfile(path + suffix):
+                    self.files[built][encoding] = path + suffix
+
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def get_assets():
+    global _assets
+    with _assets_lock:
+        if _assets is None:
+            _assets = AssetManifest()
+        return _assets
+
+
+def accepted_encoding(available):
+    """უკეთესი Content-Encoding, რომელსაც კლიენტი იღებს, ან None"""
+    return next((enc for enc, _ in ASSET_ENCODINGS
+                 if enc in available and request.accept_encodings.quality(enc) > 0), None)
+
+
+@app.url_defaults
+def _fingerprint_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = get_assets().urls.get(values['filename'], values['filename'])
+
+
+def serve_static(filename):
+    """/static/...: hash-იანი ფაილი - შეკუმშული ვარიანტით და immutable; სხვა - Flask-ის ჩვეულებრივი"""
+    variants = get_assets().files.get(filename)
+    if not variants:
+        return app.send_static_file(filename)
+    encoding = accepted_encoding(variants)
+    resp = send_file(variants[encoding], mimetype=mimetypes.guess_type(filename)[0],
+                     conditional=True, etag=True, max_age=ASSET_MAX_AGE)
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return resp
+
+
+app.view_functions['static'] = serve_static
+
+
+class CompressedPage:
+    """ერთხელ დარენდერებული HTML: ETag და gzip/brotli ვარიანტები მეხსიერებაში"""
+
+    def __init__(self, html):
+        body = html.encode('utf-8')
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.bodies = {None: body, 'gzip': gzip.compress(body, compresslevel=9)}
+        if brotli:
+            self.bodies['br'] = brotli.compress(body)
+
+    def response(self):
+        encoding = accepted_encoding(self.bodies)
+        resp = Response(self.bodies[encoding], mimetype='text/html')
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        resp.headers['Vary'] = 'Accept-Encoding'
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.set_etag(f'{self.etag}-{encoding}' if encoding else self.etag)
+        return resp.make_conditional(request)
+
+
+_pages = {}
+_pages_lock = threading.Lock()
+
+
+def cached_page(template):
+    with _pages_lock:
+        page = _pages.get(template)
+    if page is None:
+        page = CompressedPage(render_template(template))
+        with _pages_lock:
+            _pages[template] = page
+    return page.response()
 
 
 # ======================== Routes ========================
 
+def parse_allowed_clients(value):
+    """'127.0.0.1,192.168.1.0/24' -> ქსელების სია"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(',') if part.strip()]
+
+
+ALLOWED_CLIENTS = parse_allowed_clients(SERVER_ALLOW)
+
+
+@app.before_request
+def _check_client():
+    """მოთხოვნა მხოლოდ ნებადართული მისამართებიდან (პაციენტების მონაცემები ქსელში არ ჩანს)"""
+    try:
+        addr = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return 'Forbidden', 403
+    if addr.version == 6 and addr.ipv4_mapped:
+        addr = addr.ipv4_mapped
+    if not any(addr in net for net in ALLOWED_CLIENTS):
+        return 'Forbidden', 403
+
+
+@app.before_request
+def _start_request_trace():
+    request.environ['meddocs.trace'] = start_trace(request.endpoint or request.path)
+
+
+@app.after_request
+def _finish_request_trace(response):
+    trace = request.environ.get('meddocs.trace')
+    if trace:
+        duration = finish_trace(trace, path=request.path, status=response.status_code)
+        REQUEST_SECONDS.observe(duration, endpoint=request.endpoint or 'unknown',
+                                method=request.method, status=response.status_code)
+    return response
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus-ის ტექსტური ფორმატი"""
+    lines = []
+    for hist in (REQUEST_SECONDS, STAGE_SECONDS, JOB_SECONDS):
+        lines += hist.exposition()
+
+    cache = get_render_cache().stats()
+    for name, key, kind in (('meddocs_render_cache_hits_total', 'hits', 'counter'),
+                            ('meddocs_render_cache_misses_total', 'misses', 'counter'),
+                            ('meddocs_render_cache_evictions_total', 'evictions', 'counter'),
+                            ('meddocs_render_cache_bytes', 'bytes', 'gauge'),
+                            ('meddocs_render_cache_entries', 'entries', 'gauge')):
+        lines += [f'# TYPE {name} {kind}', f'{name} {cache[key]}']
+
+    jobs = get_job_queue()
+    lines += ['# TYPE meddocs_jobs_queued gauge', f'meddocs_jobs_queued {jobs.queue.qsize()}',
+              '# TYPE meddocs_jobs_unfinished gauge', f'meddocs_jobs_unfinished {jobs.queue.unfinished_tasks}']
+    if _converters:
+        converters = _converters.snapshot()
+        lines.append('# TYPE meddocs_converter_ready gauge')
+        lines += [f'meddocs_converter_ready{{backend="{name}"}} {int(st["ready"])}' for name, st in converters.items()]
+        lines.append('# TYPE meddocs_converter_warmup_seconds gauge')
+        lines += [f'meddocs_converter_warmup_seconds{{backend="{name}"}} {st["warm_seconds"]}'
+                  for name, st in converters.items() if st['warm_seconds'] is not None]
+    if STARTUP_SECONDS:
+        lines.append('# TYPE meddocs_startup_seconds gauge')
+        lines += [f'meddocs_startup_seconds{{phase="{phase}"}} {sec}' for phase, sec in STARTUP_SECONDS.items()]
+    if IMPORT_SECONDS:
+        lines.append('# TYPE meddocs_import_seconds gauge')
+        lines += [f'meddocs_import_seconds{{module="{name}"}} {sec}' for name, sec in IMPORT_SECONDS.items()]
+    if _document_store:
+        lines += ['# TYPE meddocs_documents gauge', f'meddocs_documents {len(_document_store.entries)}']
+    if _template_store:
+        templates, blobs, blob_bytes = _template_store.stats()
+        lines += ['# TYPE meddocs_catalog_templates gauge', f'meddocs_catalog_templates {templates}',
+                  '# TYPE meddocs_template_blobs gauge', f'meddocs_template_blobs {blobs}',
+                  '# TYPE meddocs_template_blob_bytes gauge', f'meddocs_template_blob_bytes {blob_bytes}']
+    return Response('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return cached_page('index.html')
 
 
 @app.route('/api/save-document', methods=['POST'])
 def save_document():
-    try:
-        data = request.json
-        doc_type = data.get('document_type', 'form_100')
-        raw_filename = data.get('filename', f'doc_{datetime.now().strftime("%H%M%S")}')
-        filename = "".join(c for c in raw_filename if c.isalnum() or c in ('_', '-', ' '))
-
-        # 1. დოკუმენტის შექმნა (DOCX)
-        if doc_type == 'form_100':
-            # შენახვისთვის -> დიდი შრიფტი (11)
-            doc = create_form_100_document_save(data)
-        else:
-            doc = create_medical_record_document(data)
+    return _document_request(save_document_job)
 
-        docx_filename = f'{filename}.docx'
-        docx_path = os.path.join(DOCUMENTS_FOLDER, docx_filename)
-        doc.save(docx_path)
 
-        # 2. PDF კონვერტაცია შენახვისას (ფორმა 100-ისთვის)
-        if doc_type == 'form_100':
-            pdf_path = convert_to_pdf(docx_path, DOCUMENTS_FOLDER)
+@app.route('/api/print-document', methods=['POST'])
+def print_document():
+    return _document_request(print_document_job)
 
-            if pdf_path and os.path.exists(pdf_path):
-                # PDF წარმატებით შეიქმნა
-                try:
-                    os.remove(docx_path)  # DOCX წაშლა (თუ გინდათ)
-                except:
-                    pass
-                return jsonify({
-                    'success': True,
-                    'filename': os.path.basename(pdf_path),
-                    'is_pdf': True
-                })
-            else:
-                # PDF ვერ შეიქმნა - ვაბრუნებთ DOCX-ს
-                return jsonify({
-                    'success': True,
-                    'filename': docx_filename,
-                    'is_pdf': False,
-                    'message': 'PDF ვერ შეიქმნა, ინახება DOCX'
-                })
-        else:
-            # სხვა ტიპის დოკუმენტებისთვის (Medical Record) - ვაბრუნებთ DOCX-ს
-            return jsonify({
-                'success': True,
-                'filename': docx_filename,
-                'is_pdf': False
-            })
 
+def _document_request(job_fn, timeout=None):
+    """
+    'async': true -> დავალების id დაუყოვნებლივ, სხვაგვარად - პასუხი დასრულებისას.
+    ორივე შემთხვევაში დავალება სრულდება worker-ზე ვადით (REQUEST_TIMEOUT): მოთხოვნის
+    thread გაჭედილ კონვერტაციას არ ელოდება - ვადის გასვლისას 504.
+    """
+    if not isinstance(request.get_json(silent=True), dict):
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
+    timeout = timeout or REQUEST_TIMEOUT
+    try:
+        data = resolve_request(request.json)
+        jobs = get_job_queue()
+        job_id = jobs.submit(job_fn, data, timeout=timeout)
+        if not job_id:
+            return jsonify({'success': False, 'error': 'სერვერი გადატვირთულია, სცადეთ მოგვიანებით'}), 503
+        if data.get('async'):
+            return jsonify({'success': True, 'job_id': job_id, 'status_url': f'/api/jobs/{job_id}'}), 202
+        job = jobs.wait(job_id, timeout)
+        if job['timed_out']:
+            return jsonify({'success': False, 'error': job['error'], 'job_id': job_id}), 504
+        if job['result'] is not None:
+            return jsonify(job['result'])
+        return jsonify({'success': False, 'error': job['error']}), 500
+    except UnresolvedReference as e:
+        # კლიენტი იმეორებს მოთხოვნას სრული მონაცემებით (data URL, შაბლონის გარეშე)
+        return jsonify({'success': False, 'error': str(e), 'code': 'unresolved_reference',
+                        'field': e.field}), e.status
     except Exception as e:
         print(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/print-document', methods=['POST'])
-def print_document():
-    try:
-        data = request.json
-        doc_type = data.get('document_type', 'form_100')
+@app.route('/api/print-combined', methods=['POST'])
+def print_combined():
+    return _document_request(print_combined_job)
 
-        # --- ფაილის სახელის ავტომატური გენერაცია ---
 
-        # 1. პაციენტის სახელი (თუ ცარიელია, დაერქმევა 'Pacienti')
-        patient_name = data.get('patient_name', '').strip()
-        if not patient_name:
-            patient_name = "Pacienti"
+@app.route('/api/batch', methods=['POST'])
+def batch_documents():
+    return _document_request(batch_document_job, timeout=BATCH_TIMEOUT)
 
-        # 2. თარიღი (პრიორიტეტი: დოკუმენტის თარიღი -> გაცემის თარიღი -> დღევანდელი)
-        date_str = data.get('document_date') or data.get('issue_date') or datetime.now().strftime("%Y-%m-%d")
 
-        # 3. სახელის გასუფთავება (სპეისების შეცვლა ქვედა ტირეებით და უსაფრთხო სიმბოლოები)
-        # დავტოვოთ ქართული ასოები, ლათინური, ციფრები და ტირეები
-        safe_chars = set(
-            'აბგდევზთიკლმნოპჟრსტუფქღყშჩცძწჭხჯჰabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_ ')
-        clean_name = "".join(c for c in patient_name if c in safe_chars)
-        clean_name = clean_name.replace(' ', '_')  # სპეისის შეცვლა ტირეთი
+@app.route('/api/render-cache')
+def render_cache_stats():
+    return jsonify({'success': True, 'stats': get_render_cache().stats()})
 
-        # 4. საბოლოო სახელი: სახელი_გვარი + თარიღი + ფორმა_100
-        if doc_type == 'form_100':
-            filename = f"{clean_name}_{date_str}_ფორმა_100"
-        else:
-            filename = f"{clean_name}_{date_str}"
 
-        # -------------------------------------------
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job_queue().status(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['timed_out']:
+        return jsonify({'success': False, 'error': job['error'], 'job': job}), 504
+    return jsonify({'success': True, 'job': job})
 
-        if doc_type == 'form_100':
-            doc = create_form_100_document_print(data)
-        else:
-            doc = create_medical_record_document(data)
 
-        docx_path = os.path.join(DOCUMENTS_FOLDER, f'{filename}.docx')
-        doc.save(docx_path)
-
-        pdf_path = convert_to_pdf(docx_path, DOCUMENTS_FOLDER)
-
-        if pdf_path and os.path.exists(pdf_path):
-            return jsonify({'success': True, 'filename': os.path.basename(pdf_path), 'is_pdf': True})
-        else:
-            return jsonify({'success': True, 'filename': f'{filename}.docx', 'is_pdf': False})
-    except Exception as e:
-        print(e)
-        return jsonify({'success': False, 'error': str(e)}), 500
+def serve_document(filename, as_attachment=False):
+    """
+    ფაილის მიწოდება ნაწილ-ნაწილ (ან sendfile-ით), Range (206), ETag/Last-Modified
+    და If-None-Match/If-Modified-Since (304) მხარდაჭერით - მეხსიერება არ იზრდება
+    დოკუმენტის ზომასთან ერთად.
+    """
+    path = document_path(filename)
+    if not path:
+        return "File not found", 404
+    mimetype = 'application/pdf' if filename.endswith('.pdf') else None
+    resp = send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                     download_name=get_document_store().entry(filename)['name'],
+                     conditional=True, etag=True, max_age=0)
+    # მიგრაცია/ხელით ჩანაცვლება ფაილს ცვლის - ბრაუზერი ყოველთვის ამოწმებს ETag-ს
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
 
 
 @app.route('/api/print-page/<filename>')
 def print_page(filename):
-    filepath = os.path.join(DOCUMENTS_FOLDER, filename)
-    if not os.path.exists(filepath):
+    path = document_path(filename)
+    if not path:
         return "File not found", 404
-    return render_template('print.html', filename=filename)
+    resp = make_response(render_template('print.html', filename=filename))
+    st = os.stat(path)
+    resp.set_etag(hashlib.sha1(f'{filename}:{st.st_mtime}:{st.st_size}'.encode('utf-8')).hexdigest())
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
 
 
 @app.route('/api/view-pdf/<filename>')
 def view_pdf(filename):
     try:
-        filepath = os.path.join(DOCUMENTS_FOLDER, filename)
-        if not os.path.exists(filepath):
-            return "File not found", 404
-
-        mimetype = 'application/pdf' if filename.endswith('.pdf') else 'application/octet-stream'
-        with open(filepath, 'rb') as f:
-            return Response(f.read(), mimetype=mimetype)
+        return serve_document(filename)
+    except HTTPException:
+        raise  # მაგ. 416 - Range ფაილის ზომას სცდება
     except Exception as e:
         return str(e), 500
 
 
 @app.route('/api/download/<filename>')
 def download(filename):
-    return send_file(os.path.join(DOCUMENTS_FOLDER, filename), as_attachment=True)
+    return serve_document(filename, as_attachment=True)
 
 
 @app.route('/api/upload-signature', methods=['POST'])
@@ -722,13 +4245,11 @@ def upload_signature():
     try:
         file = request.files['file']
         sig_type = request.form.get('type', 'doctor')
-        ext = file.filename.rsplit('.', 1)[-1].lower()
-        filename = f'{sig_type}_signature.{ext}'
-        path = os.path.join(SIGNATURES_FOLDER, filename)
-        file.save(path)
-        with open(path, 'rb') as f:
-            b64 = base64.b64encode(f.read()).decode('utf-8')
-        return jsonify({'success': True, 'base64': f'data:image/{ext};base64,{b64}'})
+        if sig_type not in SIGNATURE_TYPES:
+            return jsonify({'success': False, 'error': 'Unknown signature type'}), 400
+        blob, data_url = store_signature(sig_type, file.read())
+        sig = register_signature(blob)
+        return jsonify({'success': True, 'base64': data_url, 'hash': sig.sha1})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -736,15 +4257,13 @@ def upload_signature():
 @app.route('/api/get-signatures')
 def get_signatures():
     sigs = {}
-    for t in ['doctor', 'head', 'stamp']:
-        for ext in ['png', 'jpg', 'jpeg']:
-            path = os.path.join(SIGNATURES_FOLDER, f'{t}_signature.{ext}')
-            if os.path.exists(path):
-                with open(path, 'rb') as f:
-                    b64 = base64.b64encode(f.read()).decode('utf-8')
-                sigs[t] = f'data:image/{ext};base64,{b64}'
-                break
-    return jsonify({'success': True, 'signatures': sigs})
+    hashes = {}
+    for t in SIGNATURE_TYPES:
+        saved = read_signature(t)
+        if saved:
+            sigs[t] = saved[1]
+            hashes[t] = register_signature(saved[0]).sha1
+    return jsonify({'success': True, 'signatures': sigs, 'hashes': hashes})
 
 
 @app.route('/api/search-patients', methods=['GET'])
@@ -753,100 +4272,291 @@ def search_patients():
     if not query:
         return jsonify({'success': True, 'results': []})
 
+    index = get_search_index()
+    if index:
+        try:
+            with span('search', backend='fts'):
+                results = index.search(query)
+            return jsonify({'success': True, 'results': results})
+        except sqlite3.Error as e:
+            print(f"Search index query failed: {e}")
+
+    with span('search', backend='scan'):
+        results = _search_scan(query)
+    return jsonify({'success': True, 'results': results})
+
+
+def _search_scan(query):
+    """ძებნა კატალოგში (როცა ინდექსი მიუწვდომელია)"""
+    catalog = get_catalog()
     results = []
 
-    # 1. შენახული დოკუმენტების ძებნა (documents/)
-    if os.path.exists(DOCUMENTS_FOLDER):
-        for filename in os.listdir(DOCUMENTS_FOLDER):
-            if filename.endswith('.docx') and query in filename.lower():
-                results.append({
-                    'type': 'document',
-                    'name': filename,
-                    'path': f'/api/download/{filename}',
-                    'date': datetime.fromtimestamp(os.path.getmtime(os.path.join(DOCUMENTS_FOLDER, filename))).strftime(
-                        '%Y-%m-%d %H:%M')
-                })
-
-    # 2. შაბლონების ძებნა (saved_templates/) - JSON შიგთავსში
-    if os.path.exists(TEMPLATES_FOLDER):
-        for filename in os.listdir(TEMPLATES_FOLDER):
-            if filename.endswith('.json'):
-                try:
-                    path = os.path.join(TEMPLATES_FOLDER, filename)
-                    with open(path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-
-                    # ვეძებთ პაციენტის სახელს ან პირად ნომერს
-                    patient_name = data.get('patient_name', '').lower()
-                    personal_id = data.get('personal_id', '')
-                    template_name = data.get('template_name', '').lower()
-
-                    if query in patient_name or query in personal_id or query in template_name:
-                        results.append({
-                            'type': 'template',
-                            'name': data.get('template_name', filename),
-                            'id': filename.replace('.json', ''),
-                            'patient': data.get('patient_name', '-'),
-                            'date': data.get('created', '')[:16].replace('T', ' ')
-                        })
-                except:
-                    continue
+    # 1. შენახული დოკუმენტები (არქივი: DOCX, PDF, ZIP - ისევე, როგორც ინდექსში)
+    for doc in catalog.list_documents():
+        if query in doc['id'].casefold() or query in str(doc.get('patient', '')).casefold():
+            results.append({
+                'type': 'document',
+                'name': doc['id'],
+                'path': f'/api/download/{doc["id"]}',
+                'date': datetime.fromtimestamp(doc['mtime']).strftime('%Y-%m-%d %H:%M')
+            })
 
-    return jsonify({'success': True, 'results': results})
+    # 2. შაბლონები (templates.db) - პაციენტის სახელი, პირადი ნომერი, შაბლონის სახელი
+    _, templates = get_template_store().query(q=query.casefold())
+    for t in templates:
+        results.append({
+            'type': 'template',
+            'name': t['name'],
+            'id': t['id'],
+            'patient': t['patient'] or '-',
+            'date': t['created']
+        })
+
+    return results
 
 
 @app.route('/api/templates', methods=['GET', 'POST'])
 def handle_templates():
     if request.method == 'GET':
-        templates = []
-        if os.path.exists(TEMPLATES_FOLDER):
-            for f in os.listdir(TEMPLATES_FOLDER):
-                if f.endswith('.json'):
-                    with open(os.path.join(TEMPLATES_FOLDER, f), 'r', encoding='utf-8') as file:
-                        data = json.load(file)
-                    templates.append({'id': f.replace('.json', ''), 'name': data.get('template_name', f), 'data': data})
-        return jsonify({'success': True, 'templates': templates})
+        return list_templates()
 
     if request.method == 'POST':
         data = request.json
-        name = data.get('template_name', 'Template')
-        fname = f"{name.replace(' ', '_')}_{datetime.now().strftime('%H%M%S')}.json"
-        with open(os.path.join(TEMPLATES_FOLDER, fname), 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False)
-        return jsonify({'success': True})
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Invalid template'}), 400
+        tid = get_catalog().add_template(data)
+        return jsonify({'success': True, 'id': tid})
+
+
+def list_templates():
+    """
+    შაბლონების მოკლე სია გვერდებად (data-ს გარეშე).
+    ?page=1&per_page=24&sort=-created&q=ტექსტი&type=form_100; full=1 - data-ც ('@blob:' მითითებებით)
+    """
+    with span('templates_list'):
+        return _list_templates(request.args)
+
+
+def _list_templates(args):
+    try:
+        page = max(1, int(args.get('page', 1)))
+        per_page = min(TEMPLATES_MAX_PER_PAGE, max(1, int(args.get('per_page', TEMPLATES_PER_PAGE))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid page'}), 400
+    full = args.get('full') == '1'
+    total, items = get_template_store().query(
+        doc_type=args.get('type'), q=args.get('q', '').strip().casefold(), sort=args.get('sort', '-created'),
+        offset=(page - 1) * per_page, limit=per_page, full=full)
+
+    fields = TEMPLATE_SUMMARY_FIELDS + (('data',) if full else ())
+    return jsonify({
+        'success': True,
+        'templates': [{f: t[f] for f in fields} for t in items],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'pages': (total + per_page - 1) // per_page,
+    })
+
+
+@app.route('/api/templates/<tid>', methods=['GET'])
+def get_template(tid):
+    """
+    ერთი შაბლონი; სურათები - '@blob:<sha1>' მითითებებით (/api/blobs/<sha1>).
+    ETag/If-None-Match -> 304
+    """
+    with span('template_get'):
+        entry = get_template_store().get(tid)
+    if not entry:
+        return jsonify({'success': False, 'error': 'Template not found'}), 404
+    resp = jsonify({'success': True, 'template': {
+        **{f: entry[f] for f in TEMPLATE_SUMMARY_FIELDS}, 'data': entry['data']}})
+    resp.set_etag(entry['etag'])
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp.make_conditional(request)
 
 
 @app.route('/api/templates/<tid>', methods=['DELETE'])
 def delete_template(tid):
-    for f in os.listdir(TEMPLATES_FOLDER):
-        if f.startswith(tid):
-            os.remove(os.path.join(TEMPLATES_FOLDER, f))
-            return jsonify({'success': True})
+    found = get_template_store().find(tid)
+    if found:
+        get_catalog().remove_template(found)
+        return jsonify({'success': True})
     return jsonify({'success': False}), 404
 
 
+@app.route('/api/blobs/<sha1>')
+def serve_blob(sha1):
+    """შაბლონის blob (ხელმოწერა); შიგთავსი sha1-ით არის მისამართი - immutable ქეში"""
+    found = get_template_store().blob(sha1) if _SHA1_RE.match(sha1) else None
+    if not found:
+        return "File not found", 404
+    blob, mime = found
+    mimetype = mime.split(';')[0] if mime else 'text/plain'
+    if mime and not mimetype.startswith('image/'):
+        mimetype = 'application/octet-stream'  # ფორმიდან მოსული mime - HTML/JS არ სრულდება
+    resp = Response(blob, mimetype=mimetype)
+    resp.set_etag(sha1)
+    resp.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    resp.headers['X-Content-Type-Options'] = 'nosniff'
+    return resp.make_conditional(request)
+
+
+# ======================== Startup ========================
+#
+# სერვერი პორტს იკავებს ყველა მძიმე სამუშაომდე და ბრაუზერი იხსნება მაშინვე,
+# როცა socket უსმენს (ფიქსირებული 1.5 წმ-ის ლოდინის ნაცვლად). python-docx და
+# reportlab-ის ჩატვირთვა, DOCX skeleton-ები, კატალოგი და კონვერტორების
+# გათბობა სრულდება ფონურ thread-ში - მანამდე მოსული მოთხოვნა იმავეს
+# საჭიროებისამებრ ტვირთავს. ორივე ეტაპის დრო იბეჭდება და ჩანს /metrics-ში.
+
+STARTUP_SECONDS = {}  # ეტაპი ('listening', 'warm') -> წამი პროცესის გაშვებიდან
+
+CONVERTER_LABELS = {'word': 'Microsoft Word', 'libreoffice': 'LibreOffice',
+                    'native': 'შიდა PDF რენდერერი (reportlab)'}
+
+# წინასწარ აგებული DOCX skeleton-ები (ფორმა 100: 10/11pt, სამედიცინო ჩანაწერი, გაერთიანებული ბეჭდვა)
+WARM_SKELETONS = (('form_100', 10), ('form_100', 11), ('medical_record', 11),
+                  ('form_100+medical_record', 10))
+
+
+def _startup_mark(phase):
+    STARTUP_SECONDS[phase] = round(time.perf_counter() - STARTUP_BEGAN, 3)
+    return STARTUP_SECONDS[phase]
+
+
+def open_browser(url='http://127.0.0.1:5000'):
+    import webbrowser
+    webbrowser.open(url)
+
+
+def warm_up():
+    """ფონური გათბობა სერვერის გაშვების შემდეგ"""
+    steps = [
+        ('catalog', get_catalog),  # კატალოგის ჩატვირთვა და ძებნის ინდექსის სინქრონიზაცია
+        ('imports', lambda: (load_docx(), load_pypdf(), load_pillow())),
+        ('skeletons', lambda: [get_docx_skeleton(t, size) for t, size in WARM_SKELETONS]),
+        ('converters', lambda: get_converters(warm=True)),  # LibreOffice-ის ინსტანციები, Word, შრიფტები
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+
+    for name, st in get_converters().snapshot().items():
+        if st['available']:
+            detail = f" ({st['path']})" if st['path'] else ''
+            warm = f": {st['warm_seconds']:.1f} წმ გათბობა" if st['warm_seconds'] is not None else ''
+            print(f"✅ {CONVERTER_LABELS[name]}{detail}{warm}")
+        else:
+            print(f"⚠️  {CONVERTER_LABELS[name]} მიუწვდომელია: {st['reason']}")
+    imports = ', '.join(f'{name} {seconds:.2f}' for name, seconds in IMPORT_SECONDS.items())
+    print(f"🔥 მზადაა: {_startup_mark('warm'):.2f} წმ გაშვებიდან (იმპორტები: {imports})")
+
+
+def on_listening(url, open_in_browser=True):
+    """socket უკვე უსმენს: ბრაუზერი და ფონური გათბობა"""
+    print(f"⚡ სერვერი უსმენს {_startup_mark('listening'):.2f} წმ-ში: {url}")
+    if open_in_browser:
+        threading.Thread(target=open_browser, args=(url,), daemon=True).start()
+    threading.Thread(target=warm_up, daemon=True, name='warm-up').start()
+
+
 # ======================== Main ========================
 
-def open_browser():
-    webbrowser.open('http://127.0.0.1:5000')
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='სამედიცინო დოკუმენტაცია')
+    parser.add_argument('--production', action='store_true',
+                        default=os.environ.get('MEDDOCS_SERVER') == 'production',
+                        help='waitress WSGI სერვერი (რამდენიმე მომხმარებლისთვის)')
+    parser.add_argument('--host', default=SERVER_HOST,
+                        help='მისამართი; 0.0.0.0-ზე ქსელიდან მხოლოდ --allow-ში ჩამოთვლილები შემოვლენ')
+    parser.add_argument('--allow', default=SERVER_ALLOW,
+                        help='ნებადართული კლიენტები: IP ან ქსელი, მძიმით (მაგ. 127.0.0.1,192.168.1.0/24)')
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--threads', type=int, default=SERVER_THREADS, help='მოთხოვნების thread-ები')
+    parser.add_argument('--job-workers', type=int, default=JOB_WORKERS, help='შენახვა/ბეჭდვის worker-ები')
+    parser.add_argument('--timeout', type=int, default=REQUEST_TIMEOUT,
+                        help='შენახვა/ბეჭდვის მოთხოვნის ვადა, წამი (გადაცილებისას 504)')
+    parser.add_argument('--idle-timeout', type=int, default=SERVER_IDLE_TIMEOUT,
+                        help='უმოქმედო keep-alive კავშირის დახურვა, წამი (მოთხოვნის ხანგრძლივობას არ ზღუდავს)')
+    parser.add_argument('--no-browser', action='store_true', help='ბრაუზერი არ გაიხსნას')
+    return parser.parse_args(argv)
+
+
+def serve_development(args, ready):
+    """Flask-ის (werkzeug) სერვერი; ready() - როცა socket უკვე უსმენს"""
+    server = make_server(args.host, args.port, app, threaded=True)
+    ready()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def serve_production(args, ready):
+    """
+    waitress: ერთი პროცესი, რამდენიმე thread - კატალოგი, დავალებების რიგი და
+    LibreOffice-ის პული საერთოა. ნელი კონვერტაცია სხვა მოთხოვნებს არ აჩერებს.
+    """
+    server = create_server(app, host=args.host, port=args.port, threads=args.threads,
+                           connection_limit=SERVER_CONNECTION_LIMIT,
+                           channel_timeout=args.idle_timeout, ident='PremiumMed')
+    ready()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    if hasattr(signal, 'SIGBREAK'):
+        signal.signal(signal.SIGBREAK, stop)  # Windows: Ctrl+Break / კონსოლის დახურვა
+
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n⏳ სერვერი ჩერდება, მიმდინარე დავალებების დასრულება...")
+        server.close()
+        if not get_job_queue().shutdown(SHUTDOWN_GRACE):
+            print("⚠️  ზოგიერთი დავალება ვერ დასრულდა")
+        if _lo_pool:
+            _lo_pool.shutdown()
+        if _word_session:
+            _word_session.shutdown()
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # ჯგუფური გენერაციის პროცესები EXE-ში
+    args = parse_args()
+    JOB_WORKERS = args.job_workers
+    REQUEST_TIMEOUT = args.timeout
+    ALLOWED_CLIENTS = parse_allowed_clients(args.allow)
+    if args.production and not waitress:
+        print("⚠️  waitress არ არის დაყენებული - გაეშვება Flask-ის სერვერი")
+        args.production = False
+
+    url = f"http://{'127.0.0.1' if args.host in ('0.0.0.0', '::') else args.host}:{args.port}"
     print("=" * 50)
     print("🏥 სამედიცინო დოკუმენტაცია")
     print("=" * 50)
-
-    lo = find_libreoffice()
-    if lo:
-        print(f"✅ LibreOffice: {lo}")
-    else:
-        print("⚠️  LibreOffice ვერ მოიძებნა")
-
-    print(f"\n📁 დოკუმენტები: {DOCUMENTS_FOLDER}")
-    print(f"📁 შაბლონები: {TEMPLATES_FOLDER}")
+    print(f"📁 დოკუმენტები: {DOCUMENTS_FOLDER}")
+    print(f"📁 შაბლონები: {TEMPLATE_DB_PATH}")
     print(f"📁 ხელმოწერები: {SIGNATURES_FOLDER}")
-    print("\n🌐 მისამართი: http://127.0.0.1:5000")
+    print(f"\n🌐 მისამართი: http://{args.host}:{args.port}")
+    print(f"🔒 ნებადართული კლიენტები: {args.allow}")
+    if args.production:
+        print(f"⚙️  production რეჟიმი: waitress, {args.threads} thread, {args.job_workers} worker, "
+              f"მოთხოვნის ვადა {args.timeout} წმ")
     print("=" * 50)
 
-    threading.Timer(1.5, open_browser).start()
-    app.run(host='127.0.0.1', port=5000)
\ No newline at end of file
+    clean_scratch()
+    get_job_queue()
+
+    # პორტი იკავება პირველ რიგში; დანარჩენი - on_listening-იდან ფონურად
+    serve = serve_production if args.production else serve_development
+    serve(args, lambda: on_listening(url, open_in_browser=not args.no_browser))
@@ -0,0 +1,63 @@
+"""
+ჯგუფური გენერაცია ბრძანების ხაზიდან.
+
+    python batch.py patients.json --output merged
+    python batch.py patients.json --output zip --workers 8 --renderer pdf
+
+patients.json - სია: პაციენტის მონაცემები (ისევე, როგორც ფორმიდან),
+შაბლონის id ან {"template_id": "...", ...შეცვლილი ველები}.
+ასევე შეიძლება ობიექტი {"items": [...], ...საერთო ველები}.
+"""
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+
+import app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='დოკუმენტების ჯგუფური გენერაცია')
+    parser.add_argument('input', help='JSON ფაილი (ან - სტანდარტული შესასვლელიდან)')
+    parser.add_argument('--output', choices=app.BATCH_OUTPUTS, default='pdf',
+                        help='pdf - ცალკეული ფაილები, merged - ერთი PDF, zip - არქივი')
+    parser.add_argument('--renderer', choices=['auto', 'pdf', 'docx'], default='auto')
+    parser.add_argument('--document-type', choices=['form_100', 'medical_record'], default='form_100')
+    parser.add_argument('--workers', type=int, default=app.BATCH_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        payload = json.load(sys.stdin)
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+
+    defaults = {'document_type': args.document_type}
+    if isinstance(payload, dict):
+        items = payload.pop('items', [])
+        defaults.update(payload)
+    else:
+        items = payload
+
+    started = time.perf_counter()
+    result = app.generate_batch(items, defaults, output=args.output,
+                                renderer=args.renderer, workers=args.workers,
+                                progress=lambda stage: print(f'... {stage}'))
+    elapsed = time.perf_counter() - started
+
+    for err in result.get('errors', []):
+        print(f"⚠️  {err.get('index', '-')}: {err['error']}")
+    if not result['success']:
+        print(f"❌ {result['error']}")
+        return 1
+
+    for name in result.get('files') or [result['filename']]:
+        print(f"✅ {app.document_path(name)}")
+    print(f"{result['count']} დოკუმენტი, {elapsed:.1f} წმ")
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
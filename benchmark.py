@@ -0,0 +1,436 @@
+"""
+Benchmark-ები: გაშვება, დოკუმენტის აწყობა, შენახვა, კონვერტაცია, ძებნა და შაბლონები.
+ბრაუზერი და Office არ სჭირდება; LibreOffice/Word-ის კონვერტაცია გამოტოვდება,
+თუ არ არის დაყენებული. ყველაფერი სრულდება დროებით საქაღალდეში
+(MEDDOCS_STORAGE_DIR), რეალური documents/ და saved_templates/ არ იცვლება.
+
+    python benchmark.py                          # ყველა, კორპუსი 1k და 10k
+    python benchmark.py --corpus 1000 10000 100000
+    python benchmark.py --save-baseline          # benchmarks/baseline.json (1k/10k/100k)
+    python benchmark.py --compare benchmarks/baseline.json --fail-on-regression
+
+baseline იწერება მხოლოდ საცნობარო Windows build მანქანაზე (Word/LibreOffice-ით,
+კორპუსები 1k/10k/100k) - სხვა გარემოს რიცხვებთან შედარება რეგრესიას ვერ აჩვენებს.
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from io import BytesIO
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+REGRESSION_THRESHOLD = 0.25  # p50 25%-ით ნელა -> რეგრესია
+BASELINE_CORPUS = [1000, 10000, 100000]
+
+FIRST_NAMES = ['გიორგი', 'ნინო', 'დავით', 'მარიამ', 'ლევან', 'თამარ', 'ნიკა', 'ანა', 'Giorgi', 'Nino']
+LAST_NAMES = ['ბერიძე', 'მამალაძე', 'კაპანაძე', 'გელაშვილი', 'ლომიძე', 'ჯავახიშვილი', 'Beridze', 'Lomidze']
+
+
+def _signature():
+    with open(os.path.join(BASE_DIR, 'signatures', 'head_signature.png'), 'rb') as f:
+        return 'data:image/png;base64,' + base64.b64encode(f.read()).decode('utf-8')
+
+
+def sample_form_100(sig):
+    return {
+        'document_type': 'form_100', 'patient_name': 'გიორგი ბერიძე', 'personal_id': '01019012345',
+        'birth_date': '1990-01-01', 'address': 'თბილისი, ვაჟა-ფშაველას 12', 'document_date': '2026-01-02',
+        'diagnosis': 'J18.9 პნევმონია, დაუზუსტებელი', 'anamnesis': 'ცხელება 3 დღე, ხველა. ' * 5,
+        'medications': 'ამოქსიცილინი 500მგ\nპარაცეტამოლი 500მგ\nსითხეები',
+        'doctor': 'ნინო მამალაძე', 'doctor_signature_image': sig, 'stamp_image': sig,
+    }
+
+
+def sample_medical_record(sig):
+    return {
+        'document_type': 'medical_record', 'patient_name': 'ნინო კაპანაძე', 'card_number': '2026-0142',
+        'initial_date': '2026-01-02 10:00', 'temperature': '37.8', 'investigations': 'სისხლის ანალიზი\nრენტგენი',
+        'medications': 'ცეფტრიაქსონი 1გ\n\nდექსამეტაზონი', 'doctor_signature_image': sig,
+    }
+
+
+# ======================== Measurement ========================
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+def measure(name, fn, iterations=50, warmup=2):
+    """fn() -> დაყოვნების პროცენტილები (ms), გამტარობა და მეხსიერების პიკი"""
+    for _ in range(warmup):
+        fn()
+
+    times = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t) * 1000)
+    total = time.perf_counter() - started
+
+    # მეხსიერება - ცალკე გაშვებით, რომ tracemalloc დროს არ ამახინჯებდეს
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result = {
+        'name': name,
+        'iterations': iterations,
+        'p50_ms': round(percentile(times, 50), 3),
+        'p90_ms': round(percentile(times, 90), 3),
+        'p99_ms': round(percentile(times, 99), 3),
+        'mean_ms': round(sum(times) / len(times), 3),
+        'min_ms': round(min(times), 3),
+        'max_ms': round(max(times), 3),
+        'ops_per_sec': round(iterations / total, 1) if total else None,
+        'peak_kb': round(peak / 1024, 1),
+    }
+    print(f"  {name:<40} p50 {result['p50_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+          f"{result['ops_per_sec'] or 0:>8.1f}/s  {result['peak_kb']:>9.1f}KB")
+    return result
+
+
+def skipped(name, reason):
+    print(f"  {name:<40} გამოტოვებულია: {reason}")
+    return {'name': name, 'skipped': reason}
+
+
+def rss_kb():
+    """პროცესის მეხსიერების პიკი (KB): Unix - getrusage, Windows - PeakWorkingSetSize"""
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage // 1024 if sys.platform == 'darwin' else usage
+    except ImportError:
+        pass
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize // 1024
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+# ======================== Suites ========================
+
+def import_app():
+    """ახალ პროცესში: python -c 'import app'"""
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=BASE_DIR, check=True)
+
+
+def start_server(timeout=60):
+    """app.py --no-browser: პროცესის გაშვებიდან პორტის მოსმენამდე"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, os.path.join(BASE_DIR, 'app.py'), '--no-browser', '--port', str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), 0.1).close()
+                return
+            except OSError:
+                if proc.poll() is not None:
+                    raise RuntimeError('app.py exited before listening')
+                time.sleep(0.01)
+        raise RuntimeError('app.py did not start listening')
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run_core(iterations):
+    """გაშვება, დოკუმენტის აწყობა, შენახვა, სურათები, PDF"""
+    import app
+
+    sig = _signature()
+    f100 = sample_form_100(sig)
+    mr = sample_medical_record(sig)
+    results = []
+
+    print("\n🚀 გაშვება")
+    results.append(measure('app_import', import_app, max(3, iterations // 10), warmup=1))
+    results.append(measure('server_listening', start_server, max(3, iterations // 10), warmup=1))
+
+    print("\n📄 დოკუმენტები")
+    results.append(measure('form_100_build_11pt', lambda: app._build_form_100_structure(f100, 11), iterations))
+    results.append(measure('form_100_build_10pt', lambda: app._build_form_100_structure(f100, 10), iterations))
+    results.append(measure('medical_record_build', lambda: app.create_medical_record_document(mr), iterations))
+
+    doc = app.create_form_100_document_print(f100)
+    results.append(measure('docx_save', lambda: doc.save(BytesIO()), iterations))
+    results.append(measure('docx_skeleton_render', lambda: app.render_docx('form_100', f100, 10), iterations))
+
+    print("\n🖋  ხელმოწერები")
+    results.append(measure('decode_base64_image', lambda: app.decode_base64_image(sig), iterations))
+    results.append(measure('load_signature_cached', lambda: app.load_signature(sig), iterations))
+
+    print("\n🖨  PDF")
+    pdf_path = os.path.join(app.SCRATCH_FOLDER, 'bench_native.pdf')
+    if app.native_pdf_available():
+        results.append(measure('native_pdf_render',
+                               lambda: app.render_pdf_document(f100, 'form_100', pdf_path, 10),
+                               max(5, iterations // 5)))
+    else:
+        results.append(skipped('native_pdf_render', 'reportlab/შრიფტი არ არის'))
+
+    if app.office_converter_ready():
+        docx_path = os.path.join(app.SCRATCH_FOLDER, 'bench_convert.docx')
+        app.save_docx('form_100', f100, docx_path, 10)
+        results.append(measure('convert_to_pdf',
+                               lambda: app.convert_to_pdf(docx_path, app.SCRATCH_FOLDER),
+                               max(3, iterations // 10), warmup=1))
+    else:
+        results.append(skipped('convert_to_pdf', 'LibreOffice/Word ვერ მოიძებნა'))
+    return results
+
+
+def disk_bytes(paths):
+    """დისკზე დაკავებული ადგილი (ბლოკებით, სადაც ცნობილია)"""
+    total = 0
+    for path in paths:
+        st = os.stat(path)
+        total += st.st_blocks * 512 if hasattr(st, 'st_blocks') else st.st_size
+    return total
+
+
+def build_corpus(size, seed=42):
+    """
+    სინთეზური კორპუსი: ~80% დოკუმენტი (არქივში, 12 თვის შარდებად), ~20% შაბლონი
+    (saved_templates/*.json - ძველი ფორმატი, იმპორტი იზომება ცალკე)
+    """
+    import app
+
+    rnd = random.Random(seed)
+    sig = _signature()
+    templates = max(1, size // 5)
+    store = app.get_document_store()
+    for i in range(size - templates):
+        patient = f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}'
+        date = datetime(2025, rnd.randint(1, 12), rnd.randint(1, 28))
+        ext = 'pdf' if i % 3 else 'docx'
+        path = os.path.join(app.SCRATCH_FOLDER, f'{patient.replace(" ", "_")}_{date:%Y-%m-%d}_{i}.{ext}')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-1.4\n')
+        store.put(path, {'patient_name': patient}, mtime=date.timestamp())
+    for i in range(templates):
+        data = sample_form_100(sig if i % 10 == 1 else '') if i % 2 else sample_medical_record('')
+        data.update({
+            'template_name': f'შაბლონი {i}',
+            'patient_name': f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}',
+            'personal_id': f'{rnd.randint(0, 10 ** 11 - 1):011d}',
+            'created': f'2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00',
+        })
+        with open(os.path.join(app.TEMPLATES_FOLDER, f'tpl_{i}.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def run_corpus(size, iterations):
+    """ძებნა და შაბლონების სია N ფაილზე (ცალკე პროცესში)"""
+    import app
+
+    print(f"\n🗂  კორპუსი: {size} ფაილი")
+    t = time.perf_counter()
+    build_corpus(size)
+    print(f"  (კორპუსის შექმნა: {time.perf_counter() - t:.1f}s)")
+
+    results = []
+    # მეხსიერება - ზრდა კორპუსის ჩატვირთვიდან (app-ის იმპორტის პიკი ყველა ზომაზე ერთია)
+    rss_before = rss_kb()
+    legacy_bytes = disk_bytes(e.path for e in os.scandir(app.TEMPLATES_FOLDER) if e.is_file())
+    t = time.perf_counter()
+    app.get_template_store()
+    results.append({'name': f'template_store_import[{size}]', 'seconds': round(time.perf_counter() - t, 3)})
+    print(f"  {results[-1]['name']:<40} {results[-1]['seconds']}s")
+    # გაშვებისას: გახსნა + სიის პირველი გვერდი (JSON-ის გახსნის გარეშე)
+    results.append(measure(f'template_store_open[{size}]', lambda: _open_template_page(app), iterations))
+    app.get_template_store().conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    store_bytes = disk_bytes([app.TEMPLATE_DB_PATH] + [
+        os.path.join(root, f) for root, _, files in os.walk(app.BLOBS_FOLDER) for f in files])
+    results.append({'name': f'template_storage_bytes[{size}]', 'value': store_bytes, 'legacy': legacy_bytes})
+    print(f"  {results[-1]['name']:<40} {store_bytes} (JSON ფაილები: {legacy_bytes})")
+
+    t = time.perf_counter()
+    documents = app.DocumentStore()
+    results.append({'name': f'document_store_load[{size}]', 'seconds': round(time.perf_counter() - t, 3)})
+    print(f"  {results[-1]['name']:<40} {results[-1]['seconds']}s")
+    # watcher-ის პერიოდული სამუშაო, რომელიც არქივთან ერთად იზრდება: წაშლილი ფაილების მოძებნა
+    results.append(measure(f'document_store_prune[{size}]', documents.prune, max(3, iterations // 10), warmup=1))
+    catalog = app.Catalog()
+
+    index = app.get_search_index()
+    if index:
+        t = time.perf_counter()
+        index.rebuild()
+        results.append({'name': f'search_index_rebuild[{size}]', 'seconds': round(time.perf_counter() - t, 3)})
+        print(f"  {results[-1]['name']:<40} {results[-1]['seconds']}s")
+    app._catalog = catalog  # watcher-ის გარეშე
+
+    client = app.app.test_client()
+    queries = ['გიორ', 'ბერიძე', 'nino', '0101', '2025-03', 'zzzz']
+    q = iter(queries * (iterations + 10))
+    results.append(measure(f'search_patients[{size}]',
+                           lambda: client.get(f'/api/search-patients?q={next(q)}'), iterations))
+    results.append(measure(f'templates_list[{size}]', lambda: client.get('/api/templates?page=1'), iterations))
+    results.append(measure(f'templates_list_filtered[{size}]',
+                           lambda: client.get('/api/templates?q=ნინო&sort=name'), iterations))
+    results.append(measure(f'template_get[{size}]', lambda: client.get('/api/templates/tpl_1'), iterations))
+    results.append(measure(f'template_load[{size}]', lambda: app.load_template('tpl_1'), iterations))
+    rss_after = rss_kb()
+    if rss_before is not None and rss_after is not None:
+        results.append({'name': f'rss_growth_kb[{size}]', 'value': rss_after - rss_before, 'peak_kb': rss_after})
+        print(f"  {results[-1]['name']:<40} {rss_after - rss_before} (პიკი: {rss_after})")
+    return results
+
+
+def _open_template_page(app):
+    store = app.TemplateStore()
+    try:
+        store.query(sort='-created', limit=app.TEMPLATES_PER_PAGE)
+    finally:
+        store.conn.close()
+
+
+def run_corpus_subprocess(size, iterations):
+    """თითო კორპუსი ახალ პროცესში: სუფთა ქეშები და მეხსიერების გაზომვა"""
+    storage = tempfile.mkdtemp(prefix=f'meddocs_bench_{size}_')
+    try:
+        env = dict(os.environ, MEDDOCS_STORAGE_DIR=storage)
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker-corpus', str(size),
+                              '--iterations', str(iterations)],
+                             env=env, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        lines = out.stdout.splitlines()
+        print('\n'.join(l for l in lines if not l.startswith('@@')))
+        payload = [l[2:] for l in lines if l.startswith('@@')]
+        return json.loads(payload[-1]) if payload else [skipped(f'corpus[{size}]', 'worker failed')]
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+
+# ======================== Baseline ========================
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    baseline = {r['name']: r for r in report['results']}
+
+    regressions = []
+    print(f"\n📊 შედარება: {baseline_path}")
+    if report.get('system', platform.system()) != platform.system() or report.get('cpu_count') != os.cpu_count():
+        print(f"  ⚠️  baseline სხვა გარემოშია ჩაწერილი ({report.get('platform')}, "
+              f"{report.get('cpu_count')} CPU) - შედარება საორიენტაციოა")
+    for r in results:
+        old = baseline.get(r['name'])
+        key = 'p50_ms' if 'p50_ms' in r else 'seconds' if 'seconds' in r else None
+        if not old or not key or key not in old or not old[key]:
+            continue
+        ratio = r[key] / old[key]
+        mark = '❌' if ratio > 1 + threshold else '✅'
+        print(f"  {mark} {r['name']:<40} {old[key]:>9.3f} -> {r[key]:>9.3f} ({ratio:.2f}x)")
+        if ratio > 1 + threshold:
+            regressions.append(r['name'])
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='სამედიცინო დოკუმენტაცია - benchmark')
+    parser.add_argument('--corpus', type=int, nargs='*',
+                        help='კორპუსის ზომები (ნაგულისხმევად 1000 10000; --save-baseline - 1000 10000 100000)')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--skip-core', action='store_true')
+    parser.add_argument('--output', help='შედეგების JSON ფაილი')
+    parser.add_argument('--save-baseline', action='store_true', help=f'შენახვა: {BASELINE_PATH}')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, help='baseline JSON-თან შედარება')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--worker-corpus', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker_corpus:
+        results = run_corpus(args.worker_corpus, args.iterations)
+        print('@@' + json.dumps(results, ensure_ascii=False))
+        return 0
+
+    if args.corpus is None:
+        args.corpus = BASELINE_CORPUS if args.save_baseline else [1000, 10000]
+    if args.save_baseline and (args.skip_core or sorted(args.corpus) != BASELINE_CORPUS):
+        print(f"❌ baseline-ს სჭირდება ყველა benchmark და კორპუსები {BASELINE_CORPUS}")
+        return 2
+
+    results = []
+    if not args.skip_core:
+        storage = tempfile.mkdtemp(prefix='meddocs_bench_')
+        os.environ['MEDDOCS_STORAGE_DIR'] = storage
+        try:
+            results += run_core(args.iterations)
+        finally:
+            shutil.rmtree(storage, ignore_errors=True)
+    for size in args.corpus:
+        results += run_corpus_subprocess(size, args.iterations)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'system': platform.system(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    paths = [args.output] if args.output else []
+    if args.save_baseline:
+        missing = [r['name'] for r in results if 'skipped' in r]
+        if missing:
+            # Word/LibreOffice-ის გარეშე baseline კონვერტაციის რეგრესიას ვერ დაიჭერს
+            print(f"\n❌ baseline არ შეინახა - გამოტოვებულია: {', '.join(missing)}")
+            return 2
+        paths.append(BASELINE_PATH)
+    for path in paths:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 {path}")
+
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print(f"\n❌ baseline ვერ მოიძებნა: {args.compare} (python benchmark.py --save-baseline "
+                  f"საცნობარო Windows მანქანაზე)")
+            return 2
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n⚠️  რეგრესია: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -34,9 +34,16 @@ pip install flask==2.3.3
 pip install python-docx==0.8.11
 pip install werkzeug==2.3.7
 pip install lxml
+pip install reportlab
+pip install Pillow
+pip install pypdf
+pip install waitress
+pip install brotli
+pip install pywin32
 pip install pyinstaller
 
 echo [5/6] EXE ფაილის აგება...
+python build_assets.py
 pyinstaller --noconfirm ^
     --onedir ^
     --console ^
@@ -56,8 +63,10 @@ pyinstaller --noconfirm ^
     --hidden-import=lxml ^
     --hidden-import=lxml._elementpath ^
     --hidden-import=lxml.etree ^
-    --collect-all=docx ^
-    --collect-all=flask ^
+    --hidden-import=waitress ^
+    --collect-submodules=waitress ^
+    --collect-data=docx ^
+    --noupx ^
     app.py
 
 echo [6/6] საქაღალდეების შექმნა...
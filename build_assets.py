@@ -0,0 +1,236 @@
+"""
+სტატიკური ფაილების აგება (EXE-ის აგებამდე, build_exe.py უშვებს ავტომატურად).
+
+    python build_assets.py
+    python build_assets.py --clean      # static/dist-ის წაშლა (dev - ორიგინალი ფაილები)
+
+static/css/*.css და static/js/*.js -> static/dist/: შემცირებული (კომენტარები,
+ზედმეტი სივრცე), სახელში შიგთავსის hash (style.3f2a9c1b0d.css), გვერდით
+.gz და .br (brotli, თუ დაყენებულია) ვარიანტები და manifest.json
+('css/style.css' -> 'dist/css/style.3f2a9c1b0d.css'). სერვერი manifest-ით
+ცვლის url_for('static', ...) ბმულებს და აგზავნის შეკუმშულ ვარიანტს.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import shutil
+import hashlib
+import argparse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+ASSET_DIRS = {'css': '.css', 'js': '.js'}
+HASH_LENGTH = 10
+
+_CSS_TOKEN_RE = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\s+|[^"\'/\s]+|/', re.S)
+_CSS_TIGHT = set('{};,>')
+
+
+def minify_css(text):
+    """კომენტარების წაშლა და სივრცის შეკუმშვა; სტრიქონები და url() უცვლელია"""
+    out = []
+    for token in _CSS_TOKEN_RE.findall(text):
+        if token.startswith('/*'):
+            continue
+        if token.isspace():
+            if out and out[-1] != ' ':
+                out.append(' ')
+            continue
+        if out and out[-1] == ' ' and (token[0] in _CSS_TIGHT or len(out) < 2 or out[-2][-1:] in _CSS_TIGHT | {':'}):
+            out.pop()
+        out.append(token)
+    css = ''.join(out).strip()
+    return css.replace(';}', '}')
+
+
+_JS_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'throw', 'yield')
+
+
+def _js_regex_allowed(out):
+    """'/' იწყებს regex-ს (და არა გაყოფას)? - წინა მნიშვნელოვანი სიმბოლოს მიხედვით"""
+    code = ''.join(out[-3:]).rstrip()
+    if not code:
+        return True
+    if code[-1] in _JS_REGEX_PREFIX:
+        return True
+    word = re.search(r'[A-Za-z_$][\w$]*$', code)
+    return bool(word) and word.group() in _JS_REGEX_KEYWORDS
+
+
+def _js_skip_string(text, i, quote):
+    """i - გამხსნელი ბრჭყალი -> დამხურავის შემდეგი პოზიცია"""
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def _js_skip_regex(text, i):
+    i += 1
+    in_class = False
+    while i < len(text) and (text[i] != '/' or in_class):
+        if text[i] == '\\':
+            i += 1
+        elif text[i] == '[':
+            in_class = True
+        elif text[i] == ']':
+            in_class = False
+        i += 1
+    i += 1
+    while i < len(text) and text[i].isalpha():  # flag-ები
+        i += 1
+    return i
+
+
+def _js_skip_template(text, i):
+    """`...${...}...` - ჩადგმული გამოსახულებების ჩათვლით"""
+    i += 1
+    while i < len(text) and text[i] != '`':
+        if text[i] == '\\':
+            i += 2
+        elif text.startswith('${', i):
+            depth, i = 1, i + 2
+            while i < len(text) and depth:
+                ch = text[i]
+                if ch in '\'"':
+                    i = _js_skip_string(text, i, ch)
+                    continue
+                if ch == '`':
+                    i = _js_skip_template(text, i)
+                    continue
+                depth += {'{': 1, '}': -1}.get(ch, 0)
+                i += 1
+        else:
+            i += 1
+    return i + 1
+
+
+def minify_js(text):
+    """
+    კონსერვატიული შემცირება: კომენტარები, შეწევა, ცარიელი ხაზები და ზედმეტი
+    სივრცე. ხაზის გადატანები რჩება (ASI), სტრიქონები/template/regex - უცვლელი.
+    """
+    out = []
+    i, n = 0, len(text)
+    pending = ''  # სივრცე ან '\n' შემდეგ ტოკენამდე
+    while i < n:
+        ch = text[i]
+        if ch in ' \t\r\n':
+            if ch == '\n':
+                pending = '\n'
+            elif not pending:
+                pending = ' '
+            i += 1
+            continue
+        if text.startswith('//', i):
+            i = text.find('\n', i)
+            i = n if i < 0 else i
+            continue
+        if text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            if not pending:
+                pending = ' '
+            continue
+
+        if ch in '\'"':
+            end = _js_skip_string(text, i, ch)
+        elif ch == '`':
+            end = _js_skip_template(text, i)
+        elif ch == '/' and _js_regex_allowed(out):
+            end = _js_skip_regex(text, i)
+        else:
+            end = i + 1
+            while end < n and (text[end].isalnum() or text[end] in '_$') and (ch.isalnum() or ch in '_$'):
+                end += 1
+
+        if pending and out:
+            if pending == '\n':
+                out.append('\n')
+            elif (out[-1][-1:].isalnum() or out[-1][-1:] in '_$') and (ch.isalnum() or ch in '_$'):
+                out.append(' ')  # იდენტიფიკატორები/საკვანძო სიტყვები ერთმანეთის გვერდით
+            elif out[-1][-1:] in '+-' and ch in '+-':
+                out.append(' ')  # a + +b, a - -b
+        pending = ''
+        out.append(text[i:end])
+        i = end
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def fingerprint(data):
+    return hashlib.sha1(data).hexdigest()[:HASH_LENGTH]
+
+
+def compress(path, data):
+    """path.gz (და path.br) - ზომა ბაიტებში {'gzip': ..., 'br': ...}"""
+    sizes = {}
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    sizes['gzip'] = os.path.getsize(path + '.gz')
+    if brotli:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+        sizes['br'] = os.path.getsize(path + '.br')
+    return sizes
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """static/-ის CSS/JS -> dist/ + manifest.json; -> manifest"""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    manifest = {}
+    for folder, suffix in ASSET_DIRS.items():
+        src_dir = os.path.join(static_dir, folder)
+        if not os.path.isdir(src_dir):
+            continue
+        os.makedirs(os.path.join(dist_dir, folder), exist_ok=True)
+        for name in sorted(os.listdir(src_dir)):
+            if not name.endswith(suffix):
+                continue
+            with open(os.path.join(src_dir, name), 'r', encoding='utf-8') as f:
+                source = f.read()
+            data = MINIFIERS[suffix](source).encode('utf-8')
+            built = f'{name[:-len(suffix)]}.{fingerprint(data)}{suffix}'
+            path = os.path.join(dist_dir, folder, built)
+            with open(path, 'wb') as f:
+                f.write(data)
+            sizes = compress(path, data)
+            manifest[f'{folder}/{name}'] = f'dist/{folder}/{built}'
+            print(f"  {folder}/{name:<20} {len(source.encode('utf-8')):>8} -> {len(data):>8}  "
+                  + '  '.join(f'{enc} {size}' for enc, size in sizes.items()))
+
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='სტატიკური ფაილების აგება (minify, hash, gzip/brotli)')
+    parser.add_argument('--clean', action='store_true', help='static/dist-ის წაშლა')
+    args = parser.parse_args(argv)
+
+    if args.clean:
+        shutil.rmtree(DIST_DIR, ignore_errors=True)
+        print(f"🗑  {DIST_DIR}")
+        return 0
+
+    if not brotli:
+        print("⚠️  brotli არ არის დაყენებული - მხოლოდ gzip ვარიანტები (pip install brotli)")
+    manifest = build()
+    print(f"✅ {len(manifest)} ფაილი -> {DIST_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
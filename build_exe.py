@@ -1,6 +1,8 @@
 import os
 import sys
 
+import build_assets
+
 def main():
     try:
         import PyInstaller  # noqa: F401
@@ -24,25 +26,28 @@ def main():
         # Console რეჟიმი - ეს ვერსია მუშაობს კარგად ბეჭდვაზე
         "--console",
 
+        # UPX-ით შეკუმშული DLL-ები ყოველ გაშვებაზე იხსნება (და ანტივირუსი ამოწმებს) - ნელი სტარტი
+        "--noupx",
+
         # რესურსები
         "--add-data=templates;templates",
         "--add-data=static;static",
 
-        # აუცილებელი hidden-import-ები
-        "--hidden-import=flask",
-        "--collect-all=flask",
-
-        "--hidden-import=docx",
-        "--collect-all=docx",
-
-        "--hidden-import=docx2pdf",
-        "--collect-all=docx2pdf",
+        # python-docx-ის ცარიელი შაბლონი (default.docx, XML ნაწილები); flask, docx,
+        # reportlab, pypdf და waitress import-ებს PyInstaller თავად პოულობს -
+        # --collect-all აღარ აგროვებს გამოუყენებელ მოდულებს
+        "--collect-data=docx",
 
+        # Word-ის COM სესია (PDF კონვერტაცია Windows-ზე)
         "--hidden-import=win32com",
         "--hidden-import=win32com.client",
         "--hidden-import=pythoncom",
 
-        "--hidden-import=comtypes",
+        # გამოუყენებელი სტანდარტული/მძიმე მოდულები
+        "--exclude-module=tkinter",
+        "--exclude-module=unittest",
+        "--exclude-module=pydoc",
+        "--exclude-module=numpy",
     ]
 
     if has_icon:
@@ -59,6 +64,9 @@ def main():
         print(" ", p)
     print("==============================================")
 
+    # CSS/JS: minify + hash სახელში + gzip/brotli (static/dist, EXE-ში ხვდება static-თან ერთად)
+    build_assets.main([])
+
     pyinstaller_run(params)
 
     print("\n✅ აგება დასრულდა!")
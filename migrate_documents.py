@@ -0,0 +1,52 @@
+"""
+documents/-ის ბრტყელი სტრუქტურის გადატანა არქივის შარდებში.
+
+    python migrate_documents.py
+    python migrate_documents.py --dry-run
+
+ფაილები გადაიტანება documents/YYYY/MM/-ში (ფაილის თარიღით) და ჩაიწერება
+manifest.jsonl-ში. id რჩება ძველი ფაილის სახელი - არსებული ბმულები
+(/api/view-pdf/..., /api/download/...) აგრძელებს მუშაობას. იგივე ხდება
+აპლიკაციის გაშვებისას ავტომატურად; სკრიპტი საჭიროა დიდი საქაღალდის
+წინასწარ, სერვერის გაჩერებულ მდგომარეობაში გადასატანად.
+"""
+import os
+import sys
+import time
+import argparse
+
+import app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='დოკუმენტების გადატანა არქივის შარდებში')
+    parser.add_argument('--dry-run', action='store_true', help='მხოლოდ დათვლა, გადატანის გარეშე')
+    args = parser.parse_args(argv)
+
+    pending = [e.name for e in os.scandir(app.DOCUMENTS_FOLDER)
+               if e.is_file() and e.name.endswith(app.DOCUMENT_SUFFIXES)]
+    if args.dry_run:
+        print(f"{len(pending)} ფაილი გადასატანია ({app.DOCUMENTS_FOLDER})")
+        return 0
+
+    started = time.perf_counter()
+    store = app.DocumentStore()
+    done = []
+
+    def progress(entry):
+        done.append(entry)
+        if len(done) % 1000 == 0:
+            print(f'... {len(done)}/{len(pending)}')
+
+    store.migrate(progress)
+    elapsed = time.perf_counter() - started
+
+    failed = len(pending) - len(done)
+    if failed:
+        print(f"⚠️  {failed} ფაილი ვერ გადაიტანა")
+    print(f"✅ {len(done)} ფაილი, {elapsed:.1f} წმ; არქივში სულ {len(store.entries)} დოკუმენტი")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,7 @@ const medicalRecord = document.getElementById('medicalRecord');
 
 const saveDocumentBtn = document.getElementById('saveDocument');
 const printDocumentBtn = document.getElementById('printDocument');
+const printCombinedBtn = document.getElementById('printCombined');
 const saveAsTemplateBtn = document.getElementById('saveAsTemplate');
 const clearFormBtn = document.getElementById('clearForm');
 
@@ -20,6 +21,7 @@ const templatesGrid = document.getElementById('templatesGrid');
 const emptyTemplates = document.getElementById('emptyTemplates');
 
 let currentDocType = 'medical_record'; // საწყისად სამედიცინო ჩანაწერი
+let appliedTemplate = null; // { id, docType, data } - ბოლოს ჩატვირთული შაბლონი
 
 // ===== Init =====
 document.addEventListener('DOMContentLoaded', () => {
@@ -248,7 +250,10 @@ function handleSigUpload(event, type) {
             if (preview) preview.innerHTML = `<img src="${base64}" alt="sig" style="max-width:100%; max-height:100%;">`;
 
             const dataInput = document.getElementById(ids.data);
-            if (dataInput) dataInput.value = base64;
+            if (dataInput) {
+                dataInput.value = base64;
+                delete dataInput.dataset.sigHash;
+            }
 
             // სერვერზე შენახვა (სურვილისამებრ, რომ შემდეგ ჯერზეც დარჩეს)
             uploadSignatureToServer(file, type);
@@ -268,10 +273,15 @@ async function uploadSignatureToServer(file, type) {
     formData.append('type', serverType);
 
     try {
-        await fetch('/api/upload-signature', {
+        const response = await fetch('/api/upload-signature', {
             method: 'POST',
             body: formData
         });
+        const result = await response.json();
+        // სერვერზე დამუშავებული (მოჭრილი, შემცირებული) ვერსია და მისი hash
+        if (result.success && result.base64) {
+            setSig(type, result.base64, result.hash);
+        }
     } catch (e) {
         console.error('Signature upload error:', e);
     }
@@ -292,7 +302,10 @@ function clearSignature(type) {
     if (preview) preview.innerHTML = '<span>ატვირთეთ</span>';
 
     const data = document.getElementById(ids.data);
-    if (data) data.value = '';
+    if (data) {
+        data.value = '';
+        delete data.dataset.sigHash;
+    }
 
     const input = document.getElementById(ids.input);
     if (input) input.value = '';
@@ -304,17 +317,18 @@ async function loadSavedSignatures() {
         const result = await response.json();
         if (result.success && result.signatures) {
             const s = result.signatures;
+            const h = result.hashes || {};
             // Form 100
-            if (s.doctor) setSig('doctor', s.doctor);
-            if (s.stamp) setSig('stamp', s.stamp);
-            if (s.head) setSig('head', s.head);
+            if (s.doctor) setSig('doctor', s.doctor, h.doctor);
+            if (s.stamp) setSig('stamp', s.stamp, h.stamp);
+            if (s.head) setSig('head', s.head, h.head);
             // MR
-            if (s.doctor) setSig('mrDoctor', s.doctor);
+            if (s.doctor) setSig('mrDoctor', s.doctor, h.doctor);
         }
     } catch (e) { console.error(e); }
 }
 
-function setSig(type, base64) {
+function setSig(type, base64, hash) {
     const map = {
         'doctor': { preview: 'doctorSigPreview', data: 'doctorSigData' },
         'stamp': { preview: 'stampPreview', data: 'stampData' },
@@ -326,7 +340,11 @@ function setSig(type, base64) {
         const p = document.getElementById(ids.preview);
         if (p) p.innerHTML = `<img src="${base64}" style="max-width:100%; max-height:100%;">`;
         const d = document.getElementById(ids.data);
-        if (d) d.value = base64;
+        if (d) {
+            d.value = base64;
+            if (hash) d.dataset.sigHash = hash;
+            else delete d.dataset.sigHash;
+        }
     }
 }
 
@@ -340,6 +358,9 @@ function initButtons() {
     if (printDocumentBtn) {
         printDocumentBtn.addEventListener('click', handlePrint);
     }
+    if (printCombinedBtn) {
+        printCombinedBtn.addEventListener('click', handlePrintCombined);
+    }
     if (saveAsTemplateBtn) {
         saveAsTemplateBtn.addEventListener('click', openTemplateModal);
     }
@@ -354,32 +375,87 @@ function initButtons() {
 }
 
 // ===== Form Data =====
-function getFormData() {
-    const form = currentDocType === 'form_100'
+function getFormData(useSigRefs = false, docType = currentDocType) {
+    const form = docType === 'form_100'
         ? document.getElementById('form100Form')
         : document.getElementById('medicalRecordForm');
 
-    const data = { document_type: currentDocType };
+    const data = { document_type: docType };
     if (!form) return data;
 
     const fd = new FormData(form);
     fd.forEach((val, key) => { data[key] = val; });
-    return data;
+    if (!useSigRefs) return data;
+
+    // შაბლონიდან შევსებული ფორმა: შაბლონის id + მხოლოდ შეცვლილი ველები
+    let payload = data;
+    if (appliedTemplate && appliedTemplate.docType === docType) {
+        payload = { template_id: appliedTemplate.id, document_type: docType };
+        Object.keys(data).forEach(key => {
+            if (String(appliedTemplate.data[key] ?? '') !== data[key]) payload[key] = data[key];
+        });
+    }
+
+    // სერვერზე უკვე არსებული ხელმოწერები იგზავნება შიგთავსის hash-ით ('sig:<hash>') - ზუსტად ის
+    // სურათი, რაც ფორმაშია ('@saved:' ბეჭდვის მომენტში შენახულ ფაილს აიღებდა, შეიძლება სხვისას)
+    form.querySelectorAll('input[data-sig-hash]').forEach(input => {
+        if (!input.name || !payload[input.name]) return;
+        payload[input.name] = 'sig:' + input.dataset.sigHash;
+    });
+    return payload;
+}
+
+// ===== Document Jobs (ფონური შენახვა/ბეჭდვა) =====
+const JOB_POLL_INTERVAL = 500;
+const JOB_POLL_TIMEOUT = 5 * 60 * 1000;
+const JOB_STAGE_LABELS = {
+    'queued': 'რიგში...',
+    'rendering': 'დოკუმენტის აწყობა...',
+    'converting': 'PDF-ში გადაყვანა...',
+    'done': 'მზადაა'
+};
+
+// დავალების გაგზავნა და სტატუსის შემოწმება დასრულებამდე -> იგივე პასუხი, რაც სინქრონულ რეჟიმში.
+// სერვერმა მითითება ვერ გახსნა (გადატვირთვა, შეცვლილი ხელმოწერა, წაშლილი შაბლონი) -> fullData
+async function runDocumentJob(url, data, fullData = null) {
+    const resp = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ...data, async: true })
+    });
+    const submitted = await resp.json();
+    if (submitted.code === 'unresolved_reference' && fullData) {
+        return runDocumentJob(url, fullData);
+    }
+    if (!submitted.success || !submitted.job_id) return submitted;
+
+    const deadline = Date.now() + JOB_POLL_TIMEOUT;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        const statusResp = await fetch(`/api/jobs/${submitted.job_id}`);
+        const status = await statusResp.json();
+        if (!status.success) return status;
+
+        const job = status.job;
+        let message = JOB_STAGE_LABELS[job.status] || 'მიმდინარეობს...';
+        if (job.status === 'queued' && job.position) message = `რიგში (${job.position})...`;
+        setLoadingProgress(message, job.progress);
+
+        if (job.status === 'done') return job.result;
+        if (job.status === 'error') return { success: false, error: job.error };
+    }
+    return { success: false, error: 'დრო ამოიწურა' };
 }
 
 // ===== Save =====
 async function handleSave(filename) {
     showLoading();
-    const data = getFormData();
+    const data = getFormData(true);
     data.filename = filename;
+    const fullData = { ...getFormData(), filename };
 
     try {
-        const resp = await fetch('/api/save-document', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data)
-        });
-        const result = await resp.json();
+        const result = await runDocumentJob('/api/save-document', data, fullData);
         hideLoading();
 
         if (!result.success) {
@@ -410,16 +486,22 @@ async function handleSave(filename) {
 
 // ===== Print =====
 async function handlePrint() {
-    showLoading();
-    const data = getFormData();
+    await printDocumentJob('/api/print-document', getFormData(true), getFormData());
+}
+
+// ფორმა 100 + სამედიცინო ჩანაწერი ერთ PDF-ში: ერთი კონვერტაცია, ერთი ბეჭდვის ფანჯარა
+async function handlePrintCombined() {
+    await printDocumentJob('/api/print-combined', {
+        documents: [getFormData(true, 'form_100'), getFormData(true, 'medical_record')]
+    }, {
+        documents: [getFormData(false, 'form_100'), getFormData(false, 'medical_record')]
+    });
+}
 
+async function printDocumentJob(url, data, fullData) {
+    showLoading();
     try {
-        const resp = await fetch('/api/print-document', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(data)
-        });
-        const result = await resp.json();
+        const result = await runDocumentJob(url, data, fullData);
         hideLoading();
 
         if (!result.success) {
@@ -461,31 +543,43 @@ async function handlePrint() {
 }
 
 // ===== Templates =====
-async function loadTemplates() {
+let templatesPage = 1;
+// ხელმოწერის ველი -> preview; შაბლონის სურათი მოდის '@blob:<sha1>' მითითებით
+const SIG_PREVIEWS = {
+    doctorSigData: 'doctorSigPreview', stampData: 'stampPreview',
+    headSigData: 'headSigPreview', mrDoctorSigData: 'mrDoctorSigPreview'
+};
+
+// შაბლონების მოკლე სია გვერდებად; append - "მეტის ჩატვირთვა"
+async function loadTemplates(append = false) {
+    templatesPage = append ? templatesPage + 1 : 1;
     try {
-        const resp = await fetch('/api/templates');
+        const resp = await fetch(`/api/templates?page=${templatesPage}&per_page=24&sort=-created`);
         const result = await resp.json();
-        if (result.success) renderTemplates(result.templates);
+        if (result.success) renderTemplates(result.templates, append, result.page < result.pages);
     } catch (e) {
         console.error('Templates error', e);
     }
 }
 
-function renderTemplates(templates) {
+function renderTemplates(templates, append = false, hasMore = false) {
     if (!templatesGrid) return;
 
-    if (!templates || templates.length === 0) {
+    const moreBtn = document.getElementById('templatesMoreBtn');
+    if (moreBtn) moreBtn.remove();
+
+    if (!append && (!templates || templates.length === 0)) {
         templatesGrid.innerHTML = '';
         if (emptyTemplates) emptyTemplates.style.display = 'block';
         return;
     }
     if (emptyTemplates) emptyTemplates.style.display = 'none';
 
-    templatesGrid.innerHTML = templates.map(t => `
+    const html = templates.map(t => `
         <div class="template-card" data-template-id="${t.id}">
             <div class="template-card-header">
                 <div class="template-icon">
-                    <i class="fas ${t.data.document_type === 'form_100' ? 'fa-file-alt' : 'fa-notes-medical'}"></i>
+                    <i class="fas ${t.document_type === 'form_100' ? 'fa-file-alt' : 'fa-notes-medical'}"></i>
                 </div>
                 <div class="template-actions">
                     <button onclick="useTemplate('${t.id}')" title="გამოყენება">
@@ -498,10 +592,19 @@ function renderTemplates(templates) {
             </div>
             <h3>${t.name}</h3>
             <span class="template-type">
-                ${t.data.document_type === 'form_100' ? 'ფორმა №100' : 'სამედიცინო ჩანაწერი'}
+                ${t.document_type === 'form_100' ? 'ფორმა №100' : 'სამედიცინო ჩანაწერი'}
             </span>
         </div>
     `).join('');
+
+    if (append) templatesGrid.insertAdjacentHTML('beforeend', html);
+    else templatesGrid.innerHTML = html;
+
+    if (hasMore) {
+        templatesGrid.insertAdjacentHTML('afterend',
+            '<button class="btn btn-clear" id="templatesMoreBtn" style="margin-top:1rem;">მეტის ჩატვირთვა</button>');
+        document.getElementById('templatesMoreBtn').addEventListener('click', () => loadTemplates(true));
+    }
 }
 
 async function saveTemplate(name) {
@@ -528,15 +631,15 @@ async function saveTemplate(name) {
 
 async function useTemplate(templateId) {
     try {
-        const resp = await fetch('/api/templates');
+        const resp = await fetch(`/api/templates/${encodeURIComponent(templateId)}`);
         const result = await resp.json();
         if (!result.success) return;
 
-        const t = result.templates.find(x => x.id === templateId);
-        if (!t) return;
+        const t = result.template;
 
         const docType = t.data.document_type || 'form_100';
         currentDocType = docType;
+        appliedTemplate = { id: templateId, docType, data: t.data };
 
         const btn = document.querySelector(`.doc-type-btn[data-type="${docType}"]`);
         if (btn) btn.click();
@@ -553,11 +656,18 @@ async function useTemplate(templateId) {
                 const el = form.querySelector(`[name="${key}"]`);
                 // Flatpickr-ის შემთხვევაში, setDate მეთოდია სასურველი, მაგრამ value-ც მუშაობს altInput-თან
                 if (el) {
+                    // შაბლონის ხელმოწერა - არა სერვერზე შენახული
+                    delete el.dataset.sigHash;
                     if (el._flatpickr) {
                         el._flatpickr.setDate(t.data[key]);
                     } else {
                         el.value = t.data[key];
                     }
+                    const preview = document.getElementById(SIG_PREVIEWS[el.id]);
+                    const value = String(t.data[key] ?? '');
+                    if (preview && value.startsWith('@blob:')) {
+                        preview.innerHTML = `<img src="/api/blobs/${value.slice(6)}" style="max-width:100%; max-height:100%;">`;
+                    }
                 }
             });
             showToast('შაბლონი ჩაიტვირთა!', 'success');
@@ -571,7 +681,7 @@ async function useTemplate(templateId) {
 async function deleteTemplate(templateId) {
     if (!confirm('ნამდვილად გსურთ შაბლონის წაშლა?')) return;
     try {
-        const resp = await fetch(`/api/templates/${templateId}`, { method: 'DELETE' });
+        const resp = await fetch(`/api/templates/${encodeURIComponent(templateId)}`, { method: 'DELETE' });
         const result = await resp.json();
         if (result.success) {
             showToast('შაბლონი წაიშალა!', 'success');
@@ -652,6 +762,7 @@ function closeFilenameModal() {
 
 // ===== Utils =====
 function clearCurrentForm() {
+    if (appliedTemplate && appliedTemplate.docType === currentDocType) appliedTemplate = null;
     const form = currentDocType === 'form_100'
         ? document.getElementById('form100Form')
         : document.getElementById('medicalRecordForm');
@@ -667,9 +778,17 @@ function showToast(message, type = 'success') {
 }
 
 function showLoading() {
+    setLoadingProgress('მიმდინარეობს...', 0);
     if (loadingOverlay) loadingOverlay.classList.add('active');
 }
 
+function setLoadingProgress(message, percent) {
+    const text = document.getElementById('loadingMessage');
+    if (text) text.textContent = message;
+    const bar = document.getElementById('loadingProgressBar');
+    if (bar) bar.style.width = `${percent || 0}%`;
+}
+
 function hideLoading() {
     if (loadingOverlay) loadingOverlay.classList.remove('active');
 }
@@ -720,9 +839,9 @@ async function performSearch(query) {
             if (item.type === 'document') {
                 return `
                     <div class="search-item" onclick="window.open('${item.path}', '_blank')">
-                        <h4><i class="fas fa-file-word"></i> ${item.name}</h4>
+                        <h4><i class="fas ${item.name.endsWith('.pdf') ? 'fa-file-pdf' : 'fa-file-word'}"></i> ${item.name}</h4>
                         <p>
-                            <span class="search-tag tag-doc">DOCX</span>
+                            <span class="search-tag tag-doc">${item.name.split('.').pop().toUpperCase()}</span>
                             <span>${item.date}</span>
                         </p>
                     </div>
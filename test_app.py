@@ -0,0 +1,943 @@
+"""
+app.py-ის ტესტები: python -m pytest -q (ან python -m unittest test_app)
+
+ყველა საცავი (documents/, templates.db, ინდექსი, ქეში) დროებით საქაღალდეშია -
+MEDDOCS_STORAGE_DIR app-ის იმპორტამდე უნდა დაყენდეს.
+"""
+import os
+import re
+import sys
+import base64
+import functools
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+STORAGE = tempfile.mkdtemp(prefix='meddocs-test-')
+os.environ['MEDDOCS_STORAGE_DIR'] = STORAGE
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(BASE_DIR, 'signatures', 'head_signature.png'), 'rb') as _f:
+    SIGNATURE = 'data:image/png;base64,' + base64.b64encode(_f.read()).decode()
+
+FORM_100 = {
+    'document_type': 'form_100', 'patient_name': 'გიორგი ბერიძე', 'personal_id': '01010101010',
+    'document_date': '2026-01-02', 'doctor_signature_image': SIGNATURE, 'stamp_image': SIGNATURE,
+    'head_signature_image': '', 'medications': 'a\nb', 'anamnesis': 'x <y> & z',
+}
+MEDICAL_RECORD = {
+    'document_type': 'medical_record', 'patient_name': 'ნინო კაპანაძე', 'card_number': '77',
+    'doctor_signature_image': SIGNATURE, 'investigations': 'i1\ni2', 'medications': 'm1\n\nm2',
+    'initial_date': '2026-01-02 10:00', 'temperature': '36.6',
+}
+
+
+def tearDownModule():
+    shutil.rmtree(STORAGE, ignore_errors=True)
+
+
+def docx_parts(data):
+    """DOCX bytes -> {ნაწილის სახელი: შიგთავსი}"""
+    with zipfile.ZipFile(BytesIO(data)) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+
+def build_direct(doc_type, data, font_size_pt):
+    buf = BytesIO()
+    app.build_docx(app.get_layout_plan(doc_type), data, font_size_pt).save(buf)
+    return buf.getvalue()
+
+
+class SkeletonTest(unittest.TestCase):
+    """DOCX skeleton იგივე ფაილს უნდა იძლეოდეს, რასაც python-docx-ით სრული აწყობა"""
+
+    CASES = [
+        ('form_100', FORM_100, 11),
+        ('form_100', FORM_100, 10),
+        ('form_100', {}, 10),
+        ('form_100', dict(FORM_100, stamp_image='data:image/png;base64,AAAA', transfer_to_hospital=''), 11),
+        ('form_100', dict(FORM_100, patient_name=' lead & <trail> ', anamnesis='a\tb\r\nc  '), 11),
+        ('medical_record', MEDICAL_RECORD, 11),
+        ('medical_record', {}, 11),
+        ('medical_record', dict(MEDICAL_RECORD, medications='  x\n\n y \n', allergies=''), 11),
+        ('medical_record', dict(MEDICAL_RECORD, patient_name=None, skin=5), 11),
+    ]
+
+    def test_skeleton_matches_full_build(self):
+        for doc_type, data, size in self.CASES:
+            with self.subTest(doc_type=doc_type, size=size, fields=sorted(data)[:3]):
+                skeleton = app.get_docx_skeleton(doc_type, size)
+                self.assertIsNotNone(skeleton)
+                plan = app.get_layout_plan(doc_type)
+                self.assertEqual(docx_parts(skeleton.render(data)),
+                                 docx_parts(build_direct(doc_type, data, plan['font_size'] or size)))
+
+    def test_broken_skeleton_falls_back_to_full_build(self):
+        expected = docx_parts(build_direct('form_100', FORM_100, 11))
+        with mock.patch.dict(app._skeleton_cache, clear=True), \
+                mock.patch.object(app, 'DocxSkeleton', side_effect=app.SkeletonError('slot markers')):
+            self.assertIsNone(app.get_docx_skeleton('form_100', 11))
+            self.assertEqual(docx_parts(app.render_docx('form_100', FORM_100, 11)), expected)
+
+    def test_failing_render_falls_back_to_full_build(self):
+        broken = mock.Mock()
+        broken.render.side_effect = ValueError('bad slot')
+        with mock.patch.object(app, 'get_docx_skeleton', return_value=broken):
+            data = app.render_docx('medical_record', MEDICAL_RECORD)
+        self.assertEqual(docx_parts(data), docx_parts(build_direct('medical_record', MEDICAL_RECORD, 11)))
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out waiting for condition')
+        time.sleep(0.01)
+
+
+class CombinedDocumentTest(unittest.TestCase):
+    """ორი დოკუმენტი ერთ DOCX-ში: ორივეს ველები ('0:'/'1:' პრეფიქსით) და ერთი გვერდის გაწყვეტა"""
+
+    def document_xml(self, doc_type, data):
+        return docx_parts(build_direct(doc_type, data, 11))['word/document.xml'].decode('utf-8')
+
+    def test_combine_documents(self):
+        data = app.combine_documents([FORM_100, MEDICAL_RECORD])
+        self.assertEqual(data['document_type'], 'form_100+medical_record')
+        self.assertEqual((data['0:patient_name'], data['1:patient_name']),
+                         (FORM_100['patient_name'], MEDICAL_RECORD['patient_name']))
+        self.assertEqual(data['patient_name'], FORM_100['patient_name'])
+        with self.assertRaises(ValueError):
+            app.combine_documents([FORM_100])
+        with self.assertRaises(ValueError):
+            app.combine_plans(['form_100', 'unknown'])
+
+    def test_both_documents_in_one_docx(self):
+        xml = self.document_xml('form_100+medical_record', app.combine_documents([FORM_100, MEDICAL_RECORD]))
+        for text in (FORM_100['patient_name'], 'x &lt;y&gt; &amp; z', MEDICAL_RECORD['patient_name'], 'i1'):
+            self.assertIn(text, xml)
+        # ნაწილების საკუთარ გაწყვეტებს (სამედიცინო ჩანაწერი ორგვერდიანია) ემატება ზუსტად ერთი
+        own = [self.document_xml(t, d).count('w:type="page"')
+               for t, d in (('form_100', FORM_100), ('medical_record', MEDICAL_RECORD))]
+        self.assertEqual(own, [0, 1])
+        self.assertEqual(xml.count('w:type="page"'), sum(own) + 1)
+        separator = xml.index('w:type="page"')
+        self.assertLess(xml.index(FORM_100['patient_name']), separator)
+        self.assertGreater(xml.index(MEDICAL_RECORD['patient_name']), separator)
+
+    def test_same_type_twice_keeps_both_patients(self):
+        second = dict(FORM_100, patient_name='მეორე პაციენტი')
+        xml = self.document_xml('form_100+form_100', app.combine_documents([FORM_100, second]))
+        self.assertIn(FORM_100['patient_name'], xml)
+        self.assertIn('მეორე პაციენტი', xml)
+        self.assertEqual(xml.count('w:type="page"'), 1)
+
+
+class SignatureNormalizationTest(unittest.TestCase):
+    """ატვირთული ხელმოწერა: თეთრი კიდეები იჭრება, სურათი მცირდება, მეორე გავლა არაფერს ცვლის"""
+
+    def setUp(self):
+        from PIL import Image, ImageDraw
+        self.Image = Image
+        # 8x5 დიუმი 300 DPI-ზე, ხელმოწერა შუაში (~588..1812 x 488..1200), JPEG-ის არტეფაქტებით
+        img = Image.new('RGB', (2400, 1600), 'white')
+        draw = ImageDraw.Draw(img)
+        draw.line([(600, 900), (1000, 500), (1400, 1000), (1800, 600)], fill=(20, 20, 60), width=24)
+        draw.ellipse([700, 1000, 1100, 1200], outline=(0, 0, 0), width=12)
+        buf = BytesIO()
+        img.save(buf, format='JPEG', quality=90)
+        self.blob = buf.getvalue()
+
+    def open(self, blob):
+        img = self.Image.open(BytesIO(blob))
+        img.load()
+        return img
+
+    def test_border_is_trimmed_and_image_downscaled(self):
+        normalized = app.normalize_signature(self.blob)
+        img = self.open(normalized)
+        self.assertEqual((img.format, img.mode), ('PNG', 'RGBA'))
+        limit = int(app.SIGNATURE_MAX_WIDTH_IN * app.SIGNATURE_PRINT_DPI)
+        self.assertEqual(img.width, limit)
+        self.assertAlmostEqual(img.height, limit * 712 / 1224, delta=6)
+        # კიდეებზე ცარიელი ზოლი აღარ რჩება, ფონი გამჭვირვალეა
+        self.assertEqual(img.getchannel('A').getbbox(), (0, 0, img.width, img.height))
+        self.assertEqual(img.getpixel((0, 0))[3], 0)
+        self.assertEqual(round(img.info['dpi'][0]), app.SIGNATURE_PRINT_DPI)
+        self.assertLess(len(normalized), len(self.blob))
+
+    def test_normalizing_twice_changes_nothing(self):
+        once = app.normalize_signature(self.blob)
+        self.assertEqual(app.normalize_signature(once), once)
+        with open(os.path.join(BASE_DIR, 'signatures', 'stamp_signature.png'), 'rb') as f:
+            once = app.normalize_signature(f.read())
+        self.assertEqual(app.normalize_signature(once), once)
+
+    def test_small_image_is_not_upscaled(self):
+        img = self.Image.new('RGB', (100, 60), 'white')
+        img.paste((0, 0, 0), (20, 20, 80, 40))
+        buf = BytesIO()
+        img.save(buf, format='PNG')
+        self.assertEqual(self.open(app.normalize_signature(buf.getvalue())).size, (60, 20))
+
+
+class JobQueueTest(unittest.TestCase):
+    """დავალების სტატუსი: queued (რიგის პოზიციით) -> ეტაპები -> done / error"""
+
+    def setUp(self):
+        self.jobs = app.JobQueue(workers=1, queue_size=4)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.assertTrue(self.jobs.shutdown(5))
+
+    def blocking_job(self, data, progress):
+        progress('rendering')
+        self.release.wait(5)
+        progress('converting')
+        return {'success': True, 'filename': data['name']}
+
+    def test_status_lifecycle(self):
+        first = self.jobs.submit(self.blocking_job, {'name': 'a'})
+        wait_for(lambda: self.jobs.status(first)['status'] == 'rendering')
+        self.assertEqual(self.jobs.status(first)['progress'], app.JOB_STAGES['rendering'])
+
+        second = self.jobs.submit(self.blocking_job, {'name': 'b'})
+        queued = self.jobs.status(second)
+        self.assertEqual((queued['status'], queued['position']), ('queued', 1))
+
+        self.release.set()
+        wait_for(lambda: self.jobs.status(second)['status'] == 'done')
+        done = self.jobs.status(first)
+        self.assertEqual((done['status'], done['progress']), ('done', 100))
+        self.assertEqual(done['result'], {'success': True, 'filename': 'a'})
+        self.assertIsNone(self.jobs.status('missing'))
+
+    def test_failed_job_reports_error(self):
+        def failing(data, progress):
+            raise ValueError('broken template')
+
+        def unsuccessful(data, progress):
+            return {'success': False, 'error': 'no converter'}
+
+        failed = self.jobs.submit(failing, {})
+        rejected = self.jobs.submit(unsuccessful, {})
+        wait_for(lambda: self.jobs.status(rejected)['status'] == 'error')
+        self.assertEqual(self.jobs.status(failed)['error'], 'broken template')
+        self.assertEqual(self.jobs.status(rejected)['error'], 'no converter')
+
+    def test_full_queue_and_shutdown_reject_jobs(self):
+        self.jobs.submit(self.blocking_job, {'name': 'running'})
+        wait_for(lambda: self.jobs.queue.qsize() == 0)
+        ids = [self.jobs.submit(self.blocking_job, {'name': str(i)}) for i in range(5)]
+        self.assertEqual(sum(i is None for i in ids), 1)
+        self.release.set()
+        self.assertTrue(self.jobs.shutdown(5))
+        self.assertIsNone(self.jobs.submit(self.blocking_job, {'name': 'late'}))
+
+
+class SearchIndexTest(unittest.TestCase):
+    """FTS5 ძებნა: ქართული ტექსტი, სიტყვის დასაწყისი (prefix), რამდენიმე სიტყვა"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=STORAGE)
+        self.index = app.SearchIndex(os.path.join(self.folder, 'search.db'))
+        self.index.add_template('tpl_giorgi', {'template_name': 'ფორმა 100 - გიორგი', 'patient_name': 'გიორგი ბერიძე',
+                                               'personal_id': '01010101010', 'created': '2026-01-02T10:00:00'})
+        self.index.add_template('tpl_nino', {'template_name': 'Card', 'patient_name': 'ნინო კაპანაძე',
+                                             'personal_id': '02020202020', 'card_number': 'AB-77'})
+
+    def tearDown(self):
+        self.index.conn.close()
+
+    def ids(self, query):
+        return sorted(r.get('id') or r.get('name') for r in self.index.search(query))
+
+    def test_georgian_prefix(self):
+        self.assertEqual(self.ids('გიორ'), ['tpl_giorgi'])
+        self.assertEqual(self.ids('კაპანა'), ['tpl_nino'])
+        self.assertEqual(self.ids('ბერიძე'), ['tpl_giorgi'])
+
+    def test_multiple_words_must_all_match(self):
+        self.assertEqual(self.ids('გიორგი ბერ'), ['tpl_giorgi'])
+        self.assertEqual(self.ids('გიორგი კაპანაძე'), [])
+
+    def test_ids_card_numbers_and_case(self):
+        self.assertEqual(self.ids('0202'), ['tpl_nino'])
+        self.assertEqual(self.ids('ab-77'), ['tpl_nino'])
+        self.assertEqual(self.ids('CARD'), ['tpl_nino'])
+        self.assertEqual(self.ids('"*'), [])
+
+    def test_remove(self):
+        self.index.remove('template', 'tpl_giorgi')
+        self.assertEqual(self.ids('გიორგი'), [])
+
+    def test_archived_document(self):
+        src = os.path.join(self.folder, 'form100_nino.pdf')
+        with open(src, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        doc_id = app.get_document_store().put(src, {'patient_name': 'ნინო კაპანაძე', 'personal_id': '02020202020'})['id']
+        self.index.add_document(doc_id, {'patient_name': 'ნინო კაპანაძე', 'personal_id': '02020202020'})
+        results = self.index.search('ნინო')
+        self.assertEqual(sorted(r['type'] for r in results), ['document', 'template'])
+        document = next(r for r in results if r['type'] == 'document')
+        self.assertEqual(document['path'], f'/api/download/{doc_id}')
+
+
+class RenderCacheTest(unittest.TestCase):
+    """PDF ქეში: miss -> store -> hit, LRU გამოდევნა, გასაღები backend-ით"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=STORAGE)
+        self.cache = app.RenderCache(os.path.join(self.folder, 'cache'), max_bytes=250)
+
+    def pdf(self, name, size=100):
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            f.write(b'%PDF' + b'x' * (size - 4))
+        return path
+
+    def test_miss_store_hit(self):
+        target = os.path.join(self.folder, 'out.pdf')
+        self.assertFalse(self.cache.fetch('k1', target))
+        self.cache.store('k1', self.pdf('a.pdf'))
+        self.assertTrue(self.cache.fetch('k1', target))
+        with open(target, 'rb') as f:
+            self.assertTrue(f.read().startswith(b'%PDF'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        for key in ('k1', 'k2'):
+            self.cache.store(key, self.pdf(f'{key}.pdf'))
+        self.assertTrue(self.cache.fetch('k1', os.path.join(self.folder, 'out.pdf')))
+        self.cache.store('k3', self.pdf('k3.pdf'))
+        self.assertEqual(list(self.cache.entries), ['k1', 'k3'])
+        self.assertFalse(os.path.exists(os.path.join(self.folder, 'cache', 'k2.pdf')))
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_entries_survive_restart(self):
+        self.cache.store('k1', self.pdf('a.pdf'))
+        reloaded = app.RenderCache(self.cache.folder, max_bytes=250)
+        self.assertTrue(reloaded.fetch('k1', os.path.join(self.folder, 'out.pdf')))
+
+    def test_key(self):
+        key = app.render_cache_key(FORM_100, 'form_100', 11)
+        self.assertEqual(key, app.render_cache_key(dict(reversed(list(FORM_100.items()))), 'form_100', 11))
+        self.assertNotEqual(key, app.render_cache_key(dict(FORM_100, patient_name='სხვა'), 'form_100', 11))
+        self.assertNotEqual(key, app.render_cache_key(FORM_100, 'form_100', 10))
+        self.assertNotEqual(key, app.render_cache_key(FORM_100, 'form_100', 11, backend='native'))
+
+    def test_cached_pdf_job_renders_once_per_backend(self):
+        calls = []
+
+        def render():
+            calls.append(1)
+            return {'success': True, 'is_pdf': True, 'path': self.pdf('rendered.pdf'), 'backend': 'native'}
+
+        data = dict(FORM_100, renderer='pdf')
+        target = os.path.join(self.folder, 'out.pdf')
+        with mock.patch.object(app, '_render_cache', self.cache):
+            first = app.cached_pdf_job(data, 'form_100', 11, target, render)
+            second = app.cached_pdf_job(data, 'form_100', 11, target, render)
+        self.assertEqual(len(calls), 1)
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual(first['key'], second['key'])
+        self.assertEqual(first['key'], app.render_cache_key(data, 'form_100', 11, backend='native'))
+
+
+class DocumentStoreTest(unittest.TestCase):
+    """არქივი: უნიკალური id-ები, manifest-ის ხელახლა ჩატვირთვა, წაშლილი ფაილები"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=STORAGE)
+        self.root = os.path.join(self.folder, 'documents')
+        os.makedirs(self.root)
+        self.store = app.DocumentStore(self.root)
+
+    def put(self, src_name='form100.pdf', store=None, **kwargs):
+        src = os.path.join(self.folder, src_name)
+        with open(src, 'wb') as f:
+            f.write(b'%PDF-1.4 ' + os.urandom(4))
+        return (store or self.store).put(src, **kwargs)
+
+    def test_same_name_gets_unique_ids(self):
+        ids = [self.put()['id'] for _ in range(3)]
+        self.assertEqual(ids, ['form100.pdf', 'form100_2.pdf', 'form100_3.pdf'])
+        self.assertEqual(len({self.store.path(i) for i in ids}), 3)
+        self.assertTrue(all(os.path.isfile(self.store.path(i)) for i in ids))
+
+    def test_concurrent_puts_do_not_collide(self):
+        ids = []
+        threads = [threading.Thread(target=lambda n=n: ids.append(self.put(f'src{n}', name='same.pdf')['id']))
+                   for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(ids)), 8)
+
+    def test_manifest_round_trip(self):
+        entry = self.put(data={'patient_name': 'გიორგი', 'document_type': 'form_100'}, key='abc')
+        self.put()
+        reloaded = app.DocumentStore(self.root)
+        self.assertEqual(reloaded.entries, self.store.entries)
+        self.assertEqual(reloaded.entry(entry['id'])['patient'], 'გიორგი')
+        self.assertEqual(reloaded.find('abc', 'form100.pdf'), entry['id'])
+        self.assertEqual(self.put(store=reloaded)['id'], 'form100_3.pdf')
+
+    def test_torn_last_line_is_ignored(self):
+        self.put()
+        with open(self.store.manifest_path, 'a', encoding='utf-8') as f:
+            f.write('{"id": "half')
+        self.assertEqual(list(app.DocumentStore(self.root).entries), ['form100.pdf'])
+
+    def test_files_deleted_outside_the_app_are_pruned(self):
+        first = self.put(key='abc')['id']
+        second = self.put()['id']
+        os.remove(self.store.path(first))
+        self.assertIsNone(self.store.find('abc', 'form100.pdf'))
+
+        reloaded = app.DocumentStore(self.root)
+        self.assertEqual(list(reloaded.entries), [second])
+        self.assertIsNone(reloaded.find('abc', 'form100.pdf'))
+        with open(reloaded.manifest_path, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 1)
+        # id თავისუფლდება - იგივე სახელის შემდეგი დოკუმენტი აღარ იღებს _3-ს
+        self.assertEqual(self.put(store=reloaded)['id'], first)
+
+        os.remove(reloaded.path(second))
+        self.assertEqual(reloaded.prune(), [second])
+        self.assertEqual(reloaded.prune(), [])
+
+    def test_migrate_keeps_old_names(self):
+        with open(os.path.join(self.root, 'old.docx'), 'wb') as f:
+            f.write(b'PK')
+        migrated = self.store.migrate()
+        self.assertEqual([e['id'] for e in migrated], ['old.docx'])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'old.docx')))
+        self.assertTrue(os.path.isfile(self.store.path('old.docx')))
+
+
+class DocumentServingTest(unittest.TestCase):
+    """არქივის ფაილის მიწოდება: Range (206), If-None-Match (304), ჩამოტვირთვის სახელი"""
+
+    BODY = b'%PDF-1.4 ' + bytes(range(256)) * 8
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.ids = []
+        for _ in range(2):
+            src = os.path.join(tempfile.mkdtemp(dir=STORAGE), 'ფორმა 100.pdf')
+            with open(src, 'wb') as f:
+                f.write(self.BODY)
+            self.ids.append(app.publish_document(src, {'document_type': 'form_100'}))
+
+    def test_range(self):
+        resp = self.client.get(f'/api/view-pdf/{self.ids[0]}', headers={'Range': 'bytes=100-199'})
+        self.assertEqual(resp.status_code, 206)
+        self.assertEqual(resp.headers['Content-Range'], f'bytes 100-199/{len(self.BODY)}')
+        self.assertEqual(resp.data, self.BODY[100:200])
+        self.assertEqual(resp.headers['Accept-Ranges'], 'bytes')
+        resp = self.client.get(f'/api/view-pdf/{self.ids[0]}', headers={'Range': f'bytes={len(self.BODY)}-'})
+        self.assertEqual(resp.status_code, 416)
+
+    def test_if_none_match(self):
+        for url in (f'/api/view-pdf/{self.ids[0]}', f'/api/print-page/{self.ids[0]}'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertEqual(first.headers['Cache-Control'], 'no-cache')
+                etag = first.headers['ETag']
+                resp = self.client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(resp.status_code, 304)
+                self.assertEqual(resp.data, b'')
+                self.assertEqual(self.client.get(url, headers={'If-None-Match': '"other"'}).status_code, 200)
+
+    def test_download_name(self):
+        self.assertEqual(self.ids[1], 'ფორმა 100_2.pdf')
+        for doc_id in self.ids:
+            resp = self.client.get(f'/api/download/{doc_id}')
+            self.assertEqual(resp.status_code, 200)
+            disposition = resp.headers['Content-Disposition']
+            self.assertTrue(disposition.startswith('attachment;'))
+            # არქივის უნიკალური id-ის ნაცვლად - თავდაპირველი სახელი
+            self.assertIn("filename*=UTF-8''%E1%83%A4%E1%83%9D%E1%83%A0%E1%83%9B%E1%83%90%20100.pdf", disposition)
+        self.assertNotIn('attachment', self.client.get(f'/api/view-pdf/{self.ids[0]}').headers.get(
+            'Content-Disposition', ''))
+        self.assertEqual(self.client.get('/api/download/missing.pdf').status_code, 404)
+
+
+class TemplateStoreTest(unittest.TestCase):
+    """შაბლონები: '@blob:' მითითებები, ზუსტი id-ით ძებნა/წაშლა, URL-ისთვის უსაფრთხო id"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp(dir=STORAGE)
+        self.blobs = os.path.join(self.folder, 'blobs')
+        self.store = app.TemplateStore(os.path.join(self.folder, 'templates.db'), self.blobs)
+
+    def tearDown(self):
+        self.store.conn.close()
+
+    def template(self, name='ფორმა 100', **fields):
+        return dict(FORM_100, template_name=name, created='2026-01-02T10:00:00', **fields)
+
+    def blob_files(self):
+        return sorted(f for _, _, files in os.walk(self.blobs) for f in files)
+
+    def test_signatures_are_stored_as_blob_refs(self):
+        tid = self.store.put(self.template())
+        data = self.store.get(tid)['data']
+        ref = data['doctor_signature_image']
+        self.assertTrue(ref.startswith(app.BLOB_REF_PREFIX))
+        self.assertEqual(data['stamp_image'], ref)
+        self.assertEqual(data['patient_name'], FORM_100['patient_name'])
+
+        blob, mime = self.store.blob(ref[len(app.BLOB_REF_PREFIX):])
+        self.assertEqual((mime, blob[:4]), ('image/png', b'\x89PNG'))
+        self.assertEqual(self.store.data(tid), self.template())
+
+    def test_shared_blob_is_removed_with_the_last_template(self):
+        first = self.store.put(self.template('a'))
+        second = self.store.put(self.template('b'))
+        self.assertEqual(len(self.blob_files()), 1)
+        self.assertTrue(self.store.remove(first))
+        self.assertEqual(len(self.blob_files()), 1)
+        self.assertEqual(self.store.data(second)['doctor_signature_image'], SIGNATURE)
+        self.assertTrue(self.store.remove(second))
+        self.assertEqual(self.blob_files(), [])
+        self.assertFalse(self.store.remove(second))
+
+    def test_saving_blob_refs_keeps_them(self):
+        tid = self.store.put(self.template())
+        compact = self.store.get(tid)['data']
+        self.store.put(dict(compact, patient_name='სხვა'), tid=tid)
+        self.assertEqual(self.store.data(tid)['doctor_signature_image'], SIGNATURE)
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_find_matches_exact_id_only(self):
+        self.store.put(self.template(), tid='abc_def')
+        self.assertIsNone(self.store.find('abc'))
+        self.store.put(self.template(), tid='abc')
+        self.assertEqual(self.store.find('abc'), 'abc')
+        self.assertTrue(self.store.remove(self.store.find('abc')))
+        self.assertEqual(self.store.find('abc_def'), 'abc_def')
+
+    def test_new_ids_are_unique_and_url_safe(self):
+        ids = [self.store.put(self.template('ა/ბ test?#1')) for _ in range(3)]
+        self.assertEqual(len(set(ids)), 3)
+        for tid in ids:
+            self.assertRegex(tid, r'^ა_ბ_test_1_\d{8}_\d{6}(_\d+)?$')
+        self.assertEqual(app.template_slug('../..'), 'Template')
+        self.assertEqual(len(app.template_slug('x' * 200)), app.TEMPLATE_SLUG_MAX)
+
+    def test_api_round_trip(self):
+        client = app.app.test_client()
+        tid = client.post('/api/templates', json=self.template('ვიზიტი / 1')).get_json()['id']
+        self.assertNotIn('/', tid)
+        resp = client.get(f'/api/templates/{tid}')
+        self.assertEqual(resp.status_code, 200)
+        ref = resp.get_json()['template']['data']['doctor_signature_image']
+        self.assertEqual(client.get(f'/api/blobs/{ref[len(app.BLOB_REF_PREFIX):]}').mimetype, 'image/png')
+        self.assertEqual(client.delete(f'/api/templates/{tid[:6]}').status_code, 404)
+        self.assertEqual(client.delete(f'/api/templates/{tid}').status_code, 200)
+        self.assertEqual(client.get(f'/api/templates/{tid}').status_code, 404)
+
+    def api(self, url, **kwargs):
+        with mock.patch.object(app, 'get_template_store', return_value=self.store):
+            return app.app.test_client().get(url, **kwargs)
+
+    def test_paging(self):
+        ids = [self.store.put(dict(self.template(f't{i}'), created=f'2026-01-0{i + 1}T10:00:00')) for i in range(5)]
+        pages = [self.api(f'/api/templates?per_page=2&page={p}').get_json() for p in (1, 2, 3, 4)]
+        self.assertEqual([(r['total'], r['pages'], r['page'], r['per_page']) for r in pages],
+                         [(5, 3, p, 2) for p in (1, 2, 3, 4)])
+        self.assertEqual([t['id'] for r in pages for t in r['templates']], ids[::-1])
+        self.assertEqual(pages[3]['templates'], [])
+        self.assertEqual(self.api('/api/templates?page=-3').get_json()['page'], 1)
+        self.assertEqual(self.api('/api/templates?type=medical_record').get_json()['pages'], 0)
+
+    def test_per_page_is_clamped(self):
+        for _ in range(4):
+            self.store.put(self.template())
+        with mock.patch.object(app, 'TEMPLATES_MAX_PER_PAGE', 3):
+            body = self.api('/api/templates?per_page=1000').get_json()
+            self.assertEqual((body['per_page'], len(body['templates']), body['pages']), (3, 3, 2))
+        body = self.api('/api/templates?per_page=0').get_json()
+        self.assertEqual((body['per_page'], len(body['templates']), body['pages']), (1, 1, 4))
+        self.assertEqual(self.api('/api/templates').get_json()['per_page'], app.TEMPLATES_PER_PAGE)
+
+    def test_invalid_page_is_400(self):
+        for query in ('page=abc', 'per_page=x', 'page=1.5'):
+            with self.subTest(query=query):
+                resp = self.api(f'/api/templates?{query}')
+                self.assertEqual(resp.status_code, 400)
+                self.assertFalse(resp.get_json()['success'])
+
+    def test_template_etag(self):
+        tid = self.store.put(self.template())
+        first = self.api(f'/api/templates/{tid}')
+        etag = first.headers['ETag']
+        self.assertEqual(first.headers['Cache-Control'], 'no-cache')
+        resp = self.api(f'/api/templates/{tid}', headers={'If-None-Match': etag})
+        self.assertEqual((resp.status_code, resp.data), (304, b''))
+        self.store.put(self.template(patient_name='სხვა'), tid=tid)
+        resp = self.api(f'/api/templates/{tid}', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers['ETag'], etag)
+
+class RequestReferenceTest(unittest.TestCase):
+    """შაბლონის delta და ხელმოწერის მითითებები; გადაუჭრელი მითითება -> 4xx, დოკუმენტი არ იქმნება"""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.tid = app.get_template_store().put(dict(FORM_100, template_name='delta', created='2026-01-02T10:00'))
+
+    def tearDown(self):
+        app.get_template_store().remove(self.tid)
+        for name in os.listdir(app.SIGNATURES_FOLDER) if os.path.isdir(app.SIGNATURES_FOLDER) else []:
+            os.remove(os.path.join(app.SIGNATURES_FOLDER, name))
+        app._saved_signature_refs.clear()
+
+    def archived(self):
+        return len(app.get_document_store().list())
+
+    def test_template_delta_matches_full_payload(self):
+        delta = app.resolve_request_data({'template_id': self.tid, 'patient_name': 'სხვა პაციენტი'})
+        full = app.resolve_request_data(dict(FORM_100, patient_name='სხვა პაციენტი'))
+        self.assertEqual(delta, full)
+        self.assertNotIn('template_name', delta)
+        self.assertEqual(app.render_cache_key(delta, 'form_100', 11), app.render_cache_key(full, 'form_100', 11))
+
+    def test_unknown_template_is_404(self):
+        with self.assertRaises(app.UnresolvedReference) as ctx:
+            app.resolve_request_data({'template_id': 'missing'})
+        self.assertEqual(ctx.exception.status, 404)
+        before = self.archived()
+        resp = self.client.post('/api/save-document', json={'template_id': 'missing', 'async': True})
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual(resp.get_json()['code'], 'unresolved_reference')
+        self.assertEqual(self.client.post('/api/save-document', json={'template_id': ['x']}).status_code, 400)
+        self.assertEqual(self.archived(), before)
+
+    def test_saved_signature_resolves_to_content_ref(self):
+        with self.assertRaises(app.UnresolvedReference):
+            app.resolve_signature_refs({'doctor_signature_image': '@saved:doctor'})
+        with open(os.path.join(BASE_DIR, 'signatures', 'stamp_signature.png'), 'rb') as f:
+            blob, _ = app.store_signature('doctor', f.read())
+        resolved = app.resolve_signature_refs({'doctor_signature_image': '@saved:doctor', 'x': 'y'})
+        ref = resolved['doctor_signature_image']
+        self.assertEqual(ref, app.register_signature(blob).ref)
+        self.assertEqual(app.load_signature(ref).blob, blob)
+        self.assertEqual(app.resolve_signature_refs({'s': ref}), {'s': ref})
+
+    def test_unknown_signature_ref_is_rejected(self):
+        before = self.archived()
+        for value in ('sig:' + '0' * 40, '@saved:doctor', '@saved:nobody'):
+            with self.subTest(value=value):
+                resp = self.client.post('/api/print-document',
+                                        json=dict(FORM_100, doctor_signature_image=value, renderer='pdf'))
+                self.assertEqual(resp.status_code, 409)
+                body = resp.get_json()
+                self.assertEqual((body['code'], body['field']), ('unresolved_reference', 'doctor_signature_image'))
+        resp = self.client.post('/api/print-combined', json={'documents': [
+            dict(FORM_100, stamp_image='sig:' + '1' * 40), MEDICAL_RECORD]})
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(self.archived(), before)
+
+    def test_unknown_blob_ref_is_rejected(self):
+        with self.assertRaises(app.UnresolvedReference) as ctx:
+            app.resolve_request_data({'stamp_image': app.BLOB_REF_PREFIX + 'f' * 40})
+        self.assertEqual(ctx.exception.field, 'stamp_image')
+
+    def test_known_signature_ref_prints(self):
+        ref = app.load_signature(SIGNATURE).ref
+        resp = self.client.post('/api/print-document', json=dict(FORM_100, doctor_signature_image=ref, renderer='pdf'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.get_json()['success'])
+
+
+class ServingTest(unittest.TestCase):
+    """production რეჟიმი: კლიენტების allow-list, არგუმენტები, მოთხოვნის ვადა (504)"""
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def get(self, addr):
+        return self.client.get('/api/render-cache', environ_base={'REMOTE_ADDR': addr}).status_code
+
+    def test_default_allows_only_this_computer(self):
+        self.assertEqual(self.get('127.0.0.1'), 200)
+        self.assertEqual(self.get('::1'), 200)
+        self.assertEqual(self.get('192.168.1.7'), 403)
+        self.assertEqual(self.get('not-an-ip'), 403)
+
+    def test_allowed_networks(self):
+        allowed = app.parse_allowed_clients(' 127.0.0.1, 192.168.1.0/24 ,,')
+        self.assertEqual([str(n) for n in allowed], ['127.0.0.1/32', '192.168.1.0/24'])
+        with mock.patch.object(app, 'ALLOWED_CLIENTS', allowed):
+            self.assertEqual(self.get('192.168.1.7'), 200)
+            self.assertEqual(self.get('::ffff:192.168.1.7'), 200)
+            self.assertEqual(self.get('192.168.2.7'), 403)
+            self.assertEqual(self.get('::1'), 403)
+
+    def test_arguments(self):
+        with mock.patch.dict(os.environ, {'MEDDOCS_SERVER': ''}):
+            args = app.parse_args([])
+        self.assertFalse(args.production)
+        self.assertEqual((args.host, args.allow), ('127.0.0.1', '127.0.0.1,::1'))
+        self.assertEqual((args.timeout, args.idle_timeout), (app.REQUEST_TIMEOUT, app.SERVER_IDLE_TIMEOUT))
+
+        args = app.parse_args(['--production', '--host', '0.0.0.0', '--allow', '10.0.0.0/8', '--threads', '8',
+                               '--job-workers', '2', '--timeout', '30', '--idle-timeout', '600', '--no-browser'])
+        self.assertEqual((args.production, args.host, args.allow, args.threads, args.job_workers),
+                         (True, '0.0.0.0', '10.0.0.0/8', 8, 2))
+        self.assertEqual((args.timeout, args.idle_timeout, args.no_browser), (30, 600, True))
+        with mock.patch.dict(os.environ, {'MEDDOCS_SERVER': 'production'}):
+            self.assertTrue(app.parse_args([]).production)
+
+    def test_production_server_settings(self):
+        args = app.parse_args(['--production', '--threads', '8', '--idle-timeout', '600'])
+        server = mock.Mock()
+        server.run.side_effect = KeyboardInterrupt
+        ready = mock.Mock()
+        with mock.patch.object(app, 'create_server', return_value=server, create=True) as create, \
+                mock.patch.object(app, 'get_job_queue') as jobs, mock.patch.object(app.signal, 'signal'):
+            app.serve_production(args, ready)
+        kwargs = create.call_args.kwargs
+        self.assertEqual((kwargs['threads'], kwargs['channel_timeout'], kwargs['port']), (8, 600, args.port))
+        ready.assert_called_once_with()
+        server.close.assert_called_once_with()
+        jobs.return_value.shutdown.assert_called_once_with(app.SHUTDOWN_GRACE)
+
+    def test_hung_request_returns_504(self):
+        release = threading.Event()
+        done = []
+
+        def hung_print_job(data, progress=lambda stage: None):
+            release.wait(5)
+            done.append(1)
+            return {'success': True, 'filename': 'late.pdf', 'is_pdf': True}
+
+        with mock.patch.object(app, 'print_document_job', hung_print_job), \
+                mock.patch.object(app, 'REQUEST_TIMEOUT', 0.2):
+            started = time.monotonic()
+            resp = self.client.post('/api/print-document', json=dict(MEDICAL_RECORD))
+            self.assertLess(time.monotonic() - started, 2)
+            self.assertEqual(resp.status_code, 504)
+            job_id = resp.get_json()['job_id']
+
+            async_id = self.client.post('/api/print-document', json=dict(MEDICAL_RECORD, **{'async': True})
+                                        ).get_json()['job_id']
+            wait_for(lambda: self.client.get(f'/api/jobs/{async_id}').status_code == 504)
+        release.set()
+        wait_for(lambda: len(done) == 2)
+        job = app.get_job_queue().status(job_id)
+        self.assertEqual((job['status'], job['timed_out'], job['result']), ('error', True, None))
+
+    def test_expired_queued_job_is_skipped(self):
+        jobs = app.JobQueue(workers=1, queue_size=4)
+        release = threading.Event()
+        ran = []
+        jobs.submit(lambda data, progress: release.wait(5) and {'success': True}, {})
+        late = jobs.submit(lambda data, progress: ran.append(1) or {'success': True}, {}, timeout=0.05)
+        time.sleep(0.1)
+        self.assertTrue(jobs.status(late)['timed_out'])
+        release.set()
+        self.assertTrue(jobs.shutdown(5))
+        self.assertEqual(ran, [])
+
+
+class MetricsTest(unittest.TestCase):
+    """/metrics: Prometheus-ის ტექსტური ფორმატი, ეტაპების ჰისტოგრამა doc_type/backend ლეიბლებით"""
+
+    SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{((?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*)\})? '
+                        r'(-?[0-9.e+-]+|[+-]Inf|NaN)$')
+    LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+    def parse(self, text):
+        """ტექსტი -> (TYPE-ები, [(სახელი, {ლეიბლები}, მნიშვნელობა)]); ფორმატის შეცდომა -> AssertionError"""
+        types, samples = {}, []
+        for line in text.splitlines():
+            if line.startswith('# TYPE '):
+                _, _, name, kind = line.split(' ')
+                self.assertIn(kind, ('counter', 'gauge', 'histogram'))
+                self.assertNotIn(name, types, 'TYPE ერთხელ')
+                types[name] = kind
+                continue
+            if line.startswith('# HELP ') or not line:
+                continue
+            m = self.SAMPLE.match(line)
+            self.assertIsNotNone(m, line)
+            name, labels, value = m.group(1), dict(self.LABEL.findall(m.group(2) or '')), float(m.group(3))
+            family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+            self.assertIn(family, types, f'{name}: TYPE-ის გარეშე')
+            samples.append((name, labels, value))
+        return types, samples
+
+    def test_stage_histogram_after_save(self):
+        client = app.app.test_client()
+        resp = client.post('/api/save-document', json=dict(FORM_100, patient_name=f'metrics {os.urandom(4).hex()}'))
+        self.assertTrue(resp.get_json()['success'])
+
+        resp = client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.mimetype.startswith('text/plain'))
+        types, samples = self.parse(resp.get_data(as_text=True))
+        self.assertEqual(types['meddocs_stage_seconds'], 'histogram')
+
+        # PDF-ის კონვერტაცია: კონვერტორი გარემოზეა დამოკიდებული (Word, LibreOffice ან შიდა)
+        convert = [labels for n, labels, _ in samples if n == 'meddocs_stage_seconds_count'
+                   and labels.get('stage') == 'convert' and labels.get('doc_type') == 'form_100']
+        self.assertEqual(len(convert), 1, convert)
+        self.assertIn(convert[0]['backend'], ('word', 'libreoffice', 'native'))
+        series = [(n, labels, v) for n, labels, v in samples
+                  if n.startswith('meddocs_stage_seconds_') and dict(labels, le=None) == dict(convert[0], le=None)]
+        buckets = [v for n, labels, v in series if n.endswith('_bucket')]
+        count = [v for n, _, v in series if n.endswith('_count')]
+        self.assertEqual(len(buckets), len(app.METRIC_BUCKETS) + 1)
+        self.assertEqual(buckets, sorted(buckets), 'bucket-ები კუმულატიურია')
+        self.assertEqual(count, [buckets[-1]])
+        self.assertGreaterEqual(count[0], 1)
+        self.assertEqual([labels['le'] for n, labels, _ in series if n.endswith('_bucket')][-1], '+Inf')
+
+        requests = [labels for n, labels, _ in samples if n == 'meddocs_request_seconds_count']
+        self.assertIn({'endpoint': 'save_document', 'method': 'POST', 'status': '200'}, requests)
+
+
+class BatchTest(unittest.TestCase):
+    """ჯგუფური აწყობა: ხელმოწერის 'sig:' მითითება შვილ პროცესებს სრული სურათით მიეწოდება"""
+
+    def setUp(self):
+        with open(os.path.join(BASE_DIR, 'signatures', 'stamp_signature.png'), 'rb') as f:
+            blob = f.read()
+        # მხოლოდ მშობელი პროცესის ქეშშია - signatures/-ში არ ინახება
+        self.ref = app.load_signature('data:image/png;base64,' + base64.b64encode(blob).decode()).ref
+        self.defaults = dict(FORM_100, doctor_signature_image=self.ref, stamp_image=self.ref)
+        self.items = [{'patient_name': 'პირველი'}, {'patient_name': 'მეორე'}]
+
+    def images_per_page(self, pdf_bytes):
+        from pypdf import PdfReader
+        return [len(page.images) for page in PdfReader(BytesIO(pdf_bytes)).pages]
+
+    def published(self, filename):
+        with open(app.get_document_store().path(filename), 'rb') as f:
+            return f.read()
+
+    def test_items_carry_signature_data(self):
+        data = app.resolve_batch_item(self.items[0], self.defaults)
+        self.assertTrue(data['doctor_signature_image'].startswith('data:image/png;base64,'))
+        self.assertFalse(any(isinstance(v, str) and v.startswith(app.SIGNATURE_REF_PREFIX) for v in data.values()))
+        self.assertEqual(app.load_signature(data['doctor_signature_image']).ref, self.ref)
+        with self.assertRaises(app.UnresolvedReference):
+            app.resolve_batch_item({'stamp_image': 'sig:' + '0' * 40}, {})
+
+    def test_merged_pdf(self):
+        # spawn, როგორც Windows-ზე: შვილ პროცესს მშობლის ხელმოწერების ქეში არ აქვს
+        spawn = functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        with mock.patch.object(app, 'ProcessPoolExecutor', spawn):
+            result = app.generate_batch(self.items, self.defaults, output='merged', renderer='pdf', workers=1)
+        self.assertTrue(result['success'], result)
+        self.assertEqual((result['count'], result['errors']), (2, []))
+        pages = self.images_per_page(self.published(result['filename']))
+        self.assertGreaterEqual(len(pages), 2)
+        self.assertEqual(sum(pages), 2 * sum(self.images_per_page(self.single())))
+
+    def test_zip(self):
+        result = app.generate_batch(self.items, self.defaults, output='zip', renderer='pdf', workers=2)
+        self.assertTrue(result['success'], result)
+        with zipfile.ZipFile(BytesIO(self.published(result['filename']))) as z:
+            names = z.namelist()
+            self.assertEqual(len(names), 2)
+            expected = sum(self.images_per_page(self.single()))
+            for name in names:
+                self.assertTrue(name.endswith('.pdf'))
+                self.assertEqual(sum(self.images_per_page(z.read(name))), expected)
+        self.assertGreater(expected, 0)
+
+    def single(self):
+        """იგივე დოკუმენტი ამ პროცესში, ხელმოწერის სრული data URL-ით"""
+        data = app.resolve_batch_item(self.items[0], self.defaults)
+        path = os.path.join(STORAGE, 'batch-single.pdf')
+        app.render_pdf_document(data, 'form_100', path, 10)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class StaticAssetsTest(unittest.TestCase):
+    """static/dist/ (build_assets.py): hash-იანი ფაილი შეკუმშული და immutable; მის გარეშე - ორიგინალი"""
+
+    CSS = b'body { color: #123; }\n'
+
+    def setUp(self):
+        self.static = tempfile.mkdtemp(dir=STORAGE)
+        os.makedirs(os.path.join(self.static, 'css'))
+        os.makedirs(os.path.join(self.static, 'dist', 'css'))
+        with open(os.path.join(self.static, 'css', 'style.css'), 'wb') as f:
+            f.write(self.CSS)
+        built = os.path.join(self.static, 'dist', 'css', 'style.0123abcd.css')
+        for suffix, body in (('', self.CSS), ('.gz', b'gzip body'), ('.br', b'br body')):
+            with open(built + suffix, 'wb') as f:
+                f.write(body)
+        self.manifest = os.path.join(self.static, 'dist', 'manifest.json')
+        with open(self.manifest, 'w', encoding='utf-8') as f:
+            f.write('{"css/style.css": "dist/css/style.0123abcd.css", "js/gone.js": "dist/js/gone.0.js"}')
+
+        original = app.app.static_folder
+        app.app.static_folder = self.static
+        self.addCleanup(setattr, app.app, 'static_folder', original)
+        self.client = app.app.test_client()
+
+    def use(self, manifest_path):
+        patcher = mock.patch.object(app, '_assets', app.AssetManifest(manifest_path))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def url(self):
+        from flask import url_for
+        with app.app.test_request_context():
+            return url_for('static', filename='css/style.css')
+
+    def test_fingerprinted_asset(self):
+        self.use(self.manifest)
+        self.assertEqual(app.get_assets().urls, {'css/style.css': 'dist/css/style.0123abcd.css'})
+        url = self.url()
+        self.assertEqual(url, '/static/dist/css/style.0123abcd.css')
+        for accept, encoding, body in (('br, gzip', 'br', b'br body'), ('gzip', 'gzip', b'gzip body'),
+                                       ('identity', None, self.CSS)):
+            with self.subTest(accept=accept):
+                resp = self.client.get(url, headers={'Accept-Encoding': accept})
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.headers.get('Content-Encoding'), encoding)
+                self.assertEqual(resp.data, body)
+                self.assertEqual(resp.mimetype, 'text/css')
+                self.assertEqual(resp.headers['Cache-Control'], f'public, max-age={app.ASSET_MAX_AGE}, immutable')
+                self.assertEqual(resp.headers['Vary'], 'Accept-Encoding')
+
+    def test_original_file_without_dist(self):
+        for manifest in (os.path.join(self.static, 'missing.json'), os.path.join(self.static, 'css', 'style.css')):
+            with self.subTest(manifest=os.path.basename(manifest)):
+                self.use(manifest)
+                self.assertEqual(self.url(), '/static/css/style.css')
+                resp = self.client.get('/static/css/style.css', headers={'Accept-Encoding': 'br, gzip'})
+                self.assertEqual(resp.status_code, 200)
+                self.assertEqual(resp.data, self.CSS)
+                self.assertNotIn('Content-Encoding', resp.headers)
+                self.assertNotIn('immutable', resp.headers.get('Cache-Control', ''))
+                resp.close()
+
+
+if __name__ == '__main__':
+    unittest.main()